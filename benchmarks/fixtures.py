@@ -0,0 +1,275 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import itertools
+import json
+import random
+import string
+import time
+import urllib.parse
+import urllib.request
+from types import SimpleNamespace
+from typing import Dict, List, Any, Optional, Iterable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+OPENSKY_API_URL = 'https://opensky-network.org/api'
+
+# The fixtures follow the format of the OpenSky REST API:
+#
+# {
+#     "states": [<response of /states/all>, ...],    # one per snapshot, in chronological order
+#     "arrivals": {<icao>: <response of /flights/arrival>},
+#     "departures": {<icao>: <response of /flights/departure>}
+# }
+
+
+def to_state_vector(values: List[Any]) -> SimpleNamespace:
+    """
+    Converts a state of the OpenSky REST API into an object with the attributes of
+    `opensky_network_client.models.StateVector`.
+    """
+    return SimpleNamespace(
+        icao24=values[0],
+        callsign=values[1],
+        origin_country=values[2],
+        time_position_in_sec=values[3],
+        last_contact_in_sec=values[4],
+        longitude=values[5],
+        latitude=values[6],
+        baro_altitude_in_m=values[7],
+        on_ground=values[8],
+        velocity_in_m_per_sec=values[9],
+        true_track_in_degrees=values[10],
+        vertical_rate_in_m_per_sec=values[11],
+        sensors=values[12],
+        geo_altitude_in_m=values[13],
+        squawk=values[14],
+        spi=values[15],
+        position_source=values[16],
+    )
+
+
+def to_flight_connection(flight: Dict[str, Any]) -> SimpleNamespace:
+    """
+    Converts a flight of the OpenSky REST API into an object with the attributes of
+    `opensky_network_client.models.FlightConnection`.
+    """
+    return SimpleNamespace(
+        icao24=flight['icao24'],
+        first_seen=flight['firstSeen'],
+        est_departure_airport=flight['estDepartureAirport'],
+        last_seen=flight['lastSeen'],
+        est_arrival_airport=flight['estArrivalAirport'],
+        callsign=flight['callsign'],
+    )
+
+
+class ReplayOpenskyClient:
+    def __init__(self, fixture: Dict[str, Any], rebase: bool = True):
+        """
+        Stands in for `OpenskyNetworkClient` by serving a fixture. `get_states` keeps serving the
+        same snapshot until `next_snapshot` is called.
+
+        :param fixture:
+        :param rebase: shifts the timestamps of the fixture so that its last snapshot happens now,
+                       which keeps the flights within the time window that is asked for
+        """
+        shift = int(time.time()) - fixture['states'][-1]['time'] if rebase else 0
+
+        self.snapshots = [
+            SimpleNamespace(time=snapshot['time'] + shift,
+                            states=[to_state_vector(_shift_state(values, shift))
+                                    for values in snapshot['states']])
+            for snapshot in fixture['states']
+        ]
+        self.arrivals = {icao: [to_flight_connection(_shift_flight(f, shift)) for f in flights]
+                         for icao, flights in fixture['arrivals'].items()}
+        self.departures = {icao: [to_flight_connection(_shift_flight(f, shift)) for f in flights]
+                           for icao, flights in fixture['departures'].items()}
+
+        self.snapshot_index = 0
+        self.requests = 0
+
+    def next_snapshot(self) -> None:
+        self.snapshot_index = (self.snapshot_index + 1) % len(self.snapshots)
+
+    def get_states(self,
+                   lamin: Optional[float] = None,
+                   lamax: Optional[float] = None,
+                   lomin: Optional[float] = None,
+                   lomax: Optional[float] = None,
+                   icao24: Optional[Iterable[str]] = None) -> SimpleNamespace:
+        self.requests += 1
+        snapshot = self.snapshots[self.snapshot_index]
+        states = snapshot.states
+
+        if lamin is not None:
+            states = [s for s in states if s.latitude is not None and s.longitude is not None
+                      and lamin <= s.latitude <= lamax and lomin <= s.longitude <= lomax]
+
+        if icao24 is not None:
+            icao24 = set(icao24)
+            states = [s for s in states if s.icao24 in icao24]
+
+        return SimpleNamespace(time=snapshot.time, states=states)
+
+    def get_flight_arrivals(self, icao: str, begin: int, end: int) -> List[SimpleNamespace]:
+        self.requests += 1
+        return [f for f in self.arrivals.get(icao, []) if begin <= f.last_seen <= end]
+
+    def get_flight_departures(self, icao: str, begin: int, end: int) -> List[SimpleNamespace]:
+        self.requests += 1
+        return [f for f in self.departures.get(icao, []) if begin <= f.first_seen <= end]
+
+
+def _shift_state(values: List[Any], shift: int) -> List[Any]:
+    values = list(values)
+    for i in (3, 4):
+        if values[i] is not None:
+            values[i] += shift
+
+    return values
+
+
+def _shift_flight(flight: Dict[str, Any], shift: int) -> Dict[str, Any]:
+    return dict(flight, firstSeen=flight['firstSeen'] + shift, lastSeen=flight['lastSeen'] + shift)
+
+
+def generate_fixture(num_airports: int,
+                     num_states: int,
+                     num_snapshots: int = 3,
+                     connected_ratio: float = 0.3,
+                     churn_ratio: float = 0.02,
+                     seed: int = 0) -> Dict[str, Any]:
+    """
+    Generates a synthetic fixture.
+
+    :param num_airports:
+    :param num_states: number of aircraft in every snapshot
+    :param num_snapshots:
+    :param connected_ratio: ratio of the aircraft that arrive to or depart from one of the airports
+    :param churn_ratio: ratio of the aircraft replaced from one snapshot to the next one
+    :param seed:
+    """
+    rnd = random.Random(seed)
+    now = int(time.time())
+    airports = [f"X{i:03d}" for i in range(num_airports)]
+    aircraft_ids = itertools.count()
+
+    def new_state() -> List[Any]:
+        icao24 = f"{next(aircraft_ids):06x}"
+        callsign = ''.join(rnd.choices(string.ascii_uppercase, k=3)) + str(rnd.randint(100, 9999))
+        return [
+            icao24, callsign, 'Nowhere', now, now,
+            rnd.uniform(-180, 180), rnd.uniform(-85, 85), 10000.0, False,
+            rnd.uniform(100, 250), rnd.uniform(0, 360), 0.0, None, 10000.0, None, False, 0
+        ]
+
+    states = [new_state() for _ in range(num_states)]
+    snapshots = []
+
+    for n in range(num_snapshots):
+        timestamp = now - (num_snapshots - 1 - n) * 30
+        if n > 0:
+            for state in states:
+                state[3] = state[4] = timestamp
+                state[5] = max(min(state[5] + rnd.uniform(-0.05, 0.05), 180), -180)
+                state[6] = max(min(state[6] + rnd.uniform(-0.05, 0.05), 85), -85)
+            for i in rnd.sample(range(num_states), int(num_states * churn_ratio)):
+                states[i] = new_state()
+        snapshots.append({'time': timestamp, 'states': [list(state) for state in states]})
+
+    arrivals = {airport: [] for airport in airports}
+    departures = {airport: [] for airport in airports}
+
+    all_icao24 = list({state[0] for snapshot in snapshots for state in snapshot['states']})
+    for icao24 in rnd.sample(all_icao24, int(len(all_icao24) * connected_ratio)):
+        departure_airport, arrival_airport = rnd.choice(airports), rnd.choice(airports)
+        flight = {
+            'icao24': icao24,
+            'firstSeen': now - rnd.randint(600, 7200),
+            'estDepartureAirport': departure_airport,
+            'lastSeen': now - rnd.randint(0, 600),
+            'estArrivalAirport': arrival_airport,
+            'callsign': None,
+        }
+        arrivals[arrival_airport].append(flight)
+        departures[departure_airport].append(flight)
+
+    return {'states': snapshots, 'arrivals': arrivals, 'departures': departures}
+
+
+def record_fixture(airports: Iterable[str],
+                   num_snapshots: int = 3,
+                   interval_in_sec: float = 30,
+                   time_span_in_days: int = 1) -> Dict[str, Any]:
+    """
+    Records a fixture from the live OpenSky REST API.
+
+    :param airports: icao of the airports
+    :param num_snapshots: number of states snapshots
+    :param interval_in_sec: time between two states snapshots
+    :param time_span_in_days: number of days of arrivals and departures before now
+    """
+    end = int(time.time())
+    begin = end - time_span_in_days * 24 * 3600
+
+    fixture = {'states': [], 'arrivals': {}, 'departures': {}}
+
+    for airport in airports:
+        params = {'airport': airport, 'begin': begin, 'end': end}
+        fixture['arrivals'][airport] = _get_json('/flights/arrival', params) or []
+        fixture['departures'][airport] = _get_json('/flights/departure', params) or []
+
+    for n in range(num_snapshots):
+        if n > 0:
+            time.sleep(interval_in_sec)
+        fixture['states'].append(_get_json('/states/all'))
+
+    return fixture
+
+
+def _get_json(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    url = OPENSKY_API_URL + path
+    if params:
+        url += '?' + urllib.parse.urlencode(params)
+
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return json.load(response)
+
+
+def load_fixture(filename: str) -> Dict[str, Any]:
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_fixture(fixture: Dict[str, Any], filename: str) -> None:
+    with open(filename, 'w') as f:
+        json.dump(fixture, f)
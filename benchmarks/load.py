@@ -0,0 +1,321 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+"""
+Load tests the whole application against local stand-ins of OpenSky, of the subscription manager
+and of the broker, and reports the end to end publish rate, the jitter of the publish ticks, the CPU
+and the memory of the app. The app publishes through its real `SWIMPublisher`.
+
+The stand-ins run in a separate process so that only the app is measured.
+
+Usage:
+    python -m benchmarks.load --aircraft 10000 --airports 50 --churn 0.05 --duration 300
+    python -m benchmarks.load --config my_config.yml --serializer orjson --output results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+from proton import Message
+from proton.reactor import Container
+from pubsub_facades.swim_pubsub import SWIMPublisher
+from swim_proton.messaging_handlers import Messenger
+
+from benchmarks.stand_ins import AmqpSink, FakeOpenskyServer, FakeSubscriptionManagerServer, \
+    SyntheticTraffic
+from benchmarks.traffic import _percentiles_in_ms
+from swim_adsb import app
+from swim_adsb.adsb.serializers import SERIALIZERS, SERIALIZER_JSON
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+class _TimedProducer:
+    def __init__(self, message_producer: Callable[..., Optional[Message]], interval_in_sec: float,
+                 tick_lags: List[float]):
+        """
+        Wraps the message producer of a messenger of the publisher to record how late every tick is
+        and to stamp the produced messages with their creation time, so that the sink can measure
+        their latency.
+        """
+        self.message_producer = message_producer
+        self.interval_in_sec = interval_in_sec
+        self.tick_lags = tick_lags
+        self.produced = 0
+        self._ticked_at: Optional[float] = None
+
+    def __call__(self, context: Optional[Any] = None) -> Optional[Message]:
+        now = time.monotonic()
+        if self._ticked_at is not None:
+            self.tick_lags.append(max(now - self._ticked_at - self.interval_in_sec, 0.0))
+        self._ticked_at = now
+
+        message = self.message_producer(context)
+        if message is not None:
+            message.creation_time = time.time()
+            self.produced += 1
+
+        return message
+
+
+class _PublisherProbe:
+    def __init__(self, swim_publisher: SWIMPublisher):
+        """
+        Instruments the messengers added to the given publisher with a `_TimedProducer`, leaving the
+        publisher itself, its subscription manager client and its messaging handler untouched.
+        """
+        self.tick_lags: List[float] = []
+        self._producers: List[_TimedProducer] = []
+        self._add_topic_messenger = swim_publisher.add_topic_messenger
+        swim_publisher.add_topic_messenger = self.add_topic_messenger
+
+    @property
+    def topics(self) -> int:
+        return len(self._producers)
+
+    @property
+    def produced(self) -> int:
+        return sum(producer.produced for producer in self._producers)
+
+    def add_topic_messenger(self, messenger: Messenger) -> None:
+        producer = _TimedProducer(messenger.message_producer,
+                                  messenger.interval_in_sec,
+                                  self.tick_lags)
+        self._producers.append(producer)
+        messenger.message_producer = producer
+        self._add_topic_messenger(messenger)
+
+
+def _run_stand_ins(num_airports: int,
+                   num_aircraft: int,
+                   churn_per_min: float,
+                   seed: int,
+                   broker_url: str,
+                   addresses: multiprocessing.Queue,
+                   stopped: multiprocessing.Event,
+                   results: multiprocessing.Queue) -> None:
+    traffic = SyntheticTraffic(num_airports, num_aircraft, churn_per_min=churn_per_min, seed=seed)
+    opensky = FakeOpenskyServer(traffic)
+    opensky.start()
+    subscription_manager = FakeSubscriptionManagerServer()
+    subscription_manager.start()
+    addresses.put((opensky.address, subscription_manager.address, traffic.airports))
+
+    sink = AmqpSink(broker_url, is_stopped=stopped.is_set)
+    Container(sink).run()
+    opensky.stop()
+    subscription_manager.stop()
+
+    results.put({
+        'received': sink.messages,
+        'received_bytes': sink.bytes,
+        'received_topics': len(sink.subjects),
+        'latency_ms': _percentiles_in_ms(sink.latencies) if sink.latencies else None,
+        'opensky_requests': opensky.requests,
+        'created_topics': len(subscription_manager.topics),
+    })
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def _get_rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def _create_settings(config_path: str,
+                     directory: str,
+                     airports: Dict[str, Any],
+                     opensky_address: str,
+                     subscription_manager_address: str,
+                     broker_url: str,
+                     serializer: Optional[str]) -> app.Settings:
+    """
+    Writes in `directory` the config file with the airports of the synthetic traffic as cities,
+    pointing to the stand-ins of OpenSky, of the subscription manager and of the broker (without
+    TLS), and returns its settings. The areas, the snapshots, the shards and the on demand topics,
+    which depend on the environment, are disabled.
+    """
+    config = app._from_yaml(config_path)
+    config['BROKER'] = {'host': broker_url}
+    config['SUBSCRIPTION-MANAGER-API'] = {**config.get('SUBSCRIPTION-MANAGER-API', {}),
+                                          'host': subscription_manager_address,
+                                          'https': False}
+    adsb = config['ADSB']
+    adsb['CITIES'] = {icao: {'ICAO': icao, 'LAT': lat, 'LNG': lng}
+                      for icao, (lat, lng) in airports.items()}
+    adsb['AREAS'] = {}
+    adsb['SNAPSHOTS_DIR'] = None
+    adsb['SHARDS'] = 1
+    adsb['ON_DEMAND_TOPICS'] = {'ENABLED': False}
+    adsb['OPENSKY_HOST'] = opensky_address
+    adsb['OPENSKY_HTTPS'] = False
+    if serializer is not None:
+        adsb['SERIALIZER'] = serializer
+
+    load_config_path = os.path.join(directory, 'config.yml')
+    with open(load_config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+
+    return app.Settings(config, config_path=load_config_path)
+
+
+def _measure(duration_in_sec: float) -> Dict[str, float]:
+    """
+    Measures the resources used by this process, i.e. by the app, for `duration_in_sec`.
+    """
+    usage_before, started_at = resource.getrusage(resource.RUSAGE_SELF), time.monotonic()
+    time.sleep(duration_in_sec)
+    usage_after, elapsed = resource.getrusage(resource.RUSAGE_SELF), time.monotonic() - started_at
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) \
+        + (usage_after.ru_stime - usage_before.ru_stime)
+
+    return {
+        'elapsed_sec': round(elapsed, 1),
+        'cpu_percent': round(100 * cpu / elapsed, 1),
+        'rss_mb': round(_get_rss_mb(), 1),
+        # in kilobytes on Linux
+        'peak_rss_mb': round(usage_after.ru_maxrss / 2 ** 10, 1),
+    }
+
+
+def run_load(num_aircraft: int,
+             num_airports: int,
+             churn_per_min: float,
+             duration_in_sec: float,
+             config_path: str,
+             serializer: Optional[str] = None,
+             seed: int = 0) -> Dict[str, Any]:
+    """
+    Runs the app for `duration_in_sec` against the stand-ins and returns the measurements.
+
+    The app publishes with the `SWIMPublisher` created from its config file, like in production.
+    Since the publisher cannot be stopped, the app keeps running in a daemon thread until the
+    process exits.
+    """
+    broker_url = f"localhost:{_get_free_port()}"
+
+    context = multiprocessing.get_context('spawn')
+    addresses, results, stopped = context.Queue(), context.Queue(), context.Event()
+    stand_ins = context.Process(target=_run_stand_ins,
+                                args=(num_airports, num_aircraft, churn_per_min, seed, broker_url,
+                                      addresses, stopped, results),
+                                name='stand-ins')
+    stand_ins.start()
+
+    try:
+        opensky_address, subscription_manager_address, airports = addresses.get(timeout=60)
+
+        with tempfile.TemporaryDirectory(prefix='swim-adsb-load-') as directory:
+            settings = _create_settings(config_path, directory, airports, opensky_address,
+                                        subscription_manager_address, broker_url, serializer)
+            swim_publisher = SWIMPublisher.create_from_config(settings.config_path)
+            probe = _PublisherProbe(swim_publisher)
+
+            threading.Thread(target=app.run,
+                             args=(settings, settings.city_airports, settings.areas),
+                             kwargs={'swim_publisher': swim_publisher},
+                             name='app',
+                             daemon=True).start()
+
+            measurements = _measure(duration_in_sec)
+    finally:
+        stopped.set()
+
+    stand_ins_results = results.get(timeout=60)
+    stand_ins.join()
+
+    return {
+        'aircraft': num_aircraft,
+        'airports': num_airports,
+        'churn_per_min': churn_per_min,
+        'topics': probe.topics,
+        'duration_sec': duration_in_sec,
+        'serializer': settings.adsb.get('SERIALIZER', SERIALIZER_JSON),
+        'engine': settings.engine,
+        'sent': probe.produced,
+        'publish_rate_per_sec': round(stand_ins_results['received'] / duration_in_sec, 1),
+        'tick_jitter_ms': _percentiles_in_ms(probe.tick_lags) if probe.tick_lags else None,
+        **stand_ins_results,
+        **measurements,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--aircraft', type=int, default=10000, help='number of aircraft in the air')
+    parser.add_argument('--airports', type=int, default=50,
+                        help='number of airports, each one being a city')
+    parser.add_argument('--churn', type=float, default=0.02,
+                        help='ratio of the aircraft landing and replaced by new ones every minute')
+    parser.add_argument('--duration', type=float, default=120, help='seconds to run the app for')
+    parser.add_argument('--config', default=app._get_config_path(),
+                        help='config file of the app, whose cities are replaced by the synthetic '
+                             'airports')
+    parser.add_argument('--serializer', choices=SERIALIZERS,
+                        help='overrides the SERIALIZER of the config')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to write the results to instead of the stdout')
+    args = parser.parse_args(args)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'run': run_load(args.aircraft, args.airports, args.churn, args.duration, args.config,
+                        serializer=args.serializer, seed=args.seed),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
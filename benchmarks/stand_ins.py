@@ -0,0 +1,405 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+"""
+Local stand-ins of OpenSky, of the subscription manager and of the broker, used to load the whole
+application offline.
+"""
+import json
+import math
+import random
+import string
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from proton.handlers import MessagingHandler
+
+__author__ = "EUROCONTROL (SWIM)"
+
+METERS_PER_DEGREE_OF_LATITUDE = 111_320
+
+
+class _Aircraft:
+    __slots__ = ('icao24', 'callsign', 'latitude', 'longitude', 'velocity', 'true_track', 'flight')
+
+    def __init__(self, icao24: str, callsign: str, latitude: float, longitude: float,
+                 velocity: float, true_track: float, flight: Optional[Dict[str, Any]]):
+        self.icao24 = icao24
+        self.callsign = callsign
+        self.latitude = latitude
+        self.longitude = longitude
+        self.velocity = velocity
+        self.true_track = true_track
+        self.flight = flight
+
+
+class SyntheticTraffic:
+    def __init__(self,
+                 num_airports: int,
+                 num_aircraft: int,
+                 connected_ratio: float = 0.3,
+                 churn_per_min: float = 0.02,
+                 seed: int = 0,
+                 timer: Callable[[], float] = time.time):
+        """
+        Live synthetic air traffic in the format of the OpenSky REST API. The aircraft fly straight
+        at a constant speed, and `churn_per_min` of them land every minute and are replaced by new
+        ones taking off, so that the flights keep changing like the real ones.
+
+        :param num_airports: the airports are named X000, X001, ...
+        :param num_aircraft: number of aircraft in the air at any time
+        :param connected_ratio: ratio of the aircraft flying between two of the airports
+        :param churn_per_min: ratio of the aircraft replaced every minute
+        :param seed:
+        :param timer:
+        """
+        self.connected_ratio = connected_ratio
+        self.churn_per_min = churn_per_min
+        self.timer = timer
+
+        self._rnd = random.Random(seed)
+        self._next_id = 0
+        self.airports = {f"X{i:03d}": (self._rnd.uniform(35, 60), self._rnd.uniform(-10, 30))
+                         for i in range(num_airports)}
+        self._flights: List[Dict[str, Any]] = []
+
+        self._updated_at = self.timer()
+        self._aircraft = [self._take_off(self._updated_at) for _ in range(num_aircraft)]
+        self._lock = threading.Lock()
+
+    def _take_off(self, now: float) -> _Aircraft:
+        rnd = self._rnd
+        icao24 = f"{self._next_id:06x}"
+        self._next_id += 1
+        callsign = ''.join(rnd.choices(string.ascii_uppercase, k=3)) + str(rnd.randint(100, 9999))
+
+        flight = None
+        if self.airports and rnd.random() < self.connected_ratio:
+            airports = list(self.airports)
+            flight = {'icao24': icao24,
+                      'firstSeen': int(now),
+                      'estDepartureAirport': rnd.choice(airports),
+                      'lastSeen': int(now),
+                      'estArrivalAirport': rnd.choice(airports),
+                      'callsign': callsign}
+            self._flights.append(flight)
+
+        return _Aircraft(icao24, callsign, rnd.uniform(-85, 85), rnd.uniform(-180, 180),
+                         rnd.uniform(100, 250), rnd.uniform(0, 360), flight)
+
+    def _advance(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        if elapsed <= 0:
+            return
+        self._updated_at = now
+
+        for aircraft in self._aircraft:
+            distance = aircraft.velocity * elapsed
+            track = math.radians(aircraft.true_track)
+            meters_per_degree_of_longitude = \
+                METERS_PER_DEGREE_OF_LATITUDE * max(math.cos(math.radians(aircraft.latitude)), 0.01)
+
+            aircraft.latitude = max(-85.0, min(85.0, aircraft.latitude + distance * math.cos(track)
+                                               / METERS_PER_DEGREE_OF_LATITUDE))
+            aircraft.longitude = (aircraft.longitude + distance * math.sin(track)
+                                  / meters_per_degree_of_longitude + 180) % 360 - 180
+            if aircraft.flight is not None:
+                aircraft.flight['lastSeen'] = int(now)
+
+        # the fractional part of the churn happens with the same probability
+        churn = self.churn_per_min * len(self._aircraft) * elapsed / 60
+        churn = int(churn) + (self._rnd.random() < churn - int(churn))
+        for i in self._rnd.sample(range(len(self._aircraft)), min(churn, len(self._aircraft))):
+            self._aircraft[i] = self._take_off(now)
+
+        # the flights older than a day are not asked for
+        self._flights = [flight for flight in self._flights
+                         if flight['lastSeen'] >= now - 24 * 3600]
+
+    def get_states(self,
+                   bounding_box: Optional[List[float]] = None,
+                   icao24s: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Returns the response of /states/all.
+
+        :param bounding_box: lamin, lamax, lomin, lomax
+        :param icao24s:
+        """
+        with self._lock:
+            now = self.timer()
+            self._advance(now)
+            aircraft = list(self._aircraft)
+
+        if bounding_box is not None:
+            lamin, lamax, lomin, lomax = bounding_box
+            aircraft = [a for a in aircraft
+                        if lamin <= a.latitude <= lamax and lomin <= a.longitude <= lomax]
+
+        if icao24s is not None:
+            icao24s = set(icao24s)
+            aircraft = [a for a in aircraft if a.icao24 in icao24s]
+
+        return {
+            'time': int(now),
+            'states': [[a.icao24, a.callsign, 'Nowhere', int(now), int(now), a.longitude,
+                        a.latitude, 10000.0, False, a.velocity, a.true_track, 0.0, None, 10000.0,
+                        None, False, 0]
+                       for a in aircraft]
+        }
+
+    def get_flights(self, kind: str, airport: str, begin: int, end: int) -> List[Dict[str, Any]]:
+        """
+        Returns the response of /flights/arrival or /flights/departure.
+
+        :param kind: 'arrival' or 'departure'
+        :param airport:
+        :param begin:
+        :param end:
+        """
+        with self._lock:
+            self._advance(self.timer())
+
+            if kind == 'arrival':
+                return [dict(f) for f in self._flights
+                        if f['estArrivalAirport'] == airport and begin <= f['lastSeen'] <= end]
+
+            return [dict(f) for f in self._flights
+                    if f['estDepartureAirport'] == airport and begin <= f['firstSeen'] <= end]
+
+
+class FakeOpenskyServer:
+    def __init__(self, traffic: SyntheticTraffic, host: str = 'localhost', port: int = 0):
+        """
+        Serves the synthetic traffic over HTTP like the OpenSky REST API (/api/states/all,
+        /api/flights/arrival and /api/flights/departure), with a thread per request.
+
+        :param traffic:
+        :param host:
+        :param port: 0 picks a free one
+        """
+        self.traffic = traffic
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                url = urllib.parse.urlparse(self.path)
+                params = urllib.parse.parse_qs(url.query)
+
+                if url.path == '/api/states/all':
+                    bounding_box = None
+                    if 'lamin' in params:
+                        bounding_box = [float(params[key][0])
+                                        for key in ('lamin', 'lamax', 'lomin', 'lomax')]
+                    body = server.traffic.get_states(bounding_box, params.get('icao24'))
+                elif url.path in ('/api/flights/arrival', '/api/flights/departure'):
+                    body = server.traffic.get_flights(kind=url.path.rsplit('/', 1)[1],
+                                                      airport=params['airport'][0],
+                                                      begin=int(params['begin'][0]),
+                                                      end=int(params['end'][0]))
+                else:
+                    self.send_error(404)
+                    return
+
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-opensky',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeSubscriptionManagerServer:
+    def __init__(self, host: str = 'localhost', port: int = 0):
+        """
+        Serves the part of the Subscription Manager REST API a publisher uses over HTTP: the topics
+        are created, listed and deleted, and no subscription is ever made. The credentials are not
+        checked and the prefix of the API is not, so that any version of the client reaches it.
+
+        :param host:
+        :param port: 0 picks a free one
+        """
+        self.topics: Dict[int, Dict[str, Any]] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def _handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        """
+        :return: the status code and the JSON body of the response
+        """
+        resource, _, topic_id = urllib.parse.urlparse(path).path.rstrip('/').rpartition('/')
+
+        if topic_id == 'subscriptions':
+            return 200, [] if method == 'GET' else {}
+
+        if topic_id == 'topics':
+            if method == 'GET':
+                return 200, list(self.topics.values())
+            if method == 'POST':
+                topic = {'id': max(self.topics, default=0) + 1, 'name': (body or {}).get('name')}
+                self.topics[topic['id']] = topic
+                return 201, topic
+            return 405, {}
+
+        if resource.endswith('/topics') and topic_id.isdigit():
+            topic = self.topics.get(int(topic_id))
+            if topic is None:
+                return 404, {'detail': 'Topic not found'}
+            if method == 'DELETE':
+                del self.topics[topic['id']]
+                return 204, None
+            if method == 'PUT':
+                topic.update(body or {})
+            return 200, topic
+
+        return 404, {'detail': 'Not found'}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+
+                with server._lock:
+                    server.requests += 1
+                    status, response = server._handle(self.command, self.path, body)
+
+                data = b'' if response is None else json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='fake-subscription-manager',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class AmqpSink(MessagingHandler):
+    def __init__(self, url: str, is_stopped: Callable[[], bool]):
+        """
+        Stands in for the broker: accepts the connections of the publishers and counts the messages
+        they send, along with their latency when they carry their creation time and the topics
+        (subjects) they were published to.
+
+        Meant to be run by a `proton.reactor.Container`, which it stops once `is_stopped` returns
+        True.
+
+        :param url: the address to listen to, e.g. 'localhost:5672'
+        :param is_stopped: e.g. the `is_set` of an event
+        """
+        super().__init__()
+        self.url = url
+        self.is_stopped = is_stopped
+
+        self.messages = 0
+        self.bytes = 0
+        self.latencies: List[float] = []
+        self.addresses = set()
+        self.subjects = set()
+        self._acceptor = None
+
+    def on_start(self, event):
+        self._acceptor = event.container.listen(self.url)
+        event.container.schedule(0.2, self)
+
+    def on_timer_task(self, event):
+        if self.is_stopped():
+            self._acceptor.close()
+            event.container.stop()
+        else:
+            event.container.schedule(0.2, self)
+
+    def on_link_opening(self, event):
+        # echoes the address of the publishers like a broker does, which some clients check
+        if event.link.is_receiver:
+            event.link.target.address = event.link.remote_target.address
+
+    def on_message(self, event):
+        message = event.message
+        self.messages += 1
+        if message.body is not None:
+            self.bytes += len(message.body)
+        if message.creation_time:
+            self.latencies.append(time.time() - message.creation_time)
+        self.addresses.add(event.link.remote_target.address)
+        if message.subject:
+            self.subjects.add(message.subject)
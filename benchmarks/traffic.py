@@ -0,0 +1,200 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+"""
+Benchmarks the publishing hot path by replaying fixtures through `AirTraffic`.
+
+Usage:
+    python -m benchmarks.traffic --airports 5 50 500 --states 10000 100000 --output results.json
+    python -m benchmarks.traffic --fixture recorded.json --serializer packed
+    python -m benchmarks.traffic --record recorded.json --record-airports EBBR EHAM LFPG
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from functools import partial
+from typing import Dict, Any, List
+
+from benchmarks.fixtures import ReplayOpenskyClient, generate_fixture, load_fixture, \
+    record_fixture, save_fixture
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.serializers import SERIALIZERS, SERIALIZER_JSON
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _percentiles_in_ms(values: List[float]) -> Dict[str, float]:
+    values_in_ms = [value * 1000 for value in values]
+    if len(values_in_ms) < 2:
+        values_in_ms = values_in_ms * 2
+
+    quantiles = statistics.quantiles(values_in_ms, n=100, method='inclusive')
+
+    return {
+        'p50': round(quantiles[49], 3),
+        'p90': round(quantiles[89], 3),
+        'p99': round(quantiles[98], 3),
+        'max': round(max(values_in_ms), 3),
+    }
+
+
+def _create_air_traffic(fixture: Dict[str, Any], serializer: str):
+    client = ReplayOpenskyClient(fixture)
+    airports = sorted(set(fixture['arrivals']) | set(fixture['departures']))
+    air_traffic = AirTraffic(traffic_time_span_in_days=1, airports=airports, client=client,
+                             serializer=serializer)
+
+    handlers = [partial(air_traffic.arrivals_handler, airport) for airport in airports] + \
+               [partial(air_traffic.departures_handler, airport) for airport in airports]
+
+    return client, air_traffic, handlers
+
+
+def _run_ticks(client: ReplayOpenskyClient, handlers, ticks: int, ticks_per_snapshot: int):
+    """
+    Calls every topic handler once per tick and moves to the next states snapshot every
+    `ticks_per_snapshot` ticks.
+    """
+    tick_latencies, messages, payload_bytes = [], 0, 0
+
+    for tick in range(ticks):
+        if tick > 0 and tick % ticks_per_snapshot == 0:
+            client.next_snapshot()
+            AirTraffic.get_states_table.cache.clear()
+
+        started_at = time.perf_counter()
+        for handler in handlers:
+            message = handler()
+            if message is not None:
+                messages += 1
+                payload_bytes += len(message.body)
+        tick_latencies.append(time.perf_counter() - started_at)
+
+    return tick_latencies, messages, payload_bytes
+
+
+def run_scenario(name: str,
+                 fixture: Dict[str, Any],
+                 ticks: int,
+                 ticks_per_snapshot: int,
+                 serializer: str = SERIALIZER_JSON) -> Dict[str, Any]:
+    """
+    Replays a fixture and returns the measurements.
+
+    The timings and the memory are measured in two separate runs since tracing the memory
+    allocations slows the code down considerably.
+    """
+    client, air_traffic, handlers = _create_air_traffic(fixture, serializer)
+    air_traffic.fetch_flight_connections()
+
+    started_at = time.perf_counter()
+    tick_latencies, messages, payload_bytes = _run_ticks(client, handlers, ticks,
+                                                         ticks_per_snapshot)
+    elapsed = time.perf_counter() - started_at
+
+    client, air_traffic, handlers = _create_air_traffic(fixture, serializer)
+    AirTraffic.get_states_table.cache.clear()
+    tracemalloc.start()
+    air_traffic.fetch_flight_connections()
+    _run_ticks(client, handlers,
+               ticks=2 * ticks_per_snapshot,
+               ticks_per_snapshot=ticks_per_snapshot)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'airports': len(handlers) // 2,
+        'topics': len(handlers),
+        'states': len(fixture['states'][0]['states']),
+        'ticks': ticks,
+        'ticks_per_snapshot': ticks_per_snapshot,
+        'serializer': serializer,
+        'messages': messages,
+        'throughput_messages_per_sec': round(messages / elapsed, 1),
+        'throughput_bytes_per_sec': round(payload_bytes / elapsed, 1),
+        'tick_latency_ms': _percentiles_in_ms(tick_latencies),
+        'peak_memory_mb': round(peak_memory / 2 ** 20, 2),
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--airports', type=int, nargs='+', default=[5, 50, 500],
+                        help='number of airports of the synthetic scenarios')
+    parser.add_argument('--states', type=int, nargs='+', default=[10000, 100000],
+                        help='number of aircraft of the synthetic scenarios')
+    parser.add_argument('--fixture', nargs='*', default=[],
+                        help='fixture files to replay instead of the synthetic scenarios')
+    parser.add_argument('--ticks', type=int, default=30)
+    parser.add_argument('--ticks-per-snapshot', type=int, default=6,
+                        help='number of publish ticks served by the same states snapshot')
+    parser.add_argument('--serializer', choices=SERIALIZERS, default=SERIALIZER_JSON)
+    parser.add_argument('--output', help='file to write the results to instead of the stdout')
+    parser.add_argument('--record',
+                        help='records a fixture from OpenSky in the given file and exits')
+    parser.add_argument('--record-airports', nargs='+',
+                        default=['EBBR', 'EHAM', 'LFPG', 'EDDB', 'LGAV'])
+    args = parser.parse_args(args)
+
+    if args.record:
+        save_fixture(record_fixture(args.record_airports), args.record)
+        return
+
+    if args.fixture:
+        scenarios = ((filename, load_fixture(filename)) for filename in args.fixture)
+    else:
+        scenarios = ((f"synthetic-{airports}-airports-{states}-states",
+                      generate_fixture(airports, states))
+                     for airports in args.airports for states in args.states)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': [run_scenario(name, fixture, args.ticks, args.ticks_per_snapshot,
+                                   args.serializer)
+                      for name, fixture in scenarios],
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
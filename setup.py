@@ -37,9 +37,12 @@ setup(
     description='SWIM ADSB',
     author='EUROCONTROL (SWIM)',
     author_email='',
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     url='https://github.com/eurocontrol-swim/swim-adsb',
     install_requires=[],
+    entry_points={
+        'console_scripts': ['swim-adsb=swim_adsb.app:main']
+    },
     tests_require=[
         'pytest',
         'pytest-cov'
@@ -0,0 +1,113 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import logging
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from swim_adsb.adsb.metrics import registry
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+_active_topics = registry.gauge('active_topics', 'Number of topics with active subscribers')
+
+
+class TopicActivity:
+    def __init__(self,
+                 get_active_topic_ids: Callable[[], Iterable[str]],
+                 on_change: Optional[Callable[[], None]] = None):
+        """
+        Keeps track of the topics with active subscribers, as reported by the subscription manager,
+        so that the idle topics are not produced and the flight connections of their airports are
+        not retrieved from OpenSky.
+
+        Until the first successful report every topic is considered active, and a failed report
+        keeps the previous one, so that an unreachable subscription manager never silences the
+        topics.
+
+        :param get_active_topic_ids: returns the ids of the topics with active subscribers
+        :param on_change: called whenever the set of active topics changes
+        """
+        self.get_active_topic_ids = get_active_topic_ids
+        self.on_change = on_change
+
+        self._topics: Dict[str, Tuple[str, str]] = {}
+        self._active: Optional[FrozenSet[Tuple[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def add_topic(self, topic_id: str, kind: str, name: str) -> None:
+        """
+        :param topic_id: the id of the topic in the subscription manager
+        :param kind: 'arrivals', 'departures', 'tracks' or 'area'
+        :param name: icao of the airport or name of the area
+        """
+        with self._lock:
+            self._topics[topic_id] = (kind, name)
+
+    def is_active(self, kind: str, name: str) -> bool:
+        """
+        :param kind: 'arrivals', 'departures', 'tracks' or 'area'
+        :param name: icao of the airport or name of the area
+        """
+        active = self._active
+
+        return active is None or (kind, name) in active
+
+    def is_airport_active(self, icao: str) -> bool:
+        """
+        Whether any topic of an airport (arrivals, departures or tracks) is active.
+
+        :param icao:
+        """
+        return any(self.is_active(kind, icao) for kind in ('arrivals', 'departures', 'tracks'))
+
+    def refresh(self) -> None:
+        """
+        Asks the subscription manager for the topics with active subscribers.
+        """
+        try:
+            topic_ids: Set[str] = set(self.get_active_topic_ids())
+        except Exception as e:
+            _logger.error(f"Failed to retrieve the active topics: {e}")
+            return
+
+        with self._lock:
+            active = frozenset(topic for topic_id, topic in self._topics.items()
+                               if topic_id in topic_ids)
+            is_changed = active != self._active
+            self._active = active
+
+        _active_topics.set(len(active))
+
+        if is_changed:
+            _logger.info(f"{len(active)} of {len(self._topics)} topics are active")
+            if self.on_change is not None:
+                self.on_change()
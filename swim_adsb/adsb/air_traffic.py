@@ -27,177 +27,1015 @@ http://opensource.org/licenses/BSD-3-Clause
 
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
-import json
+import asyncio
+import inspect
+import itertools
 import logging
-from datetime import datetime, timedelta
-from typing import Tuple, List, Callable, Dict, Optional, Union, Any
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Executor
+from typing import Tuple, List, Callable, Dict, Optional, Union, Any, Iterable, NamedTuple, Set
 
-from cachetools import cached, TTLCache
+from cachetools.keys import hashkey
 from opensky_network_client.models import FlightConnection, StateVector
 from opensky_network_client.opensky_network import OpenskyNetworkClient
 from proton import Message
 
+from swim_adsb.adsb.activation import TopicActivity
+from swim_adsb.adsb.caching import single_flight_cached
+from swim_adsb.adsb.extrapolation import ExtrapolatedPositions
+from swim_adsb.adsb.flight_connections import FlightConnectionStore
+from swim_adsb.adsb.geo import BoundingBox, Geofence
+from swim_adsb.adsb.governor import RequestDeferred, RequestGovernor
+from swim_adsb.adsb.history import FlightHistory
+from swim_adsb.adsb.metrics import registry, Histogram
+from swim_adsb.adsb.payloads import TopicPayload, check_payload_settings, PUBLISH_ALWAYS, \
+    FORMAT_FULL
+from swim_adsb.adsb.refresher import PeriodicRefresher
+from swim_adsb.adsb.scheduling import AdaptiveScheduler
+from swim_adsb.adsb.serializers import SERIALIZER_JSON, SERIALIZER_PACKED
+from swim_adsb.adsb.snapshots import SnapshotStore
+from swim_adsb.adsb.spatial import GridIndex
+from swim_adsb.adsb.states import StatesTable
+
 __author__ = "EUROCONTROL (SWIM)"
 
 _logger = logging.getLogger(__name__)
 
+_index_versions = itertools.count()
+
+# above this number of aircraft the states are not filtered by icao24 on OpenSky's side as the
+# request would get too long
+MAX_ICAO24_PER_STATES_REQUEST = 500
+
+# the aircraft of the flight connections last seen longer ago than that are not expected to be in
+# the air anymore, so their states are not asked for
+AIRBORNE_WITHIN_IN_SEC = 2 * 3600
+
 AirTrafficDataType = Dict[str, Union[str, float, int]]
 
+_opensky_request_duration = {
+    endpoint: registry.histogram('opensky_request_duration_seconds',
+                                 'Duration of the requests to OpenSky',
+                                 endpoint=endpoint)
+    for endpoint in ('states', 'arrivals', 'departures')
+}
+_opensky_request_errors = {
+    endpoint: registry.counter('opensky_request_errors_total',
+                               'Number of failed requests to OpenSky',
+                               endpoint=endpoint)
+    for endpoint in ('states', 'arrivals', 'departures')
+}
+_states_snapshot_size = registry.gauge('states_snapshot_size',
+                                       'Number of aircraft in the states snapshot')
+_flight_index_build_duration = registry.histogram('flight_index_build_duration_seconds',
+                                                  'Time spent joining a states snapshot with the '
+                                                  'flight connections')
+_flight_index_size = registry.gauge('flight_index_size', 'Number of flights in the flight index')
+
+
+class IndexedFlight(NamedTuple):
+    """
+    The join of an ongoing flight with the airports it is arriving to or departing from.
+    """
+    row: int
+    arrivals: Dict[str, FlightConnection]
+    departures: Dict[str, FlightConnection]
+
+
+class FlightIndex:
+    def __init__(self,
+                 states: StatesTable,
+                 arrivals: Dict[str, List[FlightConnection]],
+                 departures: Dict[str, List[FlightConnection]]):
+        """
+        Joins a states snapshot with the flight connections of all the monitored airports in a
+        single pass, so that the arrivals and departures of any airport can be looked up without
+        scanning the snapshot again.
+
+        :param states: the states snapshot
+        :param arrivals: the flight arrivals keyed by airport icao
+        :param departures: the flight departures keyed by airport icao
+        """
+        self.version = next(_index_versions)
+        self.states = states
+        self.flights: Dict[str, IndexedFlight] = {}
+        self.arrivals: Dict[str, List[AirTrafficDataType]] = {a: [] for a in arrivals}
+        self.departures: Dict[str, List[AirTrafficDataType]] = {a: [] for a in departures}
+
+        with _flight_index_build_duration.time():
+            self._join(arrivals, self.arrivals, lambda flight: flight.arrivals)
+            self._join(departures, self.departures, lambda flight: flight.departures)
+
+        _flight_index_size.set(len(self.flights))
+
+    def _join(self,
+              flight_connections_per_airport: Dict[str, List[FlightConnection]],
+              data_per_airport: Dict[str, List[AirTrafficDataType]],
+              get_flight_airports: Callable[[IndexedFlight], Dict[str, FlightConnection]]) -> None:
+        """
+        Matches the flight connections of every airport with the states snapshot and appends the
+        data of the matched flights to the corresponding airport.
+
+        :param flight_connections_per_airport:
+        :param data_per_airport:
+        :param get_flight_airports: returns the airports of an indexed flight to be updated
+        """
+        for airport, flight_connections in flight_connections_per_airport.items():
+            # only one flight connection is kept per aircraft
+            flight_connections_dict = {fc.icao24: fc for fc in flight_connections if fc.icao24}
+
+            for icao24, fc in flight_connections_dict.items():
+                row = self.states.row(icao24)
+
+                if row is None:
+                    continue
+
+                flight = self.flights.get(icao24)
+                if flight is None:
+                    flight = IndexedFlight(row=row, arrivals={}, departures={})
+                    self.flights[icao24] = flight
+
+                get_flight_airports(flight)[airport] = fc
+                data_per_airport[airport].append(AirTraffic._get_flight_data(self.states, row, fc))
+
+
+def _get_keyword_parameters(method: Callable) -> Optional[Set[str]]:
+    """
+    Returns the names of the keyword arguments the method accepts, or None if it accepts any.
+    """
+    try:
+        parameters = inspect.signature(method).parameters.values()
+    except (TypeError, ValueError):
+        # no signature available, e.g. a builtin
+        return None
+
+    if any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters):
+        return None
+
+    return {parameter.name for parameter in parameters
+            if parameter.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                                  inspect.Parameter.KEYWORD_ONLY)}
+
 
 class AirTraffic:
-    def __init__(self, traffic_time_span_in_days):
+    def __init__(self,
+                 traffic_time_span_in_days,
+                 airports: Optional[Iterable[str]] = None,
+                 publish_mode: str = PUBLISH_ALWAYS,
+                 payload_format: str = FORMAT_FULL,
+                 keyframe_interval_in_sec: float = 60,
+                 serializer: str = SERIALIZER_JSON,
+                 max_concurrent_requests: int = 8,
+                 flight_connections_overlap_in_sec: int = 3600,
+                 states_bounding_box: Optional[BoundingBox] = None,
+                 filter_states_by_icao24: bool = False,
+                 snapshot_store: Optional[SnapshotStore] = None,
+                 extrapolate_positions: bool = False,
+                 max_extrapolation_in_sec: float = 60,
+                 extrapolation_step_in_sec: float = 1,
+                 flight_connections_scheduler: Optional[AdaptiveScheduler] = None,
+                 states_source: Optional[Callable[[], StatesTable]] = None,
+                 areas: Optional[Dict[str, Geofence]] = None,
+                 client: Optional[OpenskyNetworkClient] = None,
+                 topic_activity: Optional[TopicActivity] = None,
+                 flight_history: Optional[FlightHistory] = None):
         """
         Using the OpenSky Network API it tracks the flights from and to specific airports.
 
         :param traffic_time_span_in_days:
+        :param airports: the icao of the airports to track. Airports requested later via the
+                         handlers are added on the fly.
+        :param publish_mode: whether the topics publish on every tick or only when their payload
+                             changes (see `swim_adsb.adsb.payloads.PUBLISH_MODES`)
+        :param payload_format: whether the topics carry the full list of flights or only the
+                               changes since the previous payload (see
+                               `swim_adsb.adsb.payloads.PAYLOAD_FORMATS`)
+        :param keyframe_interval_in_sec: how often the full list of flights is published when
+                                         only the changes are published otherwise
+        :param serializer: how the payloads are encoded into the message bodies (see
+                           `swim_adsb.adsb.serializers.SERIALIZERS`)
+        :param max_concurrent_requests: maximum number of concurrent requests to OpenSky when
+                                        retrieving the flight connections of several airports
+        :param flight_connections_overlap_in_sec: how far before the previous retrieval the flight
+                                                  connections are retrieved again, in order to
+                                                  catch the ones reported late by OpenSky
+        :param states_bounding_box: if provided only the states within it are retrieved
+        :param filter_states_by_icao24: if True only the states of the aircraft found in the
+                                        arrivals and departures of the airports are retrieved
+        :param snapshot_store: if provided the retrieved snapshots are saved in it, and the ones
+                               saved by a previous run are served from the start until the fresh
+                               ones are retrieved
+        :param extrapolate_positions: if True the positions are projected to the time they are
+                                      published, based on the velocity and the track of the
+                                      aircraft, instead of being published as retrieved
+        :param max_extrapolation_in_sec: positions older than that are published as retrieved
+        :param extrapolation_step_in_sec: the positions are projected to the start of the step of
+                                          that length containing the publishing time, so that the
+                                          topics published within a step share the projection
+        :param flight_connections_scheduler: if provided, the background retrievals of the flight
+                                             connections only retrieve the airports it considers
+                                             due, depending on how much their traffic changes
+        :param states_source: if provided the states are taken from it instead of being retrieved
+                              from OpenSky, e.g. from another process retrieving them on behalf of
+                              several ones. It should return the same table as long as the states
+                              do not change.
+        :param areas: the geofences of the area topics keyed by area name
+        :param client: the client used to access OpenSky. Defaults to one for opensky-network.org
+        :param topic_activity: if provided, the topics without active subscribers produce nothing
+                               and the flight connections of their airports are not retrieved.
+                               `reload_airports` should be called when it changes.
+        :param flight_history: if provided, the positions of the flights are recorded in it on
+                               every states snapshot, and served by the 'tracks' topics
         """
         self.traffic_time_span_in_days = traffic_time_span_in_days
-        self.client = OpenskyNetworkClient.create('opensky-network.org', timeout=30)
+        self.client = client or OpenskyNetworkClient.create('opensky-network.org', timeout=30)
+        self.arrivals_store = FlightConnectionStore(
+            fetch=lambda icao, begin, end: self._request_flight_connections(
+                'arrivals', self.client.get_flight_arrivals, icao, begin, end),
+            time_span_in_days=traffic_time_span_in_days,
+            overlap_in_sec=flight_connections_overlap_in_sec,
+            seen_at=lambda fc: fc.last_seen
+        )
+        self.departures_store = FlightConnectionStore(
+            fetch=lambda icao, begin, end: self._request_flight_connections(
+                'departures', self.client.get_flight_departures, icao, begin, end),
+            time_span_in_days=traffic_time_span_in_days,
+            overlap_in_sec=flight_connections_overlap_in_sec,
+            seen_at=lambda fc: fc.first_seen
+        )
+        self.airports = list(airports or [])
+        self.publish_mode = publish_mode
+        self.payload_format = payload_format
+        self.keyframe_interval_in_sec = keyframe_interval_in_sec
+        # fails early rather than on every tick of every topic
+        check_payload_settings(publish_mode, payload_format, serializer)
+        self.serializer = serializer
+        self.max_concurrent_requests = max_concurrent_requests
+        # shared by all the retrievals of the flight connections, including the refreshes of the
+        # expired ones, so that no more than `max_concurrent_requests` run at once
+        self._flight_connections_executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests,
+            thread_name_prefix='flight-connections'
+        )
+        self.states_bounding_box = states_bounding_box
+        self.filter_states_by_icao24 = filter_states_by_icao24
+        # the client whose support of the states filters was checked, along with the names of the
+        # filters it supports (None for any)
+        self._states_filters_support: Optional[Tuple[Any, Optional[Set[str]]]] = None
+        self._index: Optional[FlightIndex] = None
+        self._index_lock = threading.Lock()
+        self._topic_payloads: Dict[Tuple[str, str], TopicPayload] = {}
+        self._topic_producer_durations: Dict[Tuple[str, str], Histogram] = {}
 
-    @property
-    def _days_span_in_timestamps(self) -> Tuple[int, int]:
+        self.extrapolate_positions = extrapolate_positions
+        self.max_extrapolation_in_sec = max_extrapolation_in_sec
+        self.extrapolation_step_in_sec = extrapolation_step_in_sec
+        # the latest projection along with the version of the index it was computed from
+        self._extrapolated_positions: Optional[Tuple[int, ExtrapolatedPositions]] = None
+        # the aircraft published by the topics along with the version of the index they are from
+        self._published_icao24s: Optional[Tuple[int, Set[str]]] = None
+        self._extrapolation_lock = threading.Lock()
+
+        self.flight_connections_scheduler = flight_connections_scheduler
+        self.states_source = states_source
+        self.areas = dict(areas or {})
+        self.topic_activity = topic_activity
+        self.flight_history = flight_history
+        # set when the airports changed while the snapshots are refreshed by the caller, so that
+        # the caller refreshes the flight connections without waiting for their next interval
+        self.flight_connections_outdated = False
+        # built once per states snapshot, on demand
+        self._grid_index: Optional[GridIndex] = None
+        self._grid_index_lock = threading.Lock()
+
+        # used when the snapshots are refreshed in the background
+        self.refresher: Optional[PeriodicRefresher] = None
+        # set when the snapshots are refreshed by the caller via the `refresh_*_async` coroutines
+        self.is_refreshed_externally = False
+        self._states = StatesTable.from_state_vectors([])
+        self._arrivals: Dict[str, List[FlightConnection]] = {}
+        self._departures: Dict[str, List[FlightConnection]] = {}
+        self._last_good_states = self._states
+
+        self.snapshot_store = snapshot_store
+        # whether the snapshots of a previous run were found, in which case they are served until
+        # the fresh ones are retrieved
+        self.has_restored_snapshots = False
+        if self.snapshot_store is not None:
+            self._load_snapshots()
+
+    def _load_snapshots(self) -> None:
+        """
+        Restores the snapshots saved by a previous run. They are cached as expired, so that they
+        are served right away while the fresh ones are retrieved in the background, and the flight
+        connection stores carry on retrieving only what is missing since the previous run.
         """
+        for kind, store in (('arrivals', self.arrivals_store),
+                            ('departures', self.departures_store)):
+            dump = self.snapshot_store.load_flight_connections(kind)
+            if dump is not None:
+                store.load(dump)
+                self.has_restored_snapshots = True
 
-        Returns the timestamp of the start (00:00:00 AM) of the day `traffic_time_span_in_days`
-        before the current one and the timestamp of the end (23:59:59 PM) of the current day.
+        self._arrivals = {a: self.arrivals_store.get(a) for a in self.airports}
+        self._departures = {a: self.departures_store.get(a) for a in self.airports}
 
-        Timestamps are in seconds since UNIX epoch.
+        for airport in self.airports:
+            self._arrivals_today_handler.cache.set(
+                hashkey(self, airport), self._arrivals[airport], ttl=0)
+            self._departures_today_handler.cache.set(
+                hashkey(self, airport), self._departures[airport], ttl=0)
 
-        :return:
+        states = self.snapshot_store.load_states()
+        if states is not None:
+            self.has_restored_snapshots = True
+            self._states = self._last_good_states = states
+            self.get_states_table.cache.set(hashkey(self), states, ttl=0)
+
+        self._swap_index()
+
+    def _save_flight_connections(self) -> None:
+        if self.snapshot_store is not None:
+            self.snapshot_store.save_flight_connections('arrivals', self.arrivals_store.dump())
+            self.snapshot_store.save_flight_connections('departures', self.departures_store.dump())
+
+    def fetch_states_table(self) -> StatesTable:
         """
-        last_day = datetime.today()
-        first_day = last_day - timedelta(days=self.traffic_time_span_in_days)
+        Retrieves the states into a new table and saves it in the snapshot store if any. If a
+        `states_source` is provided the states are taken from it instead.
 
-        start_of_first_day = first_day.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_last_day = last_day.replace(hour=23, minute=59, second=59, microsecond=999999)
+        If the states cannot be retrieved the last retrieved table is returned again.
+        """
+        if self.states_source is not None:
+            return self.states_source()
+
+        state_vectors = self._get_states()
+        if state_vectors is None:
+            # publishing the previous snapshot again beats publishing nothing at all
+            return self._last_good_states
+
+        states = self._last_good_states = StatesTable.from_state_vectors(state_vectors)
+
+        if self.snapshot_store is not None:
+            self.snapshot_store.save_states(states)
 
-        return int(start_of_first_day .timestamp()), int(end_of_last_day.timestamp())
+        return states
 
-    def _flight_connections_today(self, icao: str, callback: Callable) -> List[FlightConnection]:
+    @staticmethod
+    def _request_flight_connections(endpoint: str,
+                                    callback: Callable[[str, int, int], List[FlightConnection]],
+                                    icao: str,
+                                    begin: int,
+                                    end: int) -> List[FlightConnection]:
         """
-        Returns the flight connections (arrivals or departures based on the callback) of the current
-        day.
+        Requests the flight connections from OpenSky while keeping track of the duration and the
+        errors of the requests.
 
+        :param endpoint: 'arrivals' or 'departures'
+        :param callback: the method of the client to use
         :param icao: airport identifier
+        :param begin: timestamp of the start of the interval
+        :param end: timestamp of the end of the interval
         """
-        begin, end = self._days_span_in_timestamps
-
         try:
-            result = callback(icao, begin, end)
-        except Exception as e:
-            _logger.error(str(e))
-            result = []
-
-        return result
+            with _opensky_request_duration[endpoint].time():
+                return callback(icao, begin, end)
+        except RequestDeferred:
+            raise
+        except Exception:
+            _opensky_request_errors[endpoint].inc()
+            raise
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=600))
+    @single_flight_cached(ttl=600,
+                          executor=lambda self, icao: self._flight_connections_executor)
     def _arrivals_today_handler(self, icao: str) -> List[FlightConnection]:
         """
-        Returns the flight arrivals of the current day.
+        Returns the flight arrivals from the start of the day `traffic_time_span_in_days` before
+        the current one up to the end of the current day. Only the ones since the previous call are
+        retrieved from OpenSky (see `FlightConnectionStore`).
 
         The result is cached for 10 minutes (could be more) as the flight arrivals do not change so
-        often within a day
+        often within a day. Once expired, the previous result keeps being served while it is
+        refreshed in the background.
 
         :param icao: airport identifier
         """
-        return self._flight_connections_today(icao, callback=self.client.get_flight_arrivals)
+        result = self.arrivals_store.refresh(icao)
+        self._save_flight_connections()
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=600))
+        return result
+
+    @single_flight_cached(ttl=600,
+                          executor=lambda self, icao: self._flight_connections_executor)
     def _departures_today_handler(self, icao: str) -> List[FlightConnection]:
         """
-        Returns the flight departures of the current day.
+        Returns the flight departures from the start of the day `traffic_time_span_in_days` before
+        the current one up to the end of the current day. Only the ones since the previous call are
+        retrieved from OpenSky (see `FlightConnectionStore`).
 
         The result is cached for 10 minutes (could be more) as the flight departures do not change
-        so often within a day
+        so often within a day. Once expired, the previous result keeps being served while it is
+        refreshed in the background.
 
         :param icao: airport identifier
         """
-        return self._flight_connections_today(icao, callback=self.client.get_flight_departures)
+        result = self.departures_store.refresh(icao)
+        self._save_flight_connections()
+
+        return result
+
+    def fetch_flight_connections(self, airports: Optional[Iterable[str]] = None) \
+            -> Tuple[Dict[str, List[FlightConnection]], Dict[str, List[FlightConnection]]]:
+        """
+        Retrieves the arrivals and the departures of several airports concurrently, with up to
+        `max_concurrent_requests` requests at a time, and caches them so that the arrivals and
+        departures handlers do not have to retrieve them again.
 
-    def _get_states(self) -> List[StateVector]:
+        :param airports: icao of the airports. Defaults to all the tracked airports, except the
+                         ones without active topics.
+        :return: the arrivals and the departures keyed by airport icao
         """
-        Returns the current list of flight states
+        airports = list(self.get_active_airports() if airports is None else airports)
+
+        executor = self._flight_connections_executor
+        arrivals_futures = {a: executor.submit(self.arrivals_store.refresh, a)
+                            for a in airports}
+        departures_futures = {a: executor.submit(self.departures_store.refresh, a)
+                              for a in airports}
+
+        arrivals = {a: future.result() for a, future in arrivals_futures.items()}
+        departures = {a: future.result() for a, future in departures_futures.items()}
+
+        for airport in airports:
+            self._arrivals_today_handler.cache.set(hashkey(self, airport), arrivals[airport])
+            self._departures_today_handler.cache.set(hashkey(self, airport), departures[airport])
+
+        self._save_flight_connections()
+
+        return arrivals, departures
+
+    def _get_states(self) -> Optional[List[StateVector]]:
+        """
+        Returns the current list of flight states, restricted to `states_bounding_box` and/or to
+        the aircraft of the airports' flight connections if configured so, or None if they could
+        not be retrieved.
         """
+        icao24s = self._get_flight_connections_icao24s() if self.filter_states_by_icao24 else None
+
         try:
-            states = self.client.get_states()
-            result = states.states
+            with _opensky_request_duration['states'].time():
+                result = self._request_states(icao24s)
+        except RequestDeferred as e:
+            _logger.info(f"States not retrieved: {e}")
+            return None
         except Exception as e:
+            _opensky_request_errors['states'].inc()
             _logger.error(str(e))
-            result = []
+            return None
+
+        if self.states_bounding_box is not None:
+            result = [state for state in result
+                      if self.states_bounding_box.contains(state.latitude, state.longitude)]
+
+        if icao24s:
+            result = [state for state in result if state.icao24 in icao24s]
+
+        _states_snapshot_size.set(len(result))
 
         return result
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=30))
-    def get_states_dict(self, context: Optional[Any] = None) -> Dict[str, StateVector]:
+    def _request_states(self, icao24s: Optional[Set[str]]) -> List[StateVector]:
         """
+        Requests the states from OpenSky, letting it do the filtering if the client supports it.
+        The states are filtered locally anyway.
+
+        :param icao24s:
         """
-        states = self._get_states()
+        filters = {}
+
+        if self.states_bounding_box is not None:
+            filters.update(self.states_bounding_box.to_opensky_params())
+
+        if icao24s and len(icao24s) <= MAX_ICAO24_PER_STATES_REQUEST:
+            filters['icao24'] = sorted(icao24s)
+        elif icao24s:
+            _logger.debug(f"The states of {len(icao24s)} aircraft are requested without filtering "
+                          f"them by icao24 (at most {MAX_ICAO24_PER_STATES_REQUEST})")
 
-        return {state.icao24: state for state in states}
+        if filters and self._supports_states_filters(filters):
+            return self.client.get_states(**filters).states
 
-    def arrivals_handler(self, airport: str, context: Optional[Any] = None) -> Message:
+        return self.client.get_states().states
+
+    def _supports_states_filters(self, filters: Dict[str, Any]) -> bool:
         """
-        Is the callback that will be used to the arrival related topics
+        Whether the client can filter the states with the given filters, based on the signature of
+        its `get_states`, which is checked once per client.
+
+        :param filters:
         """
-        states_dict = self.get_states_dict()
+        client = self.client
+        if self._states_filters_support is None or self._states_filters_support[0] is not client:
+            # the governor forwards the filters as is to the client it governs
+            governed_client = client.client if isinstance(client, RequestGovernor) else client
+            supported = _get_keyword_parameters(governed_client.get_states)
+            self._states_filters_support = (client, supported)
 
-        data = self._flight_connection_handler(
-            airport,
-            states_dict=states_dict,
-            get_flight_connections_handler=self._arrivals_today_handler
-        )
+            if supported is not None and not supported.issuperset(filters):
+                _logger.warning('The OpenSky client cannot filter the states. They will be '
+                                'filtered locally instead.')
 
-        return Message(body=json.dumps(data), content_type='application/json')
+        supported = self._states_filters_support[1]
+        return supported is None or supported.issuperset(filters)
 
-    def departures_handler(self, airport: str, context: Optional[Any] = None) -> Message:
+    def _get_flight_connections_icao24s(self) -> Set[str]:
         """
-        Is the callback that will be used to the departure related topics
+        Returns the icao24 of the aircraft found in the arrivals and departures of the active
+        airports retrieved so far which may still be in the air, i.e. last seen within
+        `AIRBORNE_WITHIN_IN_SEC`.
         """
-        states_dict = self.get_states_dict()
+        seen_since = time.time() - AIRBORNE_WITHIN_IN_SEC
 
-        data = self._flight_connection_handler(
-            airport,
-            states_dict=states_dict,
-            get_flight_connections_handler=self._departures_today_handler
-        )
+        return {
+            fc.icao24
+            for store in (self.arrivals_store, self.departures_store)
+            for airport in self.get_active_airports()
+            for fc in store.get(airport)
+            if fc.icao24 and (fc.last_seen is None or fc.last_seen >= seen_since)
+        }
+
+    @single_flight_cached(ttl=30)
+    def get_states_table(self, context: Optional[Any] = None) -> StatesTable:
+        """
+        Returns the current flight states in a compact table.
+
+        The result is cached for 30 seconds and concurrent callers share a single retrieval. Once
+        expired, the previous result keeps being served while it is refreshed in the background.
+        """
+        return self.fetch_states_table()
+
+    def start_refresher(self,
+                        states_interval_in_sec: float = 30,
+                        flight_connections_interval_in_sec: float = 600) -> None:
+        """
+        Starts retrieving the states and the flight connections in a background thread, each on
+        its own schedule. Every retrieval swaps in a new index which the handlers read as is, so
+        that they never wait for OpenSky.
+
+        :param states_interval_in_sec:
+        :param flight_connections_interval_in_sec:
+        """
+        if self.refresher is None:
+            self.refresher = PeriodicRefresher(name='air-traffic-refresher')
+            self.refresher.add_job('flight_connections',
+                                   self._refresh_flight_connections,
+                                   interval_in_sec=flight_connections_interval_in_sec)
+            self.refresher.add_job('states',
+                                   self._refresh_states,
+                                   interval_in_sec=states_interval_in_sec)
+
+        self.refresher.start()
+
+    def stop_refresher(self, timeout: Optional[float] = None) -> None:
+        if self.refresher is not None:
+            self.refresher.stop(timeout)
+
+    @property
+    def is_refreshed_in_background(self) -> bool:
+        return self.is_refreshed_externally \
+            or (self.refresher is not None and self.refresher.is_running)
+
+    async def refresh_states_async(self, executor: Optional[Executor] = None) -> None:
+        """
+        Retrieves the states and swaps in a new index like the refresher does. The retrieval runs
+        in `executor` (the default one of the loop if None) so that the event loop is not blocked
+        while waiting for OpenSky.
+
+        :param executor:
+        """
+        await asyncio.get_running_loop().run_in_executor(executor, self._refresh_states)
+
+    async def refresh_flight_connections_async(self, executor: Optional[Executor] = None) -> None:
+        """
+        Retrieves the flight connections and swaps in a new index like the refresher does. The
+        retrieval runs in `executor` (the default one of the loop if None) so that the event loop
+        is not blocked while waiting for OpenSky.
+
+        :param executor:
+        """
+        await asyncio.get_running_loop().run_in_executor(executor, self._refresh_flight_connections)
+
+    def _refresh_states(self) -> None:
+        states = self.fetch_states_table()
+
+        # a states source may return the same snapshot again
+        if states is not self._states:
+            self._states = states
+            self._swap_index()
+
+    def _refresh_flight_connections(self) -> None:
+        self.flight_connections_outdated = False
+        scheduler = self.flight_connections_scheduler
+
+        if scheduler is None:
+            self._arrivals, self._departures = self.fetch_flight_connections()
+        else:
+            airports = [airport for airport in self.get_active_airports()
+                        if scheduler.is_due(airport)]
+            if not airports:
+                return
+
+            arrivals, departures = self.fetch_flight_connections(airports)
+            self._arrivals = {**self._arrivals, **arrivals}
+            self._departures = {**self._departures, **departures}
+
+            for airport in airports:
+                scheduler.observe(airport, {
+                    (kind, fc.icao24): (fc.est_departure_airport, fc.est_arrival_airport)
+                    for kind, flight_connections in (('arrivals', arrivals[airport]),
+                                                     ('departures', departures[airport]))
+                    for fc in flight_connections
+                })
+
+        self._swap_index()
+
+    def _swap_index(self) -> None:
+        """
+        Builds a new index from the latest snapshots and replaces the current one at once.
+        """
+        with self._index_lock:
+            self._index = FlightIndex(states=self._states,
+                                      arrivals=self._arrivals,
+                                      departures=self._departures)
+            self._record_history(self._index)
 
-        return Message(body=json.dumps(data), content_type='application/json')
+    def get_index(self) -> FlightIndex:
+        """
+        Returns the index of the current states snapshot. The index is rebuilt only when a new
+        snapshot is retrieved, so all the topics served within the same snapshot share it.
 
-    def _flight_connection_handler(
-            self,
-            airport: str,
-            states_dict: Dict[str, StateVector],
-            get_flight_connections_handler: Callable) -> List[AirTrafficDataType]:
+        If the snapshots are refreshed in the background the latest index is returned as is (an
+        empty one until the first snapshot is retrieved).
         """
-        Matches the flight connections (arrivals or departures of the airport depending on the
-        provided handler) with the current states (flights on going) and returns a subset of the
-        data of those flights.
+        if self.is_refreshed_in_background:
+            return self._index or FlightIndex(states=self._states, arrivals={}, departures={})
+
+        states = self.get_states_table()
+
+        index = self._index
+        if index is not None and index.states is states:
+            return index
+
+        with self._index_lock:
+            if self._index is None or self._index.states is not states:
+                active_airports = self.get_active_airports()
+                self._index = FlightIndex(
+                    states=states,
+                    arrivals={a: self._arrivals_today_handler(a) for a in active_airports},
+                    departures={a: self._departures_today_handler(a) for a in active_airports}
+                )
+                self._record_history(self._index)
+
+            return self._index
+
+    def _record_history(self, index: FlightIndex) -> None:
+        """
+        Records the positions of the flights of a new index in the flight history, if any. An index
+        rebuilt from the same states adds nothing since the positions are not newer.
+
+        :param index:
+        """
+        if self.flight_history is not None:
+            self.flight_history.record(index.states, list(index.flights))
+
+    def _add_airport(self, airport: str) -> None:
+        """
+        Starts tracking an airport which was not known at creation time.
+
         :param airport: icao of the airport
-        :param states_dict:
-        :param get_flight_connections_handler:
-        :return:
         """
-        flight_connections = get_flight_connections_handler(airport)
+        if airport not in self.airports:
+            self.airports.append(airport)
+            self.reload_airports()
 
-        flight_connections_dict = {fc.icao24: fc for fc in flight_connections if fc.icao24}
+    def reload_airports(self) -> None:
+        """
+        Takes into account a change of the tracked airports or of their activity. The index is
+        dropped so that it gets rebuilt with the current airports, or the flight connections are
+        refreshed right away if they are refreshed in the background.
+        """
+        if self.refresher is not None and self.refresher.is_running:
+            self.refresher.trigger('flight_connections')
+        elif self.is_refreshed_externally:
+            self.flight_connections_outdated = True
+        else:
+            self._index = None
 
-        flight_connections_with_state = {
-            icao24: fc
-            for icao24, fc in flight_connections_dict.items()
-            if icao24 in states_dict
-        }
+    def get_active_airports(self) -> List[str]:
+        """
+        Returns the tracked airports, except the ones whose topics have no active subscribers.
+        """
+        airports = list(self.airports)
+
+        if self.topic_activity is None:
+            return airports
+
+        return [airport for airport in airports if self.topic_activity.is_airport_active(airport)]
+
+    def is_topic_active(self, kind: str, name: str) -> bool:
+        """
+        :param kind: 'arrivals', 'departures', 'tracks' or 'area'
+        :param name: icao of the airport or name of the area
+        """
+        return self.topic_activity is None or self.topic_activity.is_active(kind, name)
+
+    def get_topic_serializer(self, kind: str) -> str:
+        """
+        Returns the serializer of the `kind` ('arrivals', 'departures', 'tracks' or 'area') topics,
+        which is the configured one except for the tracks when it is packed, since the packed
+        records have no room for the tracks.
+
+        :param kind:
+        """
+        if kind == 'tracks' and self.serializer == SERIALIZER_PACKED:
+            return SERIALIZER_JSON
+
+        return self.serializer
+
+    def _get_topic_payload(self,
+                           kind: str,
+                           name: str,
+                           publish_mode: Optional[str] = None) -> TopicPayload:
+        """
+        Returns the payload holder of the `kind` ('arrivals', 'departures', 'tracks' or 'area')
+        topic of an airport or an area.
+
+        :param kind:
+        :param name: icao of the airport or name of the area
+        :param publish_mode: overrides the publish mode of the topics when the payload is created
+        """
+        topic_payload = self._topic_payloads.get((kind, name))
+
+        if topic_payload is None:
+            topic_payload = TopicPayload(publish_mode=publish_mode or self.publish_mode,
+                                         payload_format=self.payload_format,
+                                         keyframe_interval_in_sec=self.keyframe_interval_in_sec,
+                                         serializer=self.get_topic_serializer(kind),
+                                         name=f"{kind}.{name}")
+            self._topic_payloads[(kind, name)] = topic_payload
+            self._topic_producer_durations[(kind, name)] = registry.histogram(
+                'topic_producer_duration_seconds',
+                'Time spent producing the messages of a topic',
+                topic=f"{kind}.{name}"
+            )
+
+        return topic_payload
+
+    def _produce_message(self,
+                         kind: str,
+                         name: str,
+                         index: Optional[FlightIndex] = None,
+                         publish_mode: Optional[str] = None) -> Optional[Message]:
+        """
+        Produces the message of the `kind` ('arrivals', 'departures', 'tracks' or 'area') topic of
+        an airport or an area.
+
+        :param kind:
+        :param name: icao of the airport or name of the area
+        :param index: the index to produce the message from. Defaults to the current one.
+        :param publish_mode: overrides the publish mode of the topics
+        """
+        if not self.is_topic_active(kind, name):
+            # the next subscribers get the full payload rather than the changes since long ago
+            self._topic_payloads.pop((kind, name), None)
+            return None
+
+        if kind != 'area':
+            self._add_airport(name)
+        topic_payload = self._get_topic_payload(kind, name, publish_mode)
+
+        with self._topic_producer_durations[(kind, name)].time():
+            index = index or self.get_index()
+
+            if not self.extrapolate_positions:
+                return topic_payload.get_message(
+                    version=index.version,
+                    get_data=lambda: self.get_flights(kind, name, index=index)
+                )
+
+            positions = self._get_extrapolated_positions(index)
+
+            return topic_payload.get_message(
+                version=(index.version, positions.at),
+                get_data=lambda: positions.apply(self.get_flights(kind, name, index=index))
+            )
+
+    def get_flights(self,
+                    kind: str,
+                    name: str,
+                    index: Optional[FlightIndex] = None) -> List[AirTrafficDataType]:
+        """
+        Returns the data of the `kind` ('arrivals', 'departures', 'tracks' or 'area') topic of an
+        airport or an area, with the positions as retrieved.
+
+        :param kind:
+        :param name: icao of the airport or name of the area
+        :param index: the index to take the data from. Defaults to the current one.
+        """
+        index = index or self.get_index()
+
+        if kind == 'area':
+            return self._get_area_data(index, name)
+
+        if kind == 'tracks':
+            return self._get_tracks_data(index, name)
+
+        data_per_airport = index.arrivals if kind == 'arrivals' else index.departures
+
+        return data_per_airport.get(name, [])
 
-        data = [self._get_flight_data(states_dict.get(fc_icao24), fc)
-                for fc_icao24, fc in flight_connections_with_state.items()]
+    def get_grid_index(self, states: StatesTable) -> GridIndex:
+        """
+        Returns the spatial index of a states snapshot. It is built only once per snapshot and
+        shared by all the area topics.
+
+        :param states:
+        """
+        grid_index = self._grid_index
+        if grid_index is not None and grid_index.states is states:
+            return grid_index
+
+        with self._grid_index_lock:
+            if self._grid_index is None or self._grid_index.states is not states:
+                self._grid_index = GridIndex(states)
+
+            return self._grid_index
+
+    def _get_area_data(self, index: FlightIndex, area: str) -> List[AirTrafficDataType]:
+        """
+        Returns the data of the aircraft within an area.
+
+        :param index:
+        :param area: name of the area
+        """
+        states = index.states
+        rows = self.get_grid_index(states).query_geofence(self.areas[area])
+
+        return [
+            {
+                'icao24': states.icao24[row],
+                'lat': states.get_latitude(row),
+                'lng': states.get_longitude(row),
+                'last_contact': states.get_last_contact(row)
+            }
+            for row in rows
+        ]
+
+    def _get_tracks_data(self, index: FlightIndex, airport: str) -> List[AirTrafficDataType]:
+        """
+        Returns the data of the flights arriving to or departing from an airport along with their
+        recent positions, oldest first, as [time, latitude, longitude].
+
+        :param index:
+        :param airport: icao of the airport
+        """
+        if self.flight_history is None:
+            return []
+
+        flights = {flight['icao24']: flight
+                   for data_per_airport in (index.arrivals, index.departures)
+                   for flight in data_per_airport.get(airport, [])}
+
+        return [dict(flight, track=self.flight_history.get_track(icao24))
+                for icao24, flight in flights.items()]
+
+    def _get_published_icao24s(self, index: FlightIndex) -> Set[str]:
+        """
+        Returns the aircraft published by the topics, that is the flights of the index and the
+        aircraft within the areas. Must be called with the extrapolation lock held.
+
+        :param index:
+        """
+        if self._published_icao24s is not None and self._published_icao24s[0] == index.version:
+            return self._published_icao24s[1]
+
+        icao24s = set(index.flights)
+        if self.areas:
+            states = index.states
+            grid_index = self.get_grid_index(states)
+            for geofence in self.areas.values():
+                icao24s.update(states.icao24[row] for row in grid_index.query_geofence(geofence))
+
+        self._published_icao24s = (index.version, icao24s)
+
+        return icao24s
+
+    def _get_extrapolated_positions(self, index: FlightIndex) -> ExtrapolatedPositions:
+        """
+        Returns the positions of all the aircraft published by the topics (see
+        `_get_published_icao24s`) projected to the current step. They are projected once per step
+        and index, and shared by all the topics.
 
-        return data
+        :param index:
+        """
+        step = self.extrapolation_step_in_sec
+        at = math.floor(time.time() / step) * step
+
+        with self._extrapolation_lock:
+            if self._extrapolated_positions is not None:
+                version, positions = self._extrapolated_positions
+                if version == index.version and positions.at == at:
+                    return positions
+
+            positions = ExtrapolatedPositions(
+                index.states,
+                icao24s=self._get_published_icao24s(index),
+                at=at,
+                max_extrapolation_in_sec=self.max_extrapolation_in_sec
+            )
+            self._extrapolated_positions = (index.version, positions)
+
+            return positions
+
+    def produce_messages(self,
+                         topics: Iterable[Tuple[str, str]],
+                         publish_mode: Optional[str] = None) \
+            -> Dict[Tuple[str, str], Optional[Message]]:
+        """
+        Produces the messages of several topics at once out of the same index.
+
+        :param topics: pairs of kind ('arrivals', 'departures', 'tracks' or 'area') and airport
+                       icao or area name
+        :param publish_mode: overrides the publish mode of the topics, e.g. `PUBLISH_ALWAYS` for a
+                             caller applying the publish mode itself
+        :return: the message (or None, see `arrivals_handler`) of each topic
+        """
+        topics = list(topics)
+        for kind, name in topics:
+            if kind != 'area' and self.is_topic_active(kind, name):
+                self._add_airport(name)
+
+        index = self.get_index()
+
+        return {(kind, name): self._produce_message(kind, name,
+                                                    index=index,
+                                                    publish_mode=publish_mode)
+                for kind, name in topics}
+
+    async def produce_messages_async(self,
+                                     topics: Iterable[Tuple[str, str]],
+                                     publish_mode: Optional[str] = None) \
+            -> Dict[Tuple[str, str], Optional[Message]]:
+        """
+        Coroutine version of `produce_messages`. It is meant to be used while the snapshots are
+        refreshed in the background, in which case producing the messages only reads the latest
+        index and never waits for OpenSky.
+
+        :param topics: pairs of kind ('arrivals', 'departures', 'tracks' or 'area') and airport
+                       icao or area name
+        :param publish_mode: see `produce_messages`
+        """
+        return self.produce_messages(topics, publish_mode=publish_mode)
+
+    def arrivals_handler(self, airport: str, context: Optional[Any] = None) -> Optional[Message]:
+        """
+        Is the callback that will be used to the arrival related topics. Returns None when the
+        publish mode skips unchanged payloads and nothing changed since the last publish.
+        """
+        return self._produce_message('arrivals', airport)
+
+    def departures_handler(self, airport: str, context: Optional[Any] = None) -> Optional[Message]:
+        """
+        Is the callback that will be used to the departure related topics. Returns None when the
+        publish mode skips unchanged payloads and nothing changed since the last publish.
+        """
+        return self._produce_message('departures', airport)
+
+    def area_handler(self, area: str, context: Optional[Any] = None) -> Optional[Message]:
+        """
+        Is the callback that will be used to the area topics, carrying the aircraft within the
+        geofence of the area. Returns None when the publish mode skips unchanged payloads and
+        nothing changed since the last publish.
+        """
+        return self._produce_message('area', area)
+
+    def tracks_handler(self, airport: str, context: Optional[Any] = None) -> Optional[Message]:
+        """
+        Is the callback that will be used to the track topics, carrying the recent positions of the
+        flights arriving to or departing from an airport. Returns None when the publish mode skips
+        unchanged payloads and nothing changed since the last publish.
+        """
+        return self._produce_message('tracks', airport)
 
     @staticmethod
-    def _get_flight_data(state: StateVector, flight_connection: FlightConnection) \
+    def _get_flight_data(states: StatesTable, row: int, flight_connection: FlightConnection) \
             -> AirTrafficDataType:
         """
         Combines data of an ongoing flight and an arrival or departure and returns a subset of it.
-        :param state:
+        :param states:
+        :param row: the row of the ongoing flight in the states table
         :param flight_connection:
         :return:
         """
@@ -205,10 +1043,10 @@ class AirTraffic:
         to_airport = flight_connection.est_arrival_airport or "Unknown airport"
 
         return {
-            'icao24': state.icao24,
-            'lat': state.latitude,
-            'lng': state.longitude,
+            'icao24': states.icao24[row],
+            'lat': states.get_latitude(row),
+            'lng': states.get_longitude(row),
             'from': from_airport,
             'to': to_airport,
-            'last_contact': state.last_contact_in_sec
+            'last_contact': states.get_last_contact(row)
         }
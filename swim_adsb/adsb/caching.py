@@ -0,0 +1,211 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Hashable, Any, Optional, NamedTuple
+
+from cachetools.keys import hashkey
+
+from swim_adsb.adsb.metrics import registry
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+
+
+class SingleFlightTTLCache:
+    def __init__(self,
+                 ttl: float,
+                 maxsize: int = 1024,
+                 max_stale_in_sec: Optional[float] = None,
+                 timer: Callable[[], float] = time.monotonic,
+                 name: str = 'cache'):
+        """
+        A thread safe TTL cache which coalesces the concurrent misses of the same key into one
+        fetch: the first caller fetches the value while the rest wait for its result.
+
+        Expired entries are served stale while they are refreshed in the background
+        (stale-while-revalidate), so that callers block only when there is no value at all.
+
+        :param ttl: time in seconds an entry is fresh
+        :param maxsize: maximum number of entries
+        :param max_stale_in_sec: time in seconds after expiration an entry can still be served
+                                 while being refreshed. None means no limit.
+        :param timer:
+        :param name: identifies the cache in the metrics
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_stale_in_sec = max_stale_in_sec
+        self.timer = timer
+
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self._hits, self._stale_hits, self._misses = (
+            registry.counter('cache_lookups_total', 'Number of cache lookups by result',
+                             cache=name, result=result)
+            for result in ('hit', 'stale', 'miss')
+        )
+
+    def get(self,
+            key: Hashable,
+            fetch: Callable[[], Any],
+            executor: Optional[Executor] = None) -> Any:
+        """
+        Returns the cached value of the key, fetching it if needed.
+
+        :param key:
+        :param fetch: retrieves the value of the key
+        :param executor: where an expired value is refreshed, so that the refreshes of many keys
+                         expiring together are bounded. None means a thread of its own.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.timer()
+
+            if entry is not None and now < entry.expires_at:
+                self._hits.inc()
+                return entry.value
+
+            if entry is not None and self.max_stale_in_sec is not None \
+                    and now >= entry.expires_at + self.max_stale_in_sec:
+                entry = None
+
+            future = self._in_flight.get(key)
+            is_fetcher = future is None
+            if is_fetcher:
+                future = self._in_flight[key] = Future()
+
+        if entry is not None:
+            self._stale_hits.inc()
+            if is_fetcher and executor is not None:
+                executor.submit(self._revalidate, key, fetch, future)
+            elif is_fetcher:
+                threading.Thread(target=self._revalidate,
+                                 args=(key, fetch, future),
+                                 daemon=True).start()
+            return entry.value
+
+        self._misses.inc()
+        if is_fetcher:
+            self._fetch(key, fetch, future)
+
+        return future.result()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores a fresh value for the key.
+
+        :param key:
+        :param value:
+        :param ttl: overrides the ttl of the cache for this value. With 0 the value is stored
+                    already expired, so that it is served stale while it is refreshed.
+        """
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = _Entry(value=value, expires_at=self.timer() + ttl)
+
+        if len(self._entries) > self.maxsize:
+            oldest_key = min(self._entries, key=lambda k: self._entries[k].expires_at)
+            del self._entries[oldest_key]
+
+    def _fetch(self, key: Hashable, fetch: Callable[[], Any], future: Future) -> None:
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Any], future: Future) -> None:
+        self._fetch(key, fetch, future)
+
+        if future.exception() is not None:
+            _logger.error(f"Failed to refresh stale cache entry: {future.exception()}")
+
+
+def single_flight_cached(ttl: float,
+                         maxsize: int = 1024,
+                         max_stale_in_sec: Optional[float] = None,
+                         name: Optional[str] = None,
+                         executor: Optional[Callable[..., Optional[Executor]]] = None):
+    """
+    Decorator caching the results of a function in a `SingleFlightTTLCache`. As with
+    `cachetools.cached` the key is made of all the arguments, `self` included for methods.
+
+    The cache is accessible via the `cache` attribute of the decorated function.
+
+    :param ttl:
+    :param maxsize:
+    :param max_stale_in_sec:
+    :param name: identifies the cache in the metrics. Defaults to the name of the function.
+    :param executor: called with the arguments of the function, returns where the expired values
+                     are refreshed (see `SingleFlightTTLCache.get`), e.g. an executor of `self`
+    """
+    def decorator(func):
+        cache = SingleFlightTTLCache(ttl=ttl,
+                                     maxsize=maxsize,
+                                     max_stale_in_sec=max_stale_in_sec,
+                                     name=name or func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.get(hashkey(*args, **kwargs),
+                             lambda: func(*args, **kwargs),
+                             executor=executor(*args, **kwargs) if executor is not None else None)
+
+        wrapper.cache = cache
+
+        return wrapper
+
+    return decorator
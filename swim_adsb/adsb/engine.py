@@ -0,0 +1,297 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from proton import Message
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.metrics import registry
+from swim_adsb.adsb.payloads import PUBLISH_ALWAYS, PUBLISH_ON_CHANGE, PUBLISH_HEARTBEAT, \
+    FORMAT_DELTA
+from swim_adsb.adsb.serializers import create_serializer, Body, JsonSerializer, HEARTBEAT
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+_tick_duration = registry.histogram(
+    'engine_tick_duration_seconds', 'Time spent producing the messages of all the due topics')
+
+
+# a delta payload needs every body to be applied, but a messenger stuck for that long is better
+# off resyncing from the next keyframe anyway
+MAX_PENDING_BODIES = 100
+
+
+class _TopicProducer:
+    def __init__(self,
+                 publish_mode: str,
+                 keep_every_body: bool = False,
+                 serializer: Any = None):
+        """
+        The message producer of a topic handed to the messenger layer. It is called on the reactor
+        thread and only picks up the bodies produced by the engine, so it never blocks.
+
+        The engine pushes every new body of the topic and the publish mode is applied here, on the
+        ticks of the messenger, so that a body counts as published only once the messenger took
+        it. The engine and the messenger tick on their own schedules, so several bodies may be
+        pushed between two ticks.
+
+        It owns its `Message` so that the engine never mutates a message the reactor is sending.
+
+        :param publish_mode:
+        :param keep_every_body: if True (delta payloads) every body is published in order,
+                                otherwise only the latest one
+        :param serializer: the one of the topic. Defaults to `JsonSerializer`.
+        """
+        serializer = serializer or JsonSerializer()
+
+        self.publish_mode = publish_mode
+        self.keep_every_body = keep_every_body
+        self.message = Message(content_type=serializer.content_type)
+        self.heartbeat = Message(body=serializer.dumps(HEARTBEAT),
+                                 content_type=serializer.content_type)
+
+        self._pending: Deque[Body] = deque(maxlen=MAX_PENDING_BODIES)
+        # the last body pushed by the engine and the last one taken by the messenger
+        self._last_body: Optional[Body] = None
+        self._published_body: Optional[Body] = None
+        self._lock = threading.Lock()
+
+    def push(self, body: Optional[Body]) -> None:
+        """
+        Called by the engine with the current body of the topic on every tick. Only the bodies
+        differing from the previous one are queued for the messenger.
+
+        :param body:
+        """
+        with self._lock:
+            if body is None or body == self._last_body:
+                return
+            self._last_body = body
+
+            if not self.keep_every_body:
+                self._pending.clear()
+            self._pending.append(body)
+
+    def reset(self) -> None:
+        """
+        Forgets the bodies of the topic, e.g. while it has no subscribers, so that nothing is
+        published until the engine pushes a new body.
+        """
+        with self._lock:
+            self._pending.clear()
+            self._last_body = self._published_body = None
+
+    def __call__(self, context: Optional[Any] = None) -> Optional[Message]:
+        with self._lock:
+            body = self._pending.popleft() if self._pending else None
+            if body is not None:
+                self._published_body = body
+
+        if body is None:
+            # nothing new since the previous call
+            if self._published_body is None or self.publish_mode == PUBLISH_ON_CHANGE:
+                return None
+            if self.publish_mode == PUBLISH_HEARTBEAT:
+                return self.heartbeat
+            body = self._published_body
+
+        if self.message.body is not body:
+            self.message.body = body
+
+        return self.message
+
+
+class AsyncPublishingEngine:
+    def __init__(self,
+                 air_traffic: AirTraffic,
+                 states_interval_in_sec: float = 30,
+                 flight_connections_interval_in_sec: float = 600):
+        """
+        Produces the messages of the topics on an asyncio event loop running in its own thread, so
+        that the reactor thread of the messenger layer never does any work besides sending them.
+
+        The snapshots are retrieved from OpenSky without blocking the loop, and the topics sharing
+        the same interval are produced together on each tick out of the same index.
+
+        :param air_traffic:
+        :param states_interval_in_sec: how often the states are retrieved
+        :param flight_connections_interval_in_sec: how often the flight connections are retrieved
+        """
+        self.air_traffic = air_traffic
+        self.states_interval_in_sec = states_interval_in_sec
+        self.flight_connections_interval_in_sec = flight_connections_interval_in_sec
+
+        self._producers: Dict[float, Dict[Tuple[str, str], _TopicProducer]] = {}
+        self._producers_lock = threading.Lock()
+        self._flight_connections_due_at: Optional[float] = None
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        # one worker per kind of snapshot so that a slow retrieval does not delay the other
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='engine-refresh')
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_topic(self,
+                  kind: str,
+                  name: str,
+                  interval_in_sec: float) -> Callable[..., Optional[Message]]:
+        """
+        Adds a topic to be produced every `interval_in_sec`. It can be added while the engine is
+        running.
+
+        :param kind: 'arrivals', 'departures', 'tracks' or 'area'
+        :param name: icao of the airport or name of the area
+        :param interval_in_sec:
+        :return: the message producer to hand to the messenger of the topic
+        """
+        producer = _TopicProducer(
+            publish_mode=self.air_traffic.publish_mode,
+            keep_every_body=self.air_traffic.payload_format == FORMAT_DELTA,
+            serializer=create_serializer(self.air_traffic.get_topic_serializer(kind))
+        )
+
+        with self._producers_lock:
+            is_new_interval = interval_in_sec not in self._producers
+            self._producers.setdefault(interval_in_sec, {})[(kind, name)] = producer
+
+        if is_new_interval and self.is_running:
+            self._loop.call_soon_threadsafe(self._schedule_topics, interval_in_sec)
+
+        return producer
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+
+        self.air_traffic.is_refreshed_externally = True
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run_loop,
+                                        name='publishing-engine',
+                                        daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self.is_running:
+            return
+
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join(timeout)
+        self.air_traffic.is_refreshed_externally = False
+
+    def _run_loop(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    async def _run(self) -> None:
+        self._stopped = asyncio.Event()
+        self._tasks = []
+
+        # the flight connections are polled as often as the states so that they are retrieved
+        # soon after being outdated, and on their own task so that they never delay the states
+        self._schedule(self._refresh_flight_connections, self.states_interval_in_sec)
+        self._schedule(self._refresh_states, self.states_interval_in_sec)
+        with self._producers_lock:
+            intervals = list(self._producers)
+        for interval_in_sec in intervals:
+            self._schedule_topics(interval_in_sec)
+
+        self._started.set()
+        await self._stopped.wait()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _refresh_flight_connections(self) -> None:
+        """
+        Retrieves the flight connections when they are due or outdated.
+        """
+        now = self._loop.time()
+        if self._flight_connections_due_at is None or now >= self._flight_connections_due_at \
+                or self.air_traffic.flight_connections_outdated:
+            self._flight_connections_due_at = now + self.flight_connections_interval_in_sec
+            await self.air_traffic.refresh_flight_connections_async(self._executor)
+
+    async def _refresh_states(self) -> None:
+        await self.air_traffic.refresh_states_async(self._executor)
+
+    def _schedule_topics(self, interval_in_sec: float) -> None:
+        self._schedule(lambda: self._produce_topics(interval_in_sec), interval_in_sec)
+
+    def _schedule(self, job: Callable[[], Awaitable[None]], interval_in_sec: float) -> None:
+        self._tasks.append(self._loop.create_task(self._every(job, interval_in_sec)))
+
+    async def _every(self, job: Callable[[], Awaitable[None]], interval_in_sec: float) -> None:
+        while True:
+            started_at = self._loop.time()
+            try:
+                await job()
+            except Exception as e:
+                _logger.exception(f"Publishing engine job failed: {e}")
+
+            await asyncio.sleep(max(0.0, started_at + interval_in_sec - self._loop.time()))
+
+    async def _produce_topics(self, interval_in_sec: float) -> None:
+        """
+        Produces the messages of all the topics of the interval together and hands them over to
+        their producers.
+        """
+        with self._producers_lock:
+            producers = dict(self._producers[interval_in_sec])
+
+        with _tick_duration.time():
+            # the publish mode is applied by the producers, on the ticks of the messengers
+            messages = await self.air_traffic.produce_messages_async(producers,
+                                                                     publish_mode=PUBLISH_ALWAYS)
+
+        for topic, message in messages.items():
+            if message is None:
+                # the topic has no subscribers
+                producers[topic].reset()
+            else:
+                # the body is immutable, so it can be handed over to the reactor thread as is
+                producers[topic].push(message.body)
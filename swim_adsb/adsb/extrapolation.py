@@ -0,0 +1,111 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+from swim_adsb.adsb.geo import KM_PER_DEGREE_OF_LATITUDE
+from swim_adsb.adsb.states import StatesTable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+METERS_PER_DEGREE_OF_LATITUDE = KM_PER_DEGREE_OF_LATITUDE * 1000
+
+
+class ExtrapolatedPositions:
+    def __init__(self,
+                 states: StatesTable,
+                 icao24s: Iterable[str],
+                 at: float,
+                 max_extrapolation_in_sec: float = 60):
+        """
+        Projects the positions of some aircraft of a states snapshot to a given time by dead
+        reckoning, that is assuming they kept flying at the same ground speed along the same track
+        since the time of their position.
+
+        All the positions are projected at once, in a single pass over the columns of the snapshot.
+        The positions which cannot be projected (unknown velocity, track or time of position) or
+        which would be projected further than `max_extrapolation_in_sec` are left as is.
+
+        :param states:
+        :param icao24s: the aircraft whose positions are projected
+        :param at: the time to project the positions to, in seconds since UNIX epoch
+        :param max_extrapolation_in_sec:
+        """
+        self.at = at
+        self.positions: Dict[str, Tuple[float, float]] = {}
+
+        latitudes, longitudes = states.latitude, states.longitude
+        time_positions, velocities, true_tracks = \
+            states.time_position, states.velocity, states.true_track
+
+        for icao24 in icao24s:
+            row = states.rows[icao24]
+            time_position, velocity, true_track = \
+                time_positions[row], velocities[row], true_tracks[row]
+
+            # missing timestamps are negative
+            if time_position < 0 or math.isnan(velocity) or math.isnan(true_track):
+                continue
+
+            elapsed = at - time_position
+            if not 0 < elapsed <= max_extrapolation_in_sec:
+                continue
+
+            latitude, longitude = latitudes[row], longitudes[row]
+            if math.isnan(latitude) or math.isnan(longitude):
+                continue
+
+            distance = velocity * elapsed
+            track = math.radians(true_track)
+            latitude += distance * math.cos(track) / METERS_PER_DEGREE_OF_LATITUDE
+            longitude += distance * math.sin(track) \
+                / (METERS_PER_DEGREE_OF_LATITUDE * max(math.cos(math.radians(latitude)), 1e-6))
+
+            # OpenSky reports the positions with 4 decimals (about 10 meters)
+            self.positions[icao24] = (round(latitude, 4), _wrap_longitude(round(longitude, 4)))
+
+    def apply(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Returns a copy of the flights data with the projected positions.
+
+        :param data: list of flights
+        """
+        result = []
+        for flight in data:
+            position = self.positions.get(flight['icao24'])
+            if position is not None:
+                flight = dict(flight, lat=position[0], lng=position[1])
+            result.append(flight)
+
+        return result
+
+
+def _wrap_longitude(longitude: float) -> float:
+    return (longitude + 180) % 360 - 180 if not -180 <= longitude <= 180 else longitude
@@ -0,0 +1,281 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Tuple, Any, NamedTuple, Optional
+
+from opensky_network_client.models import FlightConnection
+
+from swim_adsb.adsb.governor import RequestDeferred
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+FetchFlightConnectionsType = Callable[[str, int, int], List[FlightConnection]]
+
+# OpenSky rejects the arrivals/departures requests over longer intervals
+MAX_DAYS_PER_REQUEST = 7
+
+
+class StoredFlightConnection(NamedTuple):
+    """
+    A flight connection restored from a dump, with the same attributes as `FlightConnection`.
+    """
+    icao24: str
+    first_seen: Optional[int]
+    est_departure_airport: Optional[str]
+    last_seen: Optional[int]
+    est_arrival_airport: Optional[str]
+    callsign: Optional[str]
+
+
+def _day_span_in_timestamps(day: date) -> Tuple[int, int]:
+    """
+    Returns the timestamp of the start (00:00:00 AM) and the end (23:59:59 PM) of a day.
+    """
+    start_of_day = datetime.combine(day, datetime.min.time())
+    end_of_day = datetime.combine(day, datetime.max.time())
+
+    return int(start_of_day.timestamp()), int(end_of_day.timestamp())
+
+
+class _DayFlightConnections:
+    def __init__(self, day: date):
+        self.begin, self.end = _day_span_in_timestamps(day)
+        self.fetched_until = None
+        # only the latest flight connection is kept per aircraft
+        self.flight_connections: Dict[str, FlightConnection] = {}
+
+    def is_complete(self, overlap_in_sec: int) -> bool:
+        """
+        Whether the day was fetched late enough after its end for its data to be considered final.
+        """
+        return self.fetched_until is not None and self.fetched_until >= self.end + overlap_in_sec
+
+    def next_slice(self, overlap_in_sec: int) -> Tuple[int, int]:
+        """
+        Returns the time interval still to be fetched.
+        """
+        if self.fetched_until is None:
+            return self.begin, self.end
+
+        return max(self.begin, self.fetched_until - overlap_in_sec), self.end
+
+    def merge(self, flight_connections: List[FlightConnection], fetched_until: int) -> None:
+        self.flight_connections.update({fc.icao24: fc for fc in flight_connections if fc.icao24})
+        self.fetched_until = fetched_until
+
+
+class FlightConnectionStore:
+    def __init__(self,
+                 fetch: FetchFlightConnectionsType,
+                 time_span_in_days: int,
+                 overlap_in_sec: int = 3600,
+                 seen_at: Callable[[FlightConnection], Optional[int]] = lambda fc: fc.last_seen,
+                 today: Callable[[], date] = date.today,
+                 timer: Callable[[], float] = time.time):
+        """
+        Keeps the flight connections (arrivals or departures based on `fetch`) of the airports
+        from the start of the day `time_span_in_days` before the current one up to the end of the
+        current day.
+
+        The window is split in days: the past days are fetched once and kept until they slide out
+        of the window, while only the part of the current day since the previous fetch is fetched
+        again on every refresh. Since OpenSky may report flights a while after they happened, every
+        slice starts `overlap_in_sec` before the previous fetch and a day is final only once it is
+        fetched `overlap_in_sec` after its end. The consecutive days to fetch are fetched with a
+        single request (up to `MAX_DAYS_PER_REQUEST` days) whose result is split into days.
+
+        :param fetch: called with the airport icao and the begin/end timestamps of the interval
+        :param time_span_in_days:
+        :param overlap_in_sec:
+        :param seen_at: returns the timestamp by which `fetch` selects a flight connection, i.e.
+                        the last seen for the arrivals and the first seen for the departures
+        :param today:
+        :param timer:
+        """
+        self.fetch = fetch
+        self.seen_at = seen_at
+        self.time_span_in_days = time_span_in_days
+        self.overlap_in_sec = overlap_in_sec
+        self.today = today
+        self.timer = timer
+
+        self._days: Dict[str, Dict[date, _DayFlightConnections]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _get_lock(self, icao: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(icao, threading.Lock())
+
+    def _window(self) -> List[date]:
+        last_day = self.today()
+
+        return [last_day - timedelta(days=n) for n in range(self.time_span_in_days, -1, -1)]
+
+    def refresh(self, icao: str) -> List[FlightConnection]:
+        """
+        Fetches the flight connections of an airport that are missing from the store and returns
+        all of them within the window.
+
+        A failed fetch is logged and the data already in the store is returned. A fetch deferred by
+        the request governor is expected while it backs off, so it is logged at debug level only
+        and the rest of the window is left for the next refresh.
+
+        :param icao: airport identifier
+        """
+        with self._get_lock(icao):
+            window = self._window()
+            previous_days = self._days.get(icao, {})
+            days = {day: previous_days.get(day) or _DayFlightConnections(day) for day in window}
+            self._days[icao] = days
+
+            for run in self._runs_to_fetch(days):
+                begin, _ = run[0].next_slice(self.overlap_in_sec)
+                end = run[-1].end
+                fetched_until = int(self.timer())
+
+                try:
+                    flight_connections = self.fetch(icao, begin, end)
+                except RequestDeferred as e:
+                    _logger.debug(f"Flight connections of {icao} not retrieved: {e}")
+                    break
+                except Exception as e:
+                    _logger.error(str(e))
+                    continue
+
+                day_results = self._split(run, flight_connections)
+                for day_flight_connections, day_result in zip(run, day_results):
+                    day_flight_connections.merge(day_result, fetched_until=fetched_until)
+
+            return self._flight_connections(days)
+
+    def _runs_to_fetch(self, days: Dict[date, _DayFlightConnections]) \
+            -> List[List[_DayFlightConnections]]:
+        """
+        Groups the consecutive days which are not complete yet, so that each group is fetched with
+        a single request.
+        """
+        runs: List[List[_DayFlightConnections]] = []
+        previous_is_complete = True
+
+        for day in sorted(days):
+            day_flight_connections = days[day]
+            if day_flight_connections.is_complete(self.overlap_in_sec):
+                previous_is_complete = True
+                continue
+
+            if previous_is_complete or len(runs[-1]) >= MAX_DAYS_PER_REQUEST:
+                runs.append([])
+            runs[-1].append(day_flight_connections)
+            previous_is_complete = False
+
+        return runs
+
+    def _split(self,
+               run: List[_DayFlightConnections],
+               flight_connections: List[FlightConnection]) -> List[List[FlightConnection]]:
+        """
+        Splits the flight connections fetched for consecutive days into the days they were seen.
+        The ones without a timestamp or out of the days go to the closest day.
+        """
+        result: List[List[FlightConnection]] = [[] for _ in run]
+        begins = [day_flight_connections.begin for day_flight_connections in run]
+
+        for fc in flight_connections:
+            seen_at = self.seen_at(fc)
+            index = len(run) - 1 if seen_at is None else bisect.bisect_right(begins, seen_at) - 1
+            result[max(index, 0)].append(fc)
+
+        return result
+
+    def get(self, icao: str) -> List[FlightConnection]:
+        """
+        Returns the flight connections of an airport already in the store without fetching.
+
+        :param icao: airport identifier
+        """
+        with self._get_lock(icao):
+            return self._flight_connections(self._days.get(icao, {}))
+
+    def dump(self) -> Dict[str, Any]:
+        """
+        Returns the content of the store in a JSON serializable form that `load` accepts.
+        """
+        result = {}
+        for icao in list(self._days):
+            with self._get_lock(icao):
+                result[icao] = [
+                    {
+                        'day': day.isoformat(),
+                        'fetched_until': day_flight_connections.fetched_until,
+                        'flight_connections': [
+                            [getattr(fc, field, None) for field in StoredFlightConnection._fields]
+                            for fc in day_flight_connections.flight_connections.values()
+                        ]
+                    }
+                    for day, day_flight_connections in self._days[icao].items()
+                ]
+
+        return result
+
+    def load(self, dump: Dict[str, Any]) -> None:
+        """
+        Restores the content of the store from a dump, so that only what was not retrieved yet is
+        retrieved on the next refresh. The days that slid out of the window are dropped on the
+        next refresh of their airport.
+
+        :param dump: as returned by `dump`
+        """
+        for icao, days in dump.items():
+            with self._get_lock(icao):
+                self._days[icao] = {}
+
+                for day_dump in days:
+                    day = date.fromisoformat(day_dump['day'])
+                    day_flight_connections = _DayFlightConnections(day)
+                    day_flight_connections.merge(
+                        [StoredFlightConnection(*fc) for fc in day_dump['flight_connections']],
+                        fetched_until=day_dump['fetched_until']
+                    )
+                    self._days[icao][day] = day_flight_connections
+
+    @staticmethod
+    def _flight_connections(days: Dict[date, _DayFlightConnections]) -> List[FlightConnection]:
+        result = {}
+        for day in sorted(days):
+            result.update(days[day].flight_connections)
+
+        return list(result.values())
@@ -0,0 +1,181 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+from typing import NamedTuple, Iterable, Optional, Tuple, Union
+
+__author__ = "EUROCONTROL (SWIM)"
+
+KM_PER_DEGREE_OF_LATITUDE = 111.32
+EARTH_RADIUS_IN_KM = 6371.0088
+
+
+class BoundingBox(NamedTuple):
+    min_latitude: float
+    max_latitude: float
+    min_longitude: float
+    max_longitude: float
+
+    def contains(self, latitude: Optional[float], longitude: Optional[float]) -> bool:
+        if latitude is None or longitude is None:
+            return False
+
+        return self.min_latitude <= latitude <= self.max_latitude \
+            and self.min_longitude <= longitude <= self.max_longitude
+
+    def to_opensky_params(self):
+        """
+        Returns the box as the query parameters of the OpenSky states API.
+        """
+        return {
+            'lamin': self.min_latitude,
+            'lamax': self.max_latitude,
+            'lomin': self.min_longitude,
+            'lomax': self.max_longitude
+        }
+
+
+def bounding_box_around(latitude: float, longitude: float, radius_in_km: float) -> BoundingBox:
+    """
+    Returns the smallest bounding box containing the circle of the given radius around a point.
+    The box is clipped to the valid coordinates instead of wrapping around the antimeridian.
+
+    :param latitude:
+    :param longitude:
+    :param radius_in_km:
+    """
+    latitude_delta = radius_in_km / KM_PER_DEGREE_OF_LATITUDE
+
+    min_latitude = max(latitude - latitude_delta, -90.0)
+    max_latitude = min(latitude + latitude_delta, 90.0)
+
+    # a degree of longitude is the shortest at the latitude of the box farthest from the equator
+    farthest_latitude = max(abs(min_latitude), abs(max_latitude))
+    km_per_degree_of_longitude = \
+        KM_PER_DEGREE_OF_LATITUDE * math.cos(math.radians(farthest_latitude))
+
+    if km_per_degree_of_longitude * 180 <= radius_in_km:
+        longitude_delta = 180.0
+    else:
+        longitude_delta = radius_in_km / km_per_degree_of_longitude
+
+    return BoundingBox(min_latitude=min_latitude,
+                       max_latitude=max_latitude,
+                       min_longitude=max(longitude - longitude_delta, -180.0),
+                       max_longitude=min(longitude + longitude_delta, 180.0))
+
+
+def union(bounding_boxes: Iterable[BoundingBox]) -> Optional[BoundingBox]:
+    """
+    Returns the smallest bounding box containing all the given ones or None if there is none.
+
+    :param bounding_boxes:
+    """
+    bounding_boxes = list(bounding_boxes)
+
+    if not bounding_boxes:
+        return None
+
+    return BoundingBox(min_latitude=min(b.min_latitude for b in bounding_boxes),
+                       max_latitude=max(b.max_latitude for b in bounding_boxes),
+                       min_longitude=min(b.min_longitude for b in bounding_boxes),
+                       max_longitude=max(b.max_longitude for b in bounding_boxes))
+
+
+def distance_in_km(latitude1: float,
+                   longitude1: float,
+                   latitude2: float,
+                   longitude2: float) -> float:
+    """
+    Returns the great-circle distance between two points.
+    """
+    latitude1, longitude1, latitude2, longitude2 = \
+        map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+
+    a = math.sin((latitude2 - latitude1) / 2) ** 2 \
+        + math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_IN_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class CircleGeofence(NamedTuple):
+    latitude: float
+    longitude: float
+    radius_in_km: float
+
+    def bounding_box(self) -> BoundingBox:
+        return bounding_box_around(self.latitude, self.longitude, self.radius_in_km)
+
+    def contains(self, latitude: Optional[float], longitude: Optional[float]) -> bool:
+        if latitude is None or longitude is None:
+            return False
+
+        distance = distance_in_km(self.latitude, self.longitude, latitude, longitude)
+
+        return distance <= self.radius_in_km
+
+
+class PolygonGeofence(NamedTuple):
+    # (latitude, longitude) of the vertices in order. The polygon is closed implicitly.
+    vertices: Tuple[Tuple[float, float], ...]
+
+    def bounding_box(self) -> BoundingBox:
+        latitudes = [vertex[0] for vertex in self.vertices]
+        longitudes = [vertex[1] for vertex in self.vertices]
+
+        return BoundingBox(min_latitude=min(latitudes),
+                           max_latitude=max(latitudes),
+                           min_longitude=min(longitudes),
+                           max_longitude=max(longitudes))
+
+    def contains(self, latitude: Optional[float], longitude: Optional[float]) -> bool:
+        """
+        Ray casting: the point is inside if a ray from it crosses the edges an odd number of times.
+        The edges are considered straight lines in the latitude/longitude plane.
+        """
+        if latitude is None or longitude is None:
+            return False
+
+        inside = False
+        previous_latitude, previous_longitude = self.vertices[-1]
+
+        for vertex_latitude, vertex_longitude in self.vertices:
+            if (vertex_latitude > latitude) != (previous_latitude > latitude):
+                slope = (previous_longitude - vertex_longitude) \
+                    / (previous_latitude - vertex_latitude)
+                crossing_longitude = vertex_longitude + (latitude - vertex_latitude) * slope
+                if longitude < crossing_longitude:
+                    inside = not inside
+
+            previous_latitude, previous_longitude = vertex_latitude, vertex_longitude
+
+        return inside
+
+
+Geofence = Union[CircleGeofence, PolygonGeofence]
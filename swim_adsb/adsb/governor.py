@@ -0,0 +1,265 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import logging
+import random
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from opensky_network_client.models import FlightConnection
+from opensky_network_client.opensky_network import OpenskyNetworkClient
+
+from swim_adsb.adsb.metrics import registry
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+# the states are requested even when the budget runs low
+PRIORITY_HIGH = 'high'
+# the flight connections are requested only while the budget is above the reserve of the states
+PRIORITY_LOW = 'low'
+
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_LOW)
+
+# sent by OpenSky along with 429 responses
+RETRY_AFTER_HEADERS = ('X-Rate-Limit-Retry-After-Seconds', 'Retry-After')
+
+_deferred = {
+    reason: registry.counter('opensky_requests_deferred_total',
+                             'Number of requests to OpenSky not sent by the governor',
+                             reason=reason)
+    for reason in ('backoff', 'budget')
+}
+_backoffs = registry.counter('opensky_backoffs_total', 'Number of backoffs after failed requests')
+_budget = registry.gauge('opensky_request_budget',
+                         'Number of requests to OpenSky left in the budget')
+
+
+class RequestDeferred(Exception):
+    """
+    Raised instead of sending a request while backing off or when the budget is exhausted.
+    """
+
+
+class RequestGovernor:
+    def __init__(self,
+                 client: OpenskyNetworkClient,
+                 max_requests_per_hour: Optional[float] = None,
+                 burst: int = 20,
+                 low_priority_reserve: float = 0.2,
+                 backoff_in_sec: float = 5,
+                 max_backoff_in_sec: float = 300,
+                 timer: Callable[[], float] = time.monotonic,
+                 rand: Callable[[], float] = random.random):
+        """
+        Wraps an `OpenskyNetworkClient` (with the same interface) in order to stay within the
+        limits of OpenSky instead of hammering it while it is throttling or failing:
+
+        - after a request failed because OpenSky throttles (429), fails (5xx) or times out, no
+          request of the same priority is sent for an exponentially growing backoff with jitter,
+          or for as long as OpenSky asks in its response if it does. A failure of the states holds
+          back the flight connections as well, but not the other way around, so that the states
+          are still refreshed.
+        - the requests are limited to `max_requests_per_hour` with a token bucket of `burst`
+          requests, whose last `low_priority_reserve` part is kept for the states
+
+        The requests that are not sent raise `RequestDeferred`, so that the callers keep using the
+        data they already have. The other errors are raised as is, except the 404 OpenSky answers
+        when there is no flight connection in the requested interval, which is an empty result.
+
+        :param client:
+        :param max_requests_per_hour: None means no limit
+        :param burst: how many requests can be sent at once
+        :param low_priority_reserve: fraction of the burst reserved for the high priority requests
+        :param backoff_in_sec: the backoff after the first failure, doubled on every next one
+        :param max_backoff_in_sec:
+        :param timer:
+        :param rand: returns a random number in [0, 1)
+        """
+        self.client = client
+        self.max_requests_per_hour = max_requests_per_hour
+        self.burst = burst
+        self.low_priority_reserve = low_priority_reserve
+        self.backoff_in_sec = backoff_in_sec
+        self.max_backoff_in_sec = max_backoff_in_sec
+        self.timer = timer
+        self.rand = rand
+
+        self._tokens = float(burst)
+        self._refilled_at = timer()
+        self._failures: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._blocked_until: Dict[str, float] = {priority: 0.0 for priority in PRIORITIES}
+        self._lock = threading.Lock()
+
+    def get_states(self, **filters: Any) -> Any:
+        return self._request(PRIORITY_HIGH, partial(self.client.get_states, **filters))
+
+    def get_flight_arrivals(self, icao: str, begin: int, end: int) -> List[FlightConnection]:
+        return self._request(PRIORITY_LOW,
+                             partial(self.client.get_flight_arrivals, icao, begin, end),
+                             not_found_result=[])
+
+    def get_flight_departures(self, icao: str, begin: int, end: int) -> List[FlightConnection]:
+        return self._request(PRIORITY_LOW,
+                             partial(self.client.get_flight_departures, icao, begin, end),
+                             not_found_result=[])
+
+    @property
+    def is_backing_off(self) -> bool:
+        """
+        Whether the requests of any priority are held back.
+        """
+        return any(self.is_backing_off_from(priority) for priority in PRIORITIES)
+
+    def is_backing_off_from(self, priority: str) -> bool:
+        """
+        :param priority: one of `PRIORITIES`
+        """
+        return self.timer() < self._blocked_until[priority]
+
+    def _request(self,
+                 priority: str,
+                 call: Callable[[], Any],
+                 not_found_result: Optional[Any] = None) -> Any:
+        """
+        :param priority:
+        :param call: sends the request
+        :param not_found_result: returned if OpenSky answers 404. None means the error is raised.
+        """
+        self._acquire(priority)
+
+        try:
+            result = call()
+        except Exception as e:
+            status_code = _status_code(e)
+
+            if status_code == 404 and not_found_result is not None:
+                result = not_found_result
+            elif _is_transient(e, status_code):
+                self._back_off(priority, e)
+                raise
+            else:
+                # e.g. a call the client does not support, not a failure of OpenSky
+                raise
+
+        with self._lock:
+            self._failures[priority] = 0
+
+        return result
+
+    def _acquire(self, priority: str) -> None:
+        with self._lock:
+            now = self.timer()
+            blocked_until = self._blocked_until[priority]
+
+            if now < blocked_until:
+                _deferred['backoff'].inc()
+                raise RequestDeferred(f"Backing off from OpenSky for another "
+                                      f"{blocked_until - now:.0f} seconds")
+
+            if self.max_requests_per_hour is None:
+                return
+
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at)
+                               * self.max_requests_per_hour / 3600)
+            self._refilled_at = now
+
+            reserve = self.burst * self.low_priority_reserve if priority == PRIORITY_LOW else 0
+            if self._tokens - 1 < reserve:
+                _deferred['budget'].inc()
+                raise RequestDeferred('The budget of requests to OpenSky is exhausted')
+
+            self._tokens -= 1
+            _budget.set(self._tokens)
+
+    def _back_off(self, priority: str, error: Exception) -> None:
+        with self._lock:
+            self._failures[priority] += 1
+
+            backoff = _retry_after(error)
+            if backoff is None:
+                backoff = min(self.max_backoff_in_sec,
+                              self.backoff_in_sec * 2 ** (self._failures[priority] - 1))
+                # equal jitter: spreads the retries of the processes failing at the same time
+                backoff = backoff / 2 + self.rand() * backoff / 2
+
+            blocked_until = self.timer() + backoff
+            for blocked_priority in (PRIORITIES if priority == PRIORITY_HIGH else (priority,)):
+                self._blocked_until[blocked_priority] = max(self._blocked_until[blocked_priority],
+                                                            blocked_until)
+
+        _backoffs.inc()
+        _logger.warning(f"Request to OpenSky failed ({error}). Backing off from the {priority} "
+                        f"priority requests for {backoff:.0f} seconds")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """
+    Returns the HTTP status code of the response of OpenSky, if the error carries it.
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+
+    try:
+        return int(status_code)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_transient(error: Exception, status_code: Optional[int]) -> bool:
+    """
+    Whether OpenSky throttles, fails or is too slow to answer, as opposed to an error of the
+    request itself.
+    """
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+
+    # the timeouts of requests (used by the client) do not derive from TimeoutError
+    return isinstance(error, TimeoutError) \
+        or any(cls.__name__.endswith('Timeout') for cls in type(error).__mro__)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Returns the time OpenSky asks to wait for before retrying, if the error carries its response.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+
+    for header in RETRY_AFTER_HEADERS:
+        try:
+            return float(headers[header])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    return None
@@ -0,0 +1,184 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from swim_adsb.adsb.metrics import registry
+from swim_adsb.adsb.states import StatesTable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+# time in seconds since UNIX epoch, latitude, longitude
+TrackPoint = Tuple[int, float, float]
+
+_history_size = registry.gauge('flight_history_size', 'Number of aircraft in the flight history')
+_history_evictions = registry.counter('flight_history_evictions_total',
+                                      'Number of aircraft evicted from the flight history')
+
+
+class _Track:
+    __slots__ = ('times', 'latitudes', 'longitudes', 'start', 'size')
+
+    def __init__(self, capacity: int):
+        self.times = array('q', bytes(8 * capacity))
+        self.latitudes = array('d', bytes(8 * capacity))
+        self.longitudes = array('d', bytes(8 * capacity))
+        # the slot of the oldest point and the number of points
+        self.start = 0
+        self.size = 0
+
+    @property
+    def last_time(self) -> int:
+        return self.times[(self.start + self.size - 1) % len(self.times)]
+
+    def append(self, at: int, latitude: float, longitude: float, resolution_in_sec: float) -> None:
+        capacity = len(self.times)
+
+        if self.size and at // resolution_in_sec == self.last_time // resolution_in_sec:
+            # a newer position within the same time bucket replaces the previous one
+            slot = (self.start + self.size - 1) % capacity
+        elif self.size < capacity:
+            slot = (self.start + self.size) % capacity
+            self.size += 1
+        else:
+            # the oldest point is overwritten
+            slot = self.start
+            self.start = (self.start + 1) % capacity
+
+        self.times[slot] = at
+        self.latitudes[slot] = latitude
+        self.longitudes[slot] = longitude
+
+    def points(self, since: int) -> List[TrackPoint]:
+        capacity = len(self.times)
+        points = []
+        for i in range(self.size):
+            slot = (self.start + i) % capacity
+            if self.times[slot] >= since:
+                points.append((self.times[slot], self.latitudes[slot], self.longitudes[slot]))
+
+        return points
+
+
+class FlightHistory:
+    def __init__(self,
+                 max_age_in_sec: float = 900,
+                 resolution_in_sec: float = 15,
+                 stale_after_in_sec: float = 300,
+                 timer: Callable[[], float] = time.time):
+        """
+        Keeps the recent positions of the aircraft, fed from the successive states snapshots.
+
+        Every aircraft gets a ring buffer of fixed size holding one position per time bucket of
+        `resolution_in_sec` over the last `max_age_in_sec`, so that appending a position is O(1)
+        and the memory per aircraft is bounded. The aircraft which have not reported any new
+        position for `stale_after_in_sec` (landed or out of coverage) are evicted.
+
+        :param max_age_in_sec: how far back the positions are kept
+        :param resolution_in_sec: the length of the time buckets
+        :param stale_after_in_sec:
+        :param timer:
+        """
+        if not 0 < resolution_in_sec <= max_age_in_sec:
+            raise ValueError('The resolution should be positive and should not exceed the max age')
+
+        self.max_age_in_sec = max_age_in_sec
+        self.resolution_in_sec = resolution_in_sec
+        self.stale_after_in_sec = stale_after_in_sec
+        self.timer = timer
+        self.capacity = math.ceil(max_age_in_sec / resolution_in_sec) + 1
+
+        self._tracks: Dict[str, _Track] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def __contains__(self, icao24: str) -> bool:
+        return icao24 in self._tracks
+
+    def record(self, states: StatesTable, icao24s: Iterable[str]) -> None:
+        """
+        Appends the positions of some aircraft of a states snapshot and evicts the stale aircraft.
+        Positions which are unknown or not newer than the last recorded one are skipped.
+
+        :param states:
+        :param icao24s: the aircraft to record
+        """
+        latitudes, longitudes = states.latitude, states.longitude
+        time_positions, last_contacts = states.time_position, states.last_contact
+
+        with self._lock:
+            for icao24 in icao24s:
+                row = states.rows.get(icao24)
+                if row is None:
+                    continue
+
+                latitude, longitude = latitudes[row], longitudes[row]
+                # missing timestamps are negative
+                at = time_positions[row] if time_positions[row] >= 0 else last_contacts[row]
+                if at < 0 or math.isnan(latitude) or math.isnan(longitude):
+                    continue
+
+                track = self._tracks.get(icao24)
+                if track is None:
+                    track = self._tracks[icao24] = _Track(self.capacity)
+                elif at <= track.last_time:
+                    continue
+
+                track.append(at, latitude, longitude, self.resolution_in_sec)
+
+            self._evict_stale()
+
+        _history_size.set(len(self._tracks))
+
+    def _evict_stale(self) -> None:
+        stale_before = self.timer() - self.stale_after_in_sec
+        stale = [icao24 for icao24, track in self._tracks.items() if track.last_time < stale_before]
+
+        for icao24 in stale:
+            del self._tracks[icao24]
+        _history_evictions.inc(len(stale))
+
+    def get_track(self, icao24: str) -> List[TrackPoint]:
+        """
+        Returns the positions of an aircraft over the last `max_age_in_sec`, oldest first.
+
+        :param icao24:
+        """
+        with self._lock:
+            track = self._tracks.get(icao24)
+            if track is None:
+                return []
+
+            return track.points(since=self.timer() - self.max_age_in_sec)
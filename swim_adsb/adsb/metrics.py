@@ -0,0 +1,296 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import abc
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple, Optional, Sequence, List
+
+from swim_adsb.adsb.refresher import PeriodicRefresher
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+LabelsType = Tuple[Tuple[str, str], ...]
+
+
+class _Metric(abc.ABC):
+    type = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: LabelsType):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def samples(self) -> List[Tuple[str, LabelsType, float]]:
+        """
+        :return: the (name, labels, value) samples of the metric to expose
+        """
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        if not self.registry.enabled:
+            return
+
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        if not self.registry.enabled:
+            return
+
+        self.value = value
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if not self.registry.enabled:
+            return
+
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """
+        Observes the time in seconds spent in the block.
+        """
+        if not self.registry.enabled:
+            yield
+            return
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+    def samples(self):
+        samples, cumulative_count = [], 0
+
+        for bucket, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative_count += count
+            le = '+Inf' if bucket == float('inf') else repr(bucket)
+            samples.append((f"{self.name}_bucket", self.labels + (('le', le),), cumulative_count))
+
+        samples.append((f"{self.name}_sum", self.labels, self.sum))
+        samples.append((f"{self.name}_count", self.labels, self.count))
+
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False, prefix: str = 'swim_adsb_'):
+        """
+        Keeps the metrics of the application. While disabled the metrics record nothing, so that
+        the instrumentation costs no more than a flag check.
+
+        :param enabled:
+        :param prefix: prepended to the name of every metric
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+
+        self._metrics: Dict[Tuple[str, LabelsType], _Metric] = {}
+        self._descriptions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str = '', **labels: str) -> Counter:
+        return self._get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = '', **labels: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description, labels)
+
+    def histogram(self,
+                  name: str,
+                  description: str = '',
+                  buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels: str) -> Histogram:
+        return self._get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+    def _get_or_create(self, metric_class, name, description, labels, **kwargs):
+        name = self.prefix + name
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            metric = self._metrics.get(key)
+
+            if metric is None:
+                metric = metric_class(self, name, key[1], **kwargs)
+                self._metrics[key] = metric
+                self._descriptions.setdefault(name, description)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+
+        return metric
+
+    def render(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+        lines, described = [], set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {self._descriptions[metric.name]}")
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """
+        Returns a one line summary of the metrics, meant to be logged.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+        parts = []
+        for metric in metrics:
+            name = metric.name[len(self.prefix):] + _format_labels(metric.labels)
+
+            if isinstance(metric, Histogram):
+                mean = metric.sum / metric.count if metric.count else 0
+                parts.append(f"{name}: count={metric.count} mean={mean:.4f}")
+            else:
+                parts.append(f"{name}: {metric.value:g}")
+
+        return ', '.join(parts)
+
+
+def _format_labels(labels: LabelsType) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+# the registry used across the application
+registry = MetricsRegistry()
+
+
+def start_http_server(port: int,
+                      host: str = '0.0.0.0',
+                      metrics_registry: Optional[MetricsRegistry] = None) -> ThreadingHTTPServer:
+    """
+    Serves the metrics in the Prometheus text format on http://<host>:<port>/metrics from a
+    background thread.
+
+    :param port:
+    :param host:
+    :param metrics_registry: defaults to the registry of the application
+    """
+    metrics_registry = metrics_registry or registry
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+
+            body = metrics_registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            _logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http-server', daemon=True).start()
+
+    return server
+
+
+def start_stats_log(interval_in_sec: float,
+                    metrics_registry: Optional[MetricsRegistry] = None) -> PeriodicRefresher:
+    """
+    Logs a summary of the metrics every `interval_in_sec` from a background thread.
+
+    :param interval_in_sec:
+    :param metrics_registry: defaults to the registry of the application
+    """
+    metrics_registry = metrics_registry or registry
+
+    refresher = PeriodicRefresher(name='metrics-stats-log')
+    refresher.add_job('stats_log',
+                      lambda: _logger.info(f"Stats: {metrics_registry.summary()}"),
+                      interval_in_sec=interval_in_sec)
+    refresher.start()
+
+    return refresher
@@ -0,0 +1,249 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import time
+from typing import Callable, Optional, Any, Hashable, List, Dict
+
+from proton import Message
+
+from swim_adsb.adsb.metrics import registry, SIZE_BUCKETS
+from swim_adsb.adsb.serializers import create_serializer, Body, HEARTBEAT, SERIALIZER_JSON
+
+__author__ = "EUROCONTROL (SWIM)"
+
+# every tick publishes the current payload
+PUBLISH_ALWAYS = 'always'
+# a tick whose payload is identical to the last published one publishes nothing
+PUBLISH_ON_CHANGE = 'on_change'
+# a tick whose payload is identical to the last published one publishes a tiny heartbeat instead
+PUBLISH_HEARTBEAT = 'heartbeat'
+
+PUBLISH_MODES = (PUBLISH_ALWAYS, PUBLISH_ON_CHANGE, PUBLISH_HEARTBEAT)
+
+# every payload carries the full list of flights
+FORMAT_FULL = 'full'
+# payloads carry only the flights added, removed or moved since the previous payload, with a
+# periodic keyframe carrying the full list of flights
+FORMAT_DELTA = 'delta'
+
+PAYLOAD_FORMATS = (FORMAT_FULL, FORMAT_DELTA)
+
+
+class FullEncoder:
+    """
+    Encodes the data as is.
+    """
+
+    @staticmethod
+    def is_due() -> bool:
+        return False
+
+    @staticmethod
+    def encode(data: Any) -> Any:
+        return data
+
+
+class DeltaEncoder:
+    def __init__(self,
+                 keyframe_interval_in_sec: float = 60,
+                 key: str = 'icao24',
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Encodes lists of flights as the difference with the previously encoded list:
+
+            {'type': 'delta', 'seq': 2, 'added': [<flight>], 'removed': [<icao24>],
+             'moved': [{'icao24': <icao24>, <changed key>: <new value>}]}
+
+        Every `keyframe_interval_in_sec` the full list is encoded instead, so that subscribers
+        joining late can resync:
+
+            {'type': 'keyframe', 'seq': 3, 'flights': [<flight>]}
+
+        `seq` increases with every payload so that subscribers can detect missed ones.
+
+        :param keyframe_interval_in_sec:
+        :param key: the key identifying a flight
+        :param clock:
+        """
+        self.keyframe_interval_in_sec = keyframe_interval_in_sec
+        self.key = key
+        self.clock = clock
+
+        self._seq = 0
+        self._flights: Dict[Any, Dict[str, Any]] = {}
+        self._last_keyframe_at: Optional[float] = None
+
+    def is_due(self) -> bool:
+        """
+        Whether a keyframe should be encoded even though the data has not changed.
+        """
+        return self._last_keyframe_at is None \
+            or self.clock() - self._last_keyframe_at >= self.keyframe_interval_in_sec
+
+    def encode(self, data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the keyframe or the delta of the data, or None if there is no difference with the
+        previously encoded data.
+
+        :param data: list of flights
+        """
+        flights = {flight[self.key]: flight for flight in data}
+
+        if self.is_due():
+            payload = {'type': 'keyframe', 'flights': data}
+            self._last_keyframe_at = self.clock()
+        else:
+            payload = self._delta(flights)
+            if payload is None:
+                return None
+
+        self._flights = flights
+        self._seq += 1
+        payload['seq'] = self._seq
+
+        return payload
+
+    def _delta(self, flights: Dict[Any, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        added, moved = [], []
+
+        for key, flight in flights.items():
+            previous = self._flights.get(key)
+
+            if previous is None:
+                added.append(flight)
+            elif flight != previous:
+                changes = {k: v for k, v in flight.items() if previous.get(k) != v}
+                changes[self.key] = key
+                moved.append(changes)
+
+        removed = [key for key in self._flights if key not in flights]
+
+        if not (added or removed or moved):
+            return None
+
+        return {'type': 'delta', 'added': added, 'removed': removed, 'moved': moved}
+
+
+def check_payload_settings(publish_mode: str, payload_format: str, serializer: str) -> None:
+    """
+    :param publish_mode: one of `PUBLISH_MODES`
+    :param payload_format: one of `PAYLOAD_FORMATS`
+    :param serializer: one of `swim_adsb.adsb.serializers.SERIALIZERS`
+    :raises ValueError: if any of them is unknown, the optional dependency of the serializer is
+                        not installed or the serializer does not support the payload format
+    """
+    if publish_mode not in PUBLISH_MODES:
+        raise ValueError(f"Invalid publish mode '{publish_mode}'. Choose one of {PUBLISH_MODES}")
+
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ValueError(f"Invalid payload format '{payload_format}'. "
+                         f"Choose one of {PAYLOAD_FORMATS}")
+
+    # fails if the serializer is unknown or its optional dependency is missing
+    serializer_instance = create_serializer(serializer)
+
+    if payload_format == FORMAT_DELTA and not serializer_instance.supports_delta:
+        raise ValueError(f"The '{serializer}' serializer does not support the "
+                         f"'{FORMAT_DELTA}' payload format")
+
+
+class TopicPayload:
+    def __init__(self,
+                 publish_mode: str = PUBLISH_ALWAYS,
+                 payload_format: str = FORMAT_FULL,
+                 keyframe_interval_in_sec: float = 60,
+                 serializer: str = SERIALIZER_JSON,
+                 name: str = ''):
+        """
+        Keeps the serialized payload of a topic along with the version of the data it was
+        produced from, so that the data is serialized only once per version, and decides whether
+        anything should be published on a tick based on the publish mode.
+
+        The same `Message` objects are reused on every tick.
+
+        :param publish_mode: one of `PUBLISH_MODES`
+        :param payload_format: one of `PAYLOAD_FORMATS`
+        :param keyframe_interval_in_sec: how often a keyframe is published in `FORMAT_DELTA`
+        :param serializer: one of `swim_adsb.adsb.serializers.SERIALIZERS`
+        :param name: identifies the topic in the metrics
+        """
+        check_payload_settings(publish_mode, payload_format, serializer)
+
+        self.serializer = create_serializer(serializer)
+        self.publish_mode = publish_mode
+        self.encoder = DeltaEncoder(keyframe_interval_in_sec) \
+            if payload_format == FORMAT_DELTA else FullEncoder()
+        self.message = Message(content_type=self.serializer.content_type)
+        self.heartbeat = Message(body=self.serializer.dumps(HEARTBEAT),
+                                 content_type=self.serializer.content_type)
+
+        self._version: Optional[Hashable] = None
+        self._body: Optional[Body] = None
+        self._published_body: Optional[Body] = None
+
+        self._serialization_duration = registry.histogram(
+            'payload_serialization_duration_seconds', 'Time spent serializing payloads', topic=name)
+        self._payload_size = registry.histogram(
+            'payload_size_bytes', 'Size of the serialized payloads',
+            buckets=SIZE_BUCKETS, topic=name)
+        self._published = registry.counter(
+            'messages_total', 'Number of messages by outcome', topic=name, outcome='published')
+        self._unchanged = registry.counter(
+            'messages_total', 'Number of messages by outcome', topic=name, outcome='unchanged')
+
+    def get_message(self, version: Hashable, get_data: Callable[[], Any]) -> Optional[Message]:
+        """
+        Returns the message to be published for the given version of the data or None if nothing
+        should be published.
+
+        In `FORMAT_DELTA` the last delta is published again as long as the data does not change,
+        which is harmless since applying a delta is idempotent.
+
+        :param version: identifies the data; the data is serialized again only when it changes
+        :param get_data: returns the data to be serialized
+        """
+        if version != self._version or self.encoder.is_due():
+            with self._serialization_duration.time():
+                payload = self.encoder.encode(get_data())
+                if payload is not None:
+                    self._body = self.serializer.dumps(payload)
+                    self._payload_size.observe(len(self._body))
+            self._version = version
+
+        if self.publish_mode != PUBLISH_ALWAYS and self._body == self._published_body:
+            self._unchanged.inc()
+            return self.heartbeat if self.publish_mode == PUBLISH_HEARTBEAT else None
+
+        self._published.inc()
+
+        if self.message.body is not self._body:
+            self.message.body = self._body
+        self._published_body = self._body
+
+        return self.message
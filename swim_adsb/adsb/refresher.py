@@ -0,0 +1,129 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+
+class _Job:
+    def __init__(self, name: str, func: Callable[[], None], interval_in_sec: float):
+        self.name = name
+        self.func = func
+        self.interval_in_sec = interval_in_sec
+        self.next_run_at = 0.0
+        self.is_triggered = False
+
+
+class PeriodicRefresher:
+    def __init__(self, name: str = 'refresher', timer: Callable[[], float] = time.monotonic):
+        """
+        Runs jobs on their own schedule in a dedicated background thread. Jobs run one at a time in
+        the order they were added when several of them are due at once.
+
+        :param name: the name of the thread
+        :param timer:
+        """
+        self.name = name
+        self.timer = timer
+
+        self._jobs: Dict[str, _Job] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_job(self, name: str, func: Callable[[], None], interval_in_sec: float) -> None:
+        """
+        Schedules a job to run every `interval_in_sec`, the first time as soon as possible.
+
+        :param name: identifies the job
+        :param func: the job itself
+        :param interval_in_sec:
+        """
+        self._jobs[name] = _Job(name, func, interval_in_sec)
+        self._wakeup.set()
+
+    def trigger(self, name: str) -> None:
+        """
+        Runs a job as soon as possible, regardless of its schedule.
+
+        :param name:
+        """
+        self._jobs[name].is_triggered = True
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            for job in list(self._jobs.values()):
+                if self._stopped.is_set():
+                    return
+
+                if job.is_triggered or self.timer() >= job.next_run_at:
+                    self._run_job(job)
+
+            now = self.timer()
+            next_run_at = min((now if job.is_triggered else job.next_run_at
+                               for job in self._jobs.values()), default=now + 1)
+
+            self._wakeup.wait(max(next_run_at - now, 0))
+            self._wakeup.clear()
+
+    def _run_job(self, job: _Job) -> None:
+        job.is_triggered = False
+        try:
+            job.func()
+        except Exception as e:
+            _logger.error(f"Refresh job '{job.name}' failed: {e}")
+        finally:
+            job.next_run_at = self.timer() + job.interval_in_sec
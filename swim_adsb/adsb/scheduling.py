@@ -0,0 +1,211 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, TYPE_CHECKING
+
+from proton import Message
+
+from swim_adsb.adsb.metrics import registry, Gauge
+
+if TYPE_CHECKING:
+    from swim_adsb.adsb.air_traffic import AirTraffic
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def count_changes(previous: Dict[Hashable, Any], current: Dict[Hashable, Any]) -> int:
+    """
+    Returns the number of items added, removed or changed between two observations.
+
+    :param previous: items keyed by their identifier
+    :param current: items keyed by their identifier
+    """
+    changed = sum(1 for key, value in current.items() if previous.get(key, value) != value)
+    added = len(current.keys() - previous.keys())
+    removed = len(previous.keys() - current.keys())
+
+    return added + removed + changed
+
+
+class _Schedule:
+    def __init__(self, interval_in_sec: float, interval_gauge: Gauge):
+        self.interval_in_sec = interval_in_sec
+        self.interval_gauge = interval_gauge
+        self.last_run_at: Optional[float] = None
+        self.last_items: Optional[Dict[Hashable, Any]] = None
+        # changes per second, smoothed over the observations
+        self.change_rate: Optional[float] = None
+
+
+class AdaptiveScheduler:
+    def __init__(self,
+                 min_interval_in_sec: float,
+                 max_interval_in_sec: float,
+                 target_changes_per_run: float = 5,
+                 smoothing: float = 0.5,
+                 name: str = 'scheduler',
+                 timer: Callable[[], float] = time.monotonic):
+        """
+        Adapts the interval between the runs of several periodic jobs (e.g. publishing a topic or
+        retrieving the flight connections of an airport) to the rate at which their data changes.
+
+        After every run the number of items added, removed or changed since the previous run is
+        observed, and the interval is set so that about `target_changes_per_run` changes happen
+        between two runs, within the min/max bounds. Busy jobs run at `min_interval_in_sec` while
+        idle ones, e.g. at night, back off up to `max_interval_in_sec`.
+
+        The jobs are expected to be polled (see `is_due`) every `min_interval_in_sec`.
+
+        :param min_interval_in_sec:
+        :param max_interval_in_sec:
+        :param target_changes_per_run:
+        :param smoothing: weight of the latest observation in the change rate, between 0 and 1
+        :param name: identifies the scheduler in the metrics
+        :param timer:
+        """
+        if not 0 < min_interval_in_sec <= max_interval_in_sec:
+            raise ValueError('The intervals should be positive and the min one should not exceed '
+                             'the max one')
+
+        self.min_interval_in_sec = min_interval_in_sec
+        self.max_interval_in_sec = max_interval_in_sec
+        self.target_changes_per_run = target_changes_per_run
+        self.smoothing = smoothing
+        self.name = name
+        self.timer = timer
+
+        self._schedules: Dict[Hashable, _Schedule] = {}
+        self._lock = threading.Lock()
+
+    def _get_schedule(self, key: Hashable) -> _Schedule:
+        schedule = self._schedules.get(key)
+
+        if schedule is None:
+            interval_gauge = registry.gauge('scheduler_interval_seconds',
+                                            'Current interval of the adaptively scheduled jobs',
+                                            scheduler=self.name,
+                                            job=str(key))
+            interval_gauge.set(self.min_interval_in_sec)
+            schedule = self._schedules[key] = _Schedule(self.min_interval_in_sec, interval_gauge)
+
+        return schedule
+
+    def get_interval(self, key: Hashable) -> float:
+        with self._lock:
+            return self._get_schedule(key).interval_in_sec
+
+    def is_due(self, key: Hashable) -> bool:
+        """
+        Whether the job should run now. Jobs that never ran are always due.
+
+        :param key: identifies the job
+        """
+        with self._lock:
+            schedule = self._get_schedule(key)
+
+            if schedule.last_run_at is None:
+                return True
+
+            # the jobs are polled every min interval, so a poll slightly earlier than the end of the
+            # interval is considered on time rather than postponing the run by a whole poll
+            elapsed = self.timer() - schedule.last_run_at
+            return elapsed >= schedule.interval_in_sec - self.min_interval_in_sec / 2
+
+    def observe(self, key: Hashable, items: Dict[Hashable, Any]) -> None:
+        """
+        Records a run of a job along with its data and adapts its interval accordingly.
+
+        :param key: identifies the job
+        :param items: the data of the job keyed by item identifier
+        """
+        with self._lock:
+            schedule = self._get_schedule(key)
+            now = self.timer()
+
+            if schedule.last_run_at is not None and now > schedule.last_run_at:
+                rate = count_changes(schedule.last_items, items) / (now - schedule.last_run_at)
+
+                if schedule.change_rate is None:
+                    schedule.change_rate = rate
+                else:
+                    schedule.change_rate = \
+                        self.smoothing * rate + (1 - self.smoothing) * schedule.change_rate
+
+                schedule.interval_in_sec = self._interval(schedule.change_rate)
+                schedule.interval_gauge.set(schedule.interval_in_sec)
+
+            schedule.last_run_at = now
+            schedule.last_items = items
+
+    def _interval(self, change_rate: float) -> float:
+        if change_rate <= 0:
+            return self.max_interval_in_sec
+
+        interval = self.target_changes_per_run / change_rate
+
+        return min(self.max_interval_in_sec, max(self.min_interval_in_sec, interval))
+
+
+class AdaptiveTopicProducer:
+    def __init__(self,
+                 scheduler: AdaptiveScheduler,
+                 air_traffic: 'AirTraffic',
+                 kind: str,
+                 name: str,
+                 producer: Callable[..., Optional[Message]]):
+        """
+        Wraps the message producer of a topic so that it publishes only when its adaptive interval
+        has elapsed. Its messenger is meant to tick every `scheduler.min_interval_in_sec`.
+
+        :param scheduler:
+        :param air_traffic:
+        :param kind: 'arrivals', 'departures', 'tracks' or 'area'
+        :param name: icao of the airport or name of the area
+        :param producer: the message producer to wrap
+        """
+        self.scheduler = scheduler
+        self.air_traffic = air_traffic
+        self.kind = kind
+        self.name = name
+        self.producer = producer
+
+    def __call__(self, context: Optional[Any] = None) -> Optional[Message]:
+        key = (self.kind, self.name)
+
+        if not self.air_traffic.is_topic_active(*key) or not self.scheduler.is_due(key):
+            return None
+
+        message = self.producer(context)
+
+        self.scheduler.observe(key, {flight['icao24']: flight
+                                     for flight in self.air_traffic.get_flights(*key)})
+
+        return message
@@ -0,0 +1,163 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import logging
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional
+
+from swim_adsb.adsb.snapshots import encode_states, decode_states
+from swim_adsb.adsb.states import StatesTable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+# the control segment holds the generation of the latest snapshot, whose segment is named after it
+_CONTROL = struct.Struct('<Q')
+
+# number of generations kept alive besides the latest one, so that readers which just learnt about
+# a generation can still attach to it
+_KEPT_GENERATIONS = 2
+
+
+def _segment_name(name: str, generation: int) -> str:
+    return f"{name}-{generation}"
+
+
+class SharedStatesWriter:
+    def __init__(self, name: str, timer: Callable[[], float] = time.time):
+        """
+        Shares states snapshots with other processes through shared memory, so that a single
+        process retrieves them from OpenSky on behalf of all of them.
+
+        Every snapshot is written once in its own segment (in the format of the states snapshot
+        files) and becomes visible to the readers at once, when its generation is written in the
+        control segment. Segments are never modified after being published.
+
+        :param name: the name of the control segment, which the readers need to know
+        :param timer:
+        """
+        self.name = name
+        self.timer = timer
+
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=_CONTROL.size)
+        _CONTROL.pack_into(self._control.buf, 0, 0)
+        self._segments: Dict[int, shared_memory.SharedMemory] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def write(self, states: StatesTable) -> None:
+        data = encode_states(states, saved_at=self.timer())
+
+        with self._lock:
+            generation = self._generation + 1
+            segment = shared_memory.SharedMemory(name=_segment_name(self.name, generation),
+                                                 create=True,
+                                                 size=len(data))
+            segment.buf[:len(data)] = data
+            self._segments[generation] = segment
+
+            _CONTROL.pack_into(self._control.buf, 0, generation)
+            self._generation = generation
+
+            for old_generation in [g for g in self._segments if g < generation - _KEPT_GENERATIONS]:
+                self._unlink(self._segments.pop(old_generation))
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments.values():
+                self._unlink(segment)
+            self._segments.clear()
+            self._unlink(self._control)
+
+    @staticmethod
+    def _unlink(segment: shared_memory.SharedMemory) -> None:
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedStatesReader:
+    def __init__(self, name: str):
+        """
+        Reads the states snapshots shared by a `SharedStatesWriter` of another process.
+
+        :param name: the name of the control segment of the writer
+        """
+        self.name = name
+
+        self._control: Optional[shared_memory.SharedMemory] = None
+        self._generation = 0
+        self._states = StatesTable.from_state_vectors([])
+        self._lock = threading.Lock()
+
+    def read(self) -> StatesTable:
+        """
+        Returns the latest shared snapshot. The same table is returned as long as no new snapshot
+        is shared, and an empty one until the first snapshot is shared.
+        """
+        with self._lock:
+            try:
+                generation = self._read_generation()
+
+                if generation != self._generation:
+                    self._states = self._read_segment(generation)
+                    self._generation = generation
+            except (FileNotFoundError, ValueError) as e:
+                # the writer is not started yet or the segment was already replaced: the next read
+                # will pick up the latest one
+                _logger.warning(f"Failed to read the shared states: {e}")
+
+            return self._states
+
+    def close(self) -> None:
+        with self._lock:
+            if self._control is not None:
+                self._control.close()
+                self._control = None
+
+    def _read_generation(self) -> int:
+        if self._control is None:
+            self._control = shared_memory.SharedMemory(name=self.name)
+
+        return _CONTROL.unpack_from(self._control.buf)[0]
+
+    def _read_segment(self, generation: int) -> StatesTable:
+        segment = shared_memory.SharedMemory(name=_segment_name(self.name, generation))
+        try:
+            data = bytes(segment.buf)
+        finally:
+            segment.close()
+
+        return decode_states(data)[1]
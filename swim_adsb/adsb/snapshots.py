@@ -0,0 +1,246 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from swim_adsb.adsb.states import StatesTable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_logger = logging.getLogger(__name__)
+
+STATES_FILENAME = 'states.bin'
+
+# magic, format version, saved at (seconds since UNIX epoch), number of rows, size of the icao24
+# block, followed by the icao24 block ('\n' separated) and the columns of the table in order
+_STATES_HEADER = struct.Struct('<4sHdII')
+_STATES_MAGIC = b'ADSB'
+_STATES_FORMAT_VERSION = 2
+_STATES_COLUMNS = (('latitude', 'd'),
+                   ('longitude', 'd'),
+                   ('last_contact', 'q'),
+                   ('time_position', 'q'),
+                   ('velocity', 'd'),
+                   ('true_track', 'd'))
+
+
+class SnapshotStore:
+    def __init__(self,
+                 directory: str,
+                 max_states_age_in_sec: Optional[float] = 600,
+                 min_save_interval_in_sec: float = 60,
+                 timer: Callable[[], float] = time.time):
+        """
+        Persists the latest snapshots in a directory so that they can be served right away after a
+        restart, while the fresh ones are retrieved from OpenSky.
+
+        The states are stored in a compact binary file holding the columns of the `StatesTable`
+        as is, and the flight connections in a JSON file per kind ('arrivals' or 'departures').
+        Files are replaced atomically, so a crash while saving never leaves a corrupt snapshot.
+
+        Failing to save or load a snapshot is logged and otherwise ignored.
+
+        :param directory: created if it does not exist
+        :param max_states_age_in_sec: states saved longer ago are not loaded. None means no limit.
+                                      The flight connections are always loaded since their store
+                                      knows what is still to be retrieved.
+        :param min_save_interval_in_sec: a snapshot saved less than that ago is not saved again
+        :param timer:
+        """
+        self.directory = directory
+        self.max_states_age_in_sec = max_states_age_in_sec
+        self.min_save_interval_in_sec = min_save_interval_in_sec
+        self.timer = timer
+
+        self._saved_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def save_states(self, states: StatesTable, force: bool = False) -> None:
+        """
+        :param states:
+        :param force: saves even if the previous save is too recent
+        """
+        if not self._is_save_due(STATES_FILENAME, force):
+            return
+
+        self._write(STATES_FILENAME, encode_states(states, saved_at=self.timer()))
+
+    def load_states(self) -> Optional[StatesTable]:
+        data = self._read(STATES_FILENAME)
+        if data is None:
+            return None
+
+        try:
+            saved_at, states = decode_states(data)
+        except ValueError as e:
+            _logger.error(f"Failed to load the states snapshot: {e}")
+            return None
+
+        if self.max_states_age_in_sec is not None \
+                and self.timer() - saved_at > self.max_states_age_in_sec:
+            _logger.info('The states snapshot is too old to be loaded')
+            return None
+
+        return states
+
+    def save_flight_connections(self, kind: str, dump: Dict[str, Any], force: bool = False) -> None:
+        """
+        :param kind: 'arrivals' or 'departures'
+        :param dump: as returned by `FlightConnectionStore.dump`
+        :param force: saves even if the previous save is too recent
+        """
+        filename = f"{kind}.json"
+
+        if self._is_save_due(filename, force):
+            self._write(filename, json.dumps(dump, separators=(',', ':')).encode('utf-8'))
+
+    def load_flight_connections(self, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        :param kind: 'arrivals' or 'departures'
+        :return: the dump to pass to `FlightConnectionStore.load`
+        """
+        data = self._read(f"{kind}.json")
+        if data is None:
+            return None
+
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            _logger.error(f"Failed to load the {kind} snapshot: {e}")
+            return None
+
+    def _is_save_due(self, filename: str, force: bool) -> bool:
+        with self._lock:
+            now = self.timer()
+            saved_at = self._saved_at.get(filename)
+
+            if not force and saved_at is not None \
+                    and now - saved_at < self.min_save_interval_in_sec:
+                return False
+
+            self._saved_at[filename] = now
+            return True
+
+    def _write(self, filename: str, data: bytes) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{filename}.")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(self.directory, filename))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            _logger.error(f"Failed to save the snapshot {filename}: {e}")
+
+    def _read(self, filename: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.directory, filename), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            _logger.error(f"Failed to load the snapshot {filename}: {e}")
+            return None
+
+
+def encode_states(states: StatesTable, saved_at: float) -> bytes:
+    """
+    Encodes a states table in the binary format of the states snapshots.
+
+    :param states:
+    :param saved_at: stored along with the table, in seconds since UNIX epoch
+    """
+    icao24 = '\n'.join(states.icao24).encode('ascii')
+    header = _STATES_HEADER.pack(_STATES_MAGIC,
+                                 _STATES_FORMAT_VERSION,
+                                 saved_at,
+                                 len(states),
+                                 len(icao24))
+    columns = [_little_endian(getattr(states, name)) for name, _ in _STATES_COLUMNS]
+
+    return b''.join([header, icao24] + [column.tobytes() for column in columns])
+
+
+def decode_states(data: bytes) -> Tuple[float, StatesTable]:
+    """
+    Decodes a states table encoded by `encode_states`. Trailing bytes are ignored.
+
+    :param data:
+    :return: the time it was saved at along with the table
+    :raises ValueError: if the data is not a valid states snapshot
+    """
+    try:
+        magic, version, saved_at, size, icao24_size = _STATES_HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(str(e))
+
+    if magic != _STATES_MAGIC or version != _STATES_FORMAT_VERSION:
+        raise ValueError('unknown format')
+
+    offset = _STATES_HEADER.size
+    icao24 = data[offset:offset + icao24_size].decode('ascii').split('\n') if size else []
+    offset += icao24_size
+
+    columns = []
+    for _, typecode in _STATES_COLUMNS:
+        column = array(typecode)
+        column.frombytes(data[offset:offset + size * column.itemsize])
+        columns.append(_little_endian(column))
+        offset += size * column.itemsize
+
+    if len(icao24) != size or any(len(column) != size for column in columns):
+        raise ValueError('truncated data')
+
+    return saved_at, StatesTable(icao24, *columns)
+
+
+def _little_endian(column: array) -> array:
+    """
+    Returns the column in little endian byte order, which is the one of the files, swapping a copy
+    of it on big endian machines. Swapping is its own inverse, so it converts both ways.
+    """
+    if sys.byteorder == 'little':
+        return column
+
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+
+    return swapped
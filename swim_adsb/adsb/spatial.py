@@ -0,0 +1,88 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+from typing import Dict, Iterator, List, Tuple
+
+from swim_adsb.adsb.geo import BoundingBox, Geofence
+from swim_adsb.adsb.states import StatesTable
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+class GridIndex:
+    def __init__(self, states: StatesTable, cell_size_in_degrees: float = 1.0):
+        """
+        Buckets the rows of a states snapshot in a grid of cells of `cell_size_in_degrees`, so that
+        the aircraft within an area can be found by looking at the few cells the area overlaps
+        instead of scanning the whole snapshot. The states without coordinates are left out.
+
+        :param states:
+        :param cell_size_in_degrees:
+        """
+        self.states = states
+        self.cell_size_in_degrees = cell_size_in_degrees
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        for row, (latitude, longitude) in enumerate(zip(states.latitude, states.longitude)):
+            if math.isnan(latitude) or math.isnan(longitude):
+                continue
+
+            self.cells.setdefault(self._cell(latitude, longitude), []).append(row)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size_in_degrees),
+                math.floor(longitude / self.cell_size_in_degrees))
+
+    def query(self, bounding_box: BoundingBox) -> Iterator[int]:
+        """
+        Yields the rows of the states within a bounding box.
+
+        :param bounding_box:
+        """
+        min_cell = self._cell(bounding_box.min_latitude, bounding_box.min_longitude)
+        max_cell = self._cell(bounding_box.max_latitude, bounding_box.max_longitude)
+        latitudes, longitudes = self.states.latitude, self.states.longitude
+
+        for latitude_cell in range(min_cell[0], max_cell[0] + 1):
+            for longitude_cell in range(min_cell[1], max_cell[1] + 1):
+                for row in self.cells.get((latitude_cell, longitude_cell), ()):
+                    if bounding_box.contains(latitudes[row], longitudes[row]):
+                        yield row
+
+    def query_geofence(self, geofence: Geofence) -> List[int]:
+        """
+        Returns the rows of the states within a geofence.
+
+        :param geofence:
+        """
+        latitudes, longitudes = self.states.latitude, self.states.longitude
+
+        return [row for row in self.query(geofence.bounding_box())
+                if geofence.contains(latitudes[row], longitudes[row])]
@@ -0,0 +1,137 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+from array import array
+from typing import Iterable, Dict, List, Optional
+
+from opensky_network_client.models import StateVector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+_NO_TIMESTAMP = -1
+
+
+class StatesTable:
+    def __init__(self,
+                 icao24: List[str],
+                 latitude: array,
+                 longitude: array,
+                 last_contact: array,
+                 time_position: array,
+                 velocity: array,
+                 true_track: array):
+        """
+        A snapshot of flight states stored in columns, keeping only the attributes that are
+        published or needed to extrapolate the positions, along with an icao24 to row index.
+
+        Missing numbers are stored as NaN and missing timestamps as -1.
+
+        :param icao24:
+        :param latitude: array of doubles
+        :param longitude: array of doubles
+        :param last_contact: array of long long, in seconds since UNIX epoch
+        :param time_position: array of long long, time of the position in seconds since UNIX epoch
+        :param velocity: array of doubles, ground speed in m/s
+        :param true_track: array of doubles, clockwise from north in degrees
+        """
+        self.icao24 = icao24
+        self.latitude = latitude
+        self.longitude = longitude
+        self.last_contact = last_contact
+        self.time_position = time_position
+        self.velocity = velocity
+        self.true_track = true_track
+
+        self.rows: Dict[str, int] = {icao24: row for row, icao24 in enumerate(icao24)}
+
+    @classmethod
+    def from_state_vectors(cls, states: Iterable[StateVector]) -> 'StatesTable':
+        """
+        Builds the table out of a list of states. Only the last state of each aircraft is kept.
+
+        :param states:
+        """
+        icao24 = []
+        columns = (array('d'), array('d'), array('q'), array('q'), array('d'), array('d'))
+        rows = {}
+
+        for state in states:
+            values = (
+                _float(state.latitude),
+                _float(state.longitude),
+                _timestamp(state.last_contact_in_sec),
+                _timestamp(state.time_position_in_sec),
+                _float(state.velocity_in_m_per_sec),
+                _float(state.true_track_in_degrees)
+            )
+
+            row = rows.get(state.icao24)
+            if row is None:
+                rows[state.icao24] = len(icao24)
+                icao24.append(state.icao24)
+                for column, value in zip(columns, values):
+                    column.append(value)
+            else:
+                for column, value in zip(columns, values):
+                    column[row] = value
+
+        return cls(icao24, *columns)
+
+    def __len__(self) -> int:
+        return len(self.icao24)
+
+    def __contains__(self, icao24: str) -> bool:
+        return icao24 in self.rows
+
+    def row(self, icao24: str) -> Optional[int]:
+        return self.rows.get(icao24)
+
+    def get_latitude(self, row: int) -> Optional[float]:
+        return _optional_float(self.latitude[row])
+
+    def get_longitude(self, row: int) -> Optional[float]:
+        return _optional_float(self.longitude[row])
+
+    def get_last_contact(self, row: int) -> Optional[int]:
+        value = self.last_contact[row]
+
+        return None if value == _NO_TIMESTAMP else value
+
+
+def _float(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _timestamp(value: Optional[int]) -> int:
+    return _NO_TIMESTAMP if value is None else int(value)
@@ -28,21 +28,54 @@ http://opensource.org/licenses/BSD-3-Clause
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
 import logging
+import multiprocessing
 import os
+import threading
 from functools import partial
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Optional, Callable, Set
 
 import yaml
-from pkg_resources import resource_filename
+from opensky_network_client.opensky_network import OpenskyNetworkClient
 from pubsub_facades.swim_pubsub import SWIMPublisher
+from subscription_manager_client.subscription_manager import SubscriptionManagerClient
 from swim_proton.messaging_handlers import Messenger
 
+from swim_adsb.adsb import metrics
+from swim_adsb.adsb.activation import TopicActivity
 from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.engine import AsyncPublishingEngine
+from swim_adsb.adsb.geo import BoundingBox, bounding_box_around, union, Geofence, CircleGeofence, \
+    PolygonGeofence
+from swim_adsb.adsb.governor import RequestGovernor
+from swim_adsb.adsb.history import FlightHistory
+from swim_adsb.adsb.payloads import PUBLISH_ALWAYS, FORMAT_FULL
+from swim_adsb.adsb.refresher import PeriodicRefresher
+from swim_adsb.adsb.scheduling import AdaptiveScheduler, AdaptiveTopicProducer
+from swim_adsb.adsb.serializers import SERIALIZER_JSON
+from swim_adsb.adsb.sharing import SharedStatesWriter, SharedStatesReader
+from swim_adsb.adsb.snapshots import SnapshotStore
+from swim_adsb.adsb.states import StatesTable
 
 __author__ = "EUROCONTROL (SWIM)"
 
 _logger = logging.getLogger(__name__)
 
+DEFAULT_RADIUS_IN_KM = 250
+
+STATES_FILTER_NONE = 'none'
+STATES_FILTER_BOUNDING_BOX = 'bounding_box'
+STATES_FILTER_ICAO24 = 'icao24'
+STATES_FILTERS = (STATES_FILTER_NONE, STATES_FILTER_BOUNDING_BOX, STATES_FILTER_ICAO24)
+
+# every topic produces its messages on the reactor thread
+ENGINE_MESSENGER = 'messenger'
+# the topics are produced together on an asyncio event loop in their own thread
+ENGINE_ASYNCIO = 'asyncio'
+ENGINES = (ENGINE_MESSENGER, ENGINE_ASYNCIO)
+
+# how often the shards pick up the states shared by the fetcher process
+SHARED_STATES_POLL_IN_SEC = 1
+
 
 def _get_config_path():
     current_dir = os.path.dirname(os.path.realpath(__file__))
@@ -65,29 +98,514 @@ def _from_yaml(filename: str) -> Union[Dict[str, Any], None]:
     return obj or None
 
 
-config = _from_yaml(filename=resource_filename(__name__, 'config.yml'))
+def _get_city_airports(cities: Dict[str, Union[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Normalizes the configured cities, whose airport is given either by its icao only or by a dict
+    with its 'ICAO' and optionally its 'LAT', 'LNG' and 'RADIUS_IN_KM'.
 
-# The publisher that will communicate with the SubscriptionManager to create new topics and with the broker where the
-# messages will be routed
-swim_publisher = SWIMPublisher.create_from_config(_get_config_path())
+    :param cities:
+    :return: the airport of each city as a dict
+    """
+    return {city: airport if isinstance(airport, dict) else {'ICAO': airport}
+            for city, airport in cities.items()}
 
 
-# configure topics
-air_traffic = AirTraffic(traffic_time_span_in_days=config['ADSB']['TRAFFIC_TIMESPAN_IN_DAYS'])
-interval_in_sec = config['ADSB']['INTERVAL_IN_SEC']
+def _get_areas(areas: Dict[str, Dict[str, Any]]) -> Dict[str, Geofence]:
+    """
+    Converts the configured areas into geofences. An area is either a circle given by its 'LAT',
+    'LNG' and 'RADIUS_IN_KM' or a polygon given by the [latitude, longitude] of its vertices in
+    'POLYGON'.
 
-for city, code in config['ADSB']['CITIES'].items():
-    swim_publisher.add_topic_messenger(Messenger(
-        id=f"arrivals.{city.lower()}",
-        message_producer=partial(air_traffic.arrivals_handler, code),
-        interval_in_sec=interval_in_sec
-    ))
-    swim_publisher.add_topic_messenger(Messenger(
-        id=f"departures.{city.lower()}",
-        message_producer=partial(air_traffic.departures_handler, code),
-        interval_in_sec=interval_in_sec
-    ))
+    :param areas:
+    :return: the geofence of each area
+    """
+    result = {}
+    for name, area in areas.items():
+        if 'POLYGON' in area:
+            if len(area['POLYGON']) < 3:
+                raise ValueError(f"The POLYGON of the area {name} should have at least 3 vertices")
 
+            vertices = tuple(tuple(vertex) for vertex in area['POLYGON'])
+            result[name] = PolygonGeofence(vertices=vertices)
+        elif {'LAT', 'LNG', 'RADIUS_IN_KM'} <= area.keys():
+            result[name] = CircleGeofence(latitude=area['LAT'],
+                                          longitude=area['LNG'],
+                                          radius_in_km=area['RADIUS_IN_KM'])
+        else:
+            raise ValueError(f"The area {name} should have either a POLYGON or a LAT, LNG and "
+                             f"RADIUS_IN_KM")
+
+    return result
+
+
+def _get_states_bounding_box(city_airports: Dict[str, Dict[str, Any]],
+                             areas: Dict[str, Geofence]) -> Optional[BoundingBox]:
+    """
+    Returns the bounding box containing the area of every airport, that is the circle of its
+    'RADIUS_IN_KM' around its coordinates, and every area.
+
+    :param city_airports:
+    :param areas:
+    """
+    bounding_boxes = []
+    for city, airport in city_airports.items():
+        if 'LAT' not in airport or 'LNG' not in airport:
+            raise ValueError(f"LAT and LNG of {city} are required in order to filter the states by "
+                             f"bounding box")
+
+        radius_in_km = airport.get('RADIUS_IN_KM', DEFAULT_RADIUS_IN_KM)
+        bounding_boxes.append(bounding_box_around(latitude=airport['LAT'],
+                                                  longitude=airport['LNG'],
+                                                  radius_in_km=radius_in_km))
+
+    bounding_boxes.extend(geofence.bounding_box() for geofence in areas.values())
+
+    return union(bounding_boxes)
+
+
+class Settings:
+    def __init__(self, config: Dict[str, Any], config_path: str):
+        """
+        The validated configuration of the application along with the values derived from it.
+
+        :param config: the content of the config file
+        :param config_path: the path of the config file, from which the publisher reads its own
+                            configuration
+        """
+        self.config = config
+        self.config_path = config_path
+
+        adsb = config['ADSB']
+        self.city_airports = _get_city_airports(adsb['CITIES'])
+        self.areas = _get_areas(adsb.get('AREAS') or {})
+        self.states_filter = adsb.get('STATES_FILTER', STATES_FILTER_NONE)
+
+        if self.states_filter not in STATES_FILTERS:
+            raise ValueError(f"Invalid STATES_FILTER '{self.states_filter}'. "
+                             f"Choose one of {STATES_FILTERS}")
+
+        # the areas would only carry the aircraft of the arrivals and departures of the airports
+        if self.areas and self.states_filter == STATES_FILTER_ICAO24:
+            raise ValueError(f"AREAS cannot be combined with STATES_FILTER "
+                             f"'{STATES_FILTER_ICAO24}', which only retrieves the aircraft of the "
+                             f"arrivals and departures")
+
+        self.states_bounding_box = _get_states_bounding_box(self.city_airports, self.areas) \
+            if self.states_filter == STATES_FILTER_BOUNDING_BOX else None
+
+        self.engine = adsb.get('ENGINE', ENGINE_MESSENGER)
+
+        if self.engine not in ENGINES:
+            raise ValueError(f"Invalid ENGINE '{self.engine}'. Choose one of {ENGINES}")
+
+        self.interval_in_sec = adsb['INTERVAL_IN_SEC']
+        self.states_interval_in_sec = adsb.get('STATES_REFRESH_IN_SEC', 30)
+        self.flight_connections_interval_in_sec = adsb.get('FLIGHT_CONNECTIONS_REFRESH_IN_SEC', 600)
+        self.adaptive_scheduling = adsb.get('ADAPTIVE_SCHEDULING', {})
+        self.snapshots_dir = adsb.get('SNAPSHOTS_DIR')
+        self.shards = adsb.get('SHARDS', 1)
+        self.request_governor = adsb.get('REQUEST_GOVERNOR', {})
+        self.on_demand_topics = adsb.get('ON_DEMAND_TOPICS', {})
+        self.tracks = adsb.get('TRACKS', {})
+        self.opensky_host = adsb.get('OPENSKY_HOST', 'opensky-network.org')
+        self.opensky_https = adsb.get('OPENSKY_HTTPS', True)
+
+    @property
+    def adsb(self) -> Dict[str, Any]:
+        return self.config['ADSB']
+
+    @classmethod
+    def from_yaml(cls, filename: str) -> 'Settings':
+        return cls(_from_yaml(filename), config_path=filename)
+
+
+def _create_snapshot_store(settings: Settings, directory: Optional[str]) -> Optional[SnapshotStore]:
+    if not directory:
+        return None
+
+    return SnapshotStore(
+        directory=directory,
+        max_states_age_in_sec=settings.adsb.get('SNAPSHOTS_MAX_STATES_AGE_IN_SEC', 600)
+    )
+
+
+def _create_adaptive_scheduler(settings: Settings,
+                               name: str,
+                               min_interval_in_sec: float,
+                               max_interval_in_sec: float) -> Optional[AdaptiveScheduler]:
+    if not settings.adaptive_scheduling.get('ENABLED', False):
+        return None
+
+    target_changes_per_run = settings.adaptive_scheduling.get('TARGET_CHANGES_PER_TICK', 5)
+
+    return AdaptiveScheduler(min_interval_in_sec=min_interval_in_sec,
+                             max_interval_in_sec=max_interval_in_sec,
+                             target_changes_per_run=target_changes_per_run,
+                             name=name)
+
+
+def _create_client(settings: Settings) -> Union[OpenskyNetworkClient, RequestGovernor]:
+    """
+    Returns the OpenSky client, wrapped in a request governor if enabled.
+    """
+    client = OpenskyNetworkClient.create(settings.opensky_host,
+                                         https=settings.opensky_https,
+                                         timeout=30)
+
+    request_governor = settings.request_governor
+    if not request_governor.get('ENABLED', False):
+        return client
+
+    return RequestGovernor(client,
+                           max_requests_per_hour=request_governor.get('MAX_REQUESTS_PER_HOUR'),
+                           burst=request_governor.get('BURST', 20),
+                           low_priority_reserve=request_governor.get('FLIGHT_CONNECTIONS_RESERVE',
+                                                                     0.2),
+                           backoff_in_sec=request_governor.get('BACKOFF_IN_SEC', 5),
+                           max_backoff_in_sec=request_governor.get('MAX_BACKOFF_IN_SEC', 300))
+
+
+def _create_flight_history(settings: Settings) -> Optional[FlightHistory]:
+    if not settings.tracks.get('ENABLED', False):
+        return None
+
+    return FlightHistory(max_age_in_sec=settings.tracks.get('HISTORY_IN_SEC', 900),
+                         resolution_in_sec=settings.tracks.get('RESOLUTION_IN_SEC', 15),
+                         stale_after_in_sec=settings.tracks.get('STALE_AFTER_IN_SEC', 300))
+
+
+def _get_active_topic_ids(sm_client: SubscriptionManagerClient) -> Set[str]:
+    """
+    Returns the ids of the topics with at least one active subscription in the subscription manager.
+
+    :param sm_client:
+    """
+    return {subscription.topic.name
+            for subscription in sm_client.get_subscriptions()
+            if subscription.active}
+
+
+def _create_topic_activity(settings: Settings) -> Optional[TopicActivity]:
+    """
+    Returns the activity of the topics as reported by the subscription manager if the topics are
+    produced on demand, otherwise None.
+    """
+    if not settings.on_demand_topics.get('ENABLED', False):
+        return None
+
+    sm_config = settings.config['SUBSCRIPTION-MANAGER-API']
+    sm_client = SubscriptionManagerClient.create(host=sm_config['host'],
+                                                 https=sm_config.get('https', False),
+                                                 timeout=sm_config.get('timeout', 30),
+                                                 verify=sm_config.get('verify', False),
+                                                 username=sm_config.get('username'),
+                                                 password=sm_config.get('password'))
+
+    return TopicActivity(get_active_topic_ids=partial(_get_active_topic_ids, sm_client))
+
+
+def _create_air_traffic(settings: Settings,
+                        airports: Dict[str, Dict[str, Any]],
+                        area_geofences: Optional[Dict[str, Geofence]] = None,
+                        snapshot_store: Optional[SnapshotStore] = None,
+                        states_source: Optional[Callable[[], StatesTable]] = None,
+                        topic_activity: Optional[TopicActivity] = None,
+                        flight_history: Optional[FlightHistory] = None) -> AirTraffic:
+    """
+    Creates the AirTraffic of the given city airports according to the configuration.
+
+    :param settings:
+    :param airports: the airport of each city
+    :param area_geofences: the geofence of each area
+    :param snapshot_store:
+    :param states_source: see `AirTraffic`
+    :param topic_activity: see `AirTraffic`
+    :param flight_history: see `AirTraffic`
+    """
+    adaptive_scheduling = settings.adaptive_scheduling
+    flight_connections_scheduler = _create_adaptive_scheduler(
+        settings,
+        name='flight_connections',
+        min_interval_in_sec=settings.flight_connections_interval_in_sec,
+        max_interval_in_sec=adaptive_scheduling.get('MAX_FLIGHT_CONNECTIONS_REFRESH_IN_SEC', 3600)
+    )
+
+    return AirTraffic(traffic_time_span_in_days=settings.adsb['TRAFFIC_TIMESPAN_IN_DAYS'],
+                      airports=[airport['ICAO'] for airport in airports.values()],
+                      publish_mode=settings.adsb.get('PUBLISH_MODE', PUBLISH_ALWAYS),
+                      payload_format=settings.adsb.get('PAYLOAD_FORMAT', FORMAT_FULL),
+                      keyframe_interval_in_sec=settings.adsb.get('KEYFRAME_INTERVAL_IN_SEC', 60),
+                      serializer=settings.adsb.get('SERIALIZER', SERIALIZER_JSON),
+                      max_concurrent_requests=settings.adsb.get('MAX_CONCURRENT_REQUESTS', 8),
+                      flight_connections_overlap_in_sec=settings.adsb.get(
+                          'FLIGHT_CONNECTIONS_OVERLAP_IN_SEC', 3600),
+                      states_bounding_box=settings.states_bounding_box,
+                      filter_states_by_icao24=settings.states_filter == STATES_FILTER_ICAO24,
+                      snapshot_store=snapshot_store,
+                      extrapolate_positions=settings.adsb.get('EXTRAPOLATE_POSITIONS', False),
+                      max_extrapolation_in_sec=settings.adsb.get('MAX_EXTRAPOLATION_IN_SEC', 60),
+                      flight_connections_scheduler=flight_connections_scheduler,
+                      states_source=states_source,
+                      areas=area_geofences,
+                      client=_create_client(settings),
+                      topic_activity=topic_activity,
+                      flight_history=flight_history)
+
+
+def _add_topics(settings: Settings,
+                swim_publisher: SWIMPublisher,
+                air_traffic: AirTraffic,
+                airports: Dict[str, Dict[str, Any]],
+                area_geofences: Dict[str, Geofence],
+                publishing_engine: Optional[AsyncPublishingEngine] = None) -> None:
+    """
+    Registers the arrivals, departures and (if the flight history is kept) tracks topics of the
+    given city airports and the topics of the given areas.
+
+    :param settings:
+    :param swim_publisher:
+    :param air_traffic:
+    :param airports: the airport of each city
+    :param area_geofences: the geofence of each area
+    :param publishing_engine: produces the messages if provided, otherwise the handlers of
+                              air_traffic do
+    """
+    interval_in_sec = settings.interval_in_sec
+    topics_scheduler = _create_adaptive_scheduler(
+        settings,
+        name='topics',
+        min_interval_in_sec=interval_in_sec,
+        max_interval_in_sec=settings.adaptive_scheduling.get('MAX_INTERVAL_IN_SEC', 60)
+    )
+
+    handlers = {
+        'arrivals': air_traffic.arrivals_handler,
+        'departures': air_traffic.departures_handler,
+        'tracks': air_traffic.tracks_handler,
+        'area': air_traffic.area_handler
+    }
+    airport_kinds = ('arrivals', 'departures') if air_traffic.flight_history is None \
+        else ('arrivals', 'departures', 'tracks')
+    topics = [(kind, airport['ICAO'], f"{kind}.{city.lower()}")
+              for city, airport in airports.items()
+              for kind in airport_kinds]
+    topics += [('area', area, f"area.{area.lower()}") for area in area_geofences]
+
+    for kind, name, topic_id in topics:
+        if air_traffic.topic_activity is not None:
+            air_traffic.topic_activity.add_topic(topic_id, kind, name)
+
+        if publishing_engine is not None:
+            message_producer = publishing_engine.add_topic(kind, name, interval_in_sec)
+        else:
+            message_producer = partial(handlers[kind], name)
+
+        if topics_scheduler is not None:
+            message_producer = AdaptiveTopicProducer(topics_scheduler,
+                                                     air_traffic,
+                                                     kind=kind,
+                                                     name=name,
+                                                     producer=message_producer)
+
+        swim_publisher.add_topic_messenger(Messenger(
+            id=topic_id,
+            message_producer=message_producer,
+            interval_in_sec=interval_in_sec
+        ))
+
+
+def _start_metrics(settings: Settings, http_port_offset: int = 0) -> None:
+    """
+    :param settings:
+    :param http_port_offset: added to the configured port, so that several processes can serve
+                             their metrics
+    """
+    metrics_config = settings.config.get('METRICS', {})
+    if metrics_config.get('ENABLED', False):
+        metrics.registry.enabled = True
+
+        if metrics_config.get('HTTP_PORT'):
+            metrics.start_http_server(port=metrics_config['HTTP_PORT'] + http_port_offset)
+
+        if metrics_config.get('LOG_INTERVAL_IN_SEC'):
+            metrics.start_stats_log(interval_in_sec=metrics_config['LOG_INTERVAL_IN_SEC'])
+
+
+def run(settings: Settings,
+        airports: Dict[str, Dict[str, Any]],
+        area_geofences: Dict[str, Geofence],
+        snapshot_store: Optional[SnapshotStore] = None,
+        states_source: Optional[Callable[[], StatesTable]] = None,
+        swim_publisher: Optional[SWIMPublisher] = None) -> None:
+    """
+    Publishes the topics of the given city airports and areas until interrupted.
+
+    :param settings:
+    :param airports: the airport of each city
+    :param area_geofences: the geofence of each area
+    :param snapshot_store:
+    :param states_source: see `AirTraffic`
+    :param swim_publisher: publishes the topics, e.g. a stand-in for load tests. Defaults to one
+                           created from the config file.
+    """
+    topic_activity = _create_topic_activity(settings)
+    air_traffic = _create_air_traffic(settings,
+                                      airports,
+                                      area_geofences=area_geofences,
+                                      snapshot_store=snapshot_store,
+                                      states_source=states_source,
+                                      topic_activity=topic_activity,
+                                      flight_history=_create_flight_history(settings))
+
+    # The publisher that will communicate with the SubscriptionManager to create new topics and with
+    # the broker where the messages will be routed
+    swim_publisher = swim_publisher or SWIMPublisher.create_from_config(settings.config_path)
+
+    # the shared states are picked up as soon as possible since they are not retrieved from OpenSky
+    states_refresh_in_sec = settings.states_interval_in_sec if states_source is None \
+        else SHARED_STATES_POLL_IN_SEC
+
+    publishing_engine = AsyncPublishingEngine(
+        air_traffic,
+        states_interval_in_sec=states_refresh_in_sec,
+        flight_connections_interval_in_sec=settings.flight_connections_interval_in_sec
+    ) if settings.engine == ENGINE_ASYNCIO else None
+
+    _add_topics(settings, swim_publisher, air_traffic, airports, area_geofences, publishing_engine)
+
+    if topic_activity is not None:
+        # the first report is awaited so that only the airports of the active topics are retrieved
+        topic_activity.refresh()
+        topic_activity.on_change = air_traffic.reload_airports
+
+        activity_refresher = PeriodicRefresher(name='topic-activity')
+        activity_refresher.add_job('topic_activity',
+                                   topic_activity.refresh,
+                                   interval_in_sec=settings.on_demand_topics.get('POLL_IN_SEC', 10))
+        activity_refresher.start()
+
+    if publishing_engine is not None:
+        publishing_engine.start()
+    elif settings.adsb.get('BACKGROUND_REFRESH', False):
+        air_traffic.start_refresher(
+            states_interval_in_sec=states_refresh_in_sec,
+            flight_connections_interval_in_sec=settings.flight_connections_interval_in_sec
+        )
+    elif air_traffic.has_restored_snapshots:
+        # the topics carry the restored data from the first ticks, which the warm up must not delay
+        threading.Thread(target=air_traffic.fetch_flight_connections,
+                         name='flight-connections-warm-up',
+                         daemon=True).start()
+    else:
+        # warm up the caches so that the topics carry data from the first ticks
+        air_traffic.fetch_flight_connections()
 
-if __name__ == '__main__':
     swim_publisher.run()
+
+
+def run_shard(settings: Settings,
+              shard_index: int,
+              shard_count: int,
+              shared_states_name: str) -> None:
+    """
+    Publishes the topics of one shard of the cities and areas, with the states shared by the fetcher
+    process.
+
+    :param settings:
+    :param shard_index:
+    :param shard_count:
+    :param shared_states_name: the name of the shared states of the fetcher process
+    """
+    shard_airports = dict(list(settings.city_airports.items())[shard_index::shard_count])
+    shard_areas = dict(list(settings.areas.items())[shard_index::shard_count])
+    _logger.info(f"Shard {shard_index} publishes the topics of "
+                 f"{', '.join([*shard_airports, *shard_areas])}")
+
+    _start_metrics(settings, http_port_offset=shard_index + 1)
+
+    # every shard keeps the snapshots of its own flight connections
+    snapshots_dir = settings.snapshots_dir
+    snapshot_store = _create_snapshot_store(
+        settings, os.path.join(snapshots_dir, f"shard-{shard_index}") if snapshots_dir else None)
+
+    run(settings,
+        shard_airports,
+        shard_areas,
+        snapshot_store=snapshot_store,
+        states_source=SharedStatesReader(shared_states_name).read)
+
+
+def run_sharded(settings: Settings, shard_count: int) -> None:
+    """
+    Publishes the topics of the cities and areas from `shard_count` worker processes, each of them
+    publishing the ones of a part of them. The current process retrieves the states from OpenSky
+    once for all of them and shares them through shared memory.
+
+    :param settings:
+    :param shard_count:
+    """
+    shared_states = SharedStatesWriter(name=f"swim-adsb-states-{os.getpid()}")
+    snapshot_store = _create_snapshot_store(settings, settings.snapshots_dir)
+
+    if snapshot_store is not None:
+        states = snapshot_store.load_states()
+        if states is not None:
+            shared_states.write(states)
+
+    fetcher = _create_air_traffic(settings, settings.city_airports, snapshot_store=snapshot_store)
+    refresher = PeriodicRefresher(name='states-fetcher')
+    if settings.states_filter == STATES_FILTER_ICAO24:
+        # the states are restricted to the aircraft of the flight connections of all the shards
+        refresher.add_job('flight_connections',
+                          fetcher.fetch_flight_connections,
+                          interval_in_sec=settings.flight_connections_interval_in_sec)
+    refresher.add_job('states',
+                      lambda: shared_states.write(fetcher.fetch_states_table()),
+                      interval_in_sec=settings.states_interval_in_sec)
+
+    # spawned rather than forked so that the shards do not inherit the threads of this process
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_shard,
+                               args=(settings, shard_index, shard_count, shared_states.name),
+                               name=f"swim-adsb-shard-{shard_index}")
+               for shard_index in range(shard_count)]
+
+    try:
+        for worker in workers:
+            worker.start()
+
+        _start_metrics(settings)
+        refresher.start()
+
+        for worker in workers:
+            worker.join()
+    finally:
+        refresher.stop()
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        shared_states.close()
+
+
+def main(config_path: Optional[str] = None) -> None:
+    """
+    The entry point of the application. Nothing is configured or created before it is called, so
+    that importing this module is cheap.
+
+    :param config_path: defaults to the config.yml of the package
+    """
+    settings = Settings.from_yaml(config_path or _get_config_path())
+
+    if settings.shards > 1:
+        shard_count = min(settings.shards, len(settings.city_airports) + len(settings.areas))
+        run_sharded(settings, shard_count)
+    else:
+        _start_metrics(settings)
+        run(settings,
+            settings.city_airports,
+            settings.areas,
+            snapshot_store=_create_snapshot_store(settings, settings.snapshots_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+from types import SimpleNamespace
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def state_vector(icao24, lat=50.0, lng=4.0, last_contact=1560869065, velocity=None,
+                 true_track=None):
+    return SimpleNamespace(icao24=icao24, latitude=lat, longitude=lng,
+                           last_contact_in_sec=last_contact, time_position_in_sec=last_contact,
+                           velocity_in_m_per_sec=velocity, true_track_in_degrees=true_track)
+
+
+def flight_connection(icao24, departure_airport, arrival_airport, first_seen=None, last_seen=None):
+    return SimpleNamespace(icao24=icao24,
+                           first_seen=first_seen,
+                           est_departure_airport=departure_airport,
+                           last_seen=last_seen,
+                           est_arrival_airport=arrival_airport)
+
+
+class FakeOpenskyClient:
+    def __init__(self, states=(), arrivals=None, departures=None):
+        """
+        Serves the given state vectors and flight connections per airport and records the requests
+        as (kind, icao) tuples. The `states_error` or the `flight_connections_error` is raised
+        instead when set.
+        """
+        self.states = list(states)
+        self.arrivals = arrivals or {}
+        self.departures = departures or {}
+        self.requests = []
+        self.states_error = None
+        self.flight_connections_error = None
+
+    def _request(self, kind, icao=None, error=None):
+        self.requests.append((kind, icao))
+        if error:
+            raise error
+
+    def get_states(self):
+        self._request('states', error=self.states_error)
+        return SimpleNamespace(states=self.states)
+
+    def get_flight_arrivals(self, icao, begin, end):
+        self._request('arrivals', icao, error=self.flight_connections_error)
+        return self.arrivals.get(icao, [])
+
+    def get_flight_departures(self, icao, begin, end):
+        self._request('departures', icao, error=self.flight_connections_error)
+        return self.departures.get(icao, [])
@@ -0,0 +1,115 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+
+from swim_adsb.adsb.activation import TopicActivity
+from swim_adsb.adsb.air_traffic import AirTraffic
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _topic_activity(reports, on_change=None):
+    def get_active_topic_ids():
+        report = reports.pop(0)
+        if isinstance(report, Exception):
+            raise report
+        return report
+
+    topic_activity = TopicActivity(get_active_topic_ids, on_change=on_change)
+    topic_activity.add_topic('arrivals.brussels', 'arrivals', 'EBBR')
+    topic_activity.add_topic('departures.brussels', 'departures', 'EBBR')
+    topic_activity.add_topic('arrivals.paris', 'arrivals', 'LFPG')
+
+    return topic_activity
+
+
+def test_topic_activity__every_topic_is_active_until_the_first_report():
+    topic_activity = _topic_activity([])
+
+    assert topic_activity.is_active('arrivals', 'LFPG')
+    assert topic_activity.is_airport_active('LFPG')
+
+
+def test_topic_activity__reports_the_topics_with_active_subscribers():
+    topic_activity = _topic_activity([['departures.brussels', 'unknown.topic']])
+
+    topic_activity.refresh()
+
+    assert topic_activity.is_active('departures', 'EBBR')
+    assert not topic_activity.is_active('arrivals', 'EBBR')
+    assert topic_activity.is_airport_active('EBBR')
+    assert not topic_activity.is_airport_active('LFPG')
+
+
+def test_topic_activity__failed_report__keeps_the_previous_one():
+    topic_activity = _topic_activity([['arrivals.paris'], ValueError('unreachable')])
+
+    topic_activity.refresh()
+    topic_activity.refresh()
+
+    assert topic_activity.is_active('arrivals', 'LFPG')
+    assert not topic_activity.is_active('arrivals', 'EBBR')
+
+
+def test_topic_activity__on_change__is_called_only_when_the_activity_changes():
+    changes = []
+    topic_activity = _topic_activity([['arrivals.paris'], ['arrivals.paris'], []],
+                                     on_change=lambda: changes.append(1))
+
+    topic_activity.refresh()
+    topic_activity.refresh()
+    assert len(changes) == 1
+
+    topic_activity.refresh()
+    assert len(changes) == 2
+
+
+def test_topic_activity__idle_topics__produce_nothing_and_their_airports_are_not_retrieved():
+    topic_activity = TopicActivity(lambda: ['arrivals.brussels'])
+    for topic_id, kind, name in [('arrivals.brussels', 'arrivals', 'EBBR'),
+                                 ('arrivals.paris', 'arrivals', 'LFPG'),
+                                 ('departures.paris', 'departures', 'LFPG')]:
+        topic_activity.add_topic(topic_id, kind, name)
+    topic_activity.refresh()
+
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR', 'LFPG'],
+                         topic_activity=topic_activity)
+    traffic.client = FakeOpenskyClient(
+        states=[state_vector('a1'), state_vector('a2')],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')],
+                  'LFPG': [flight_connection('a2', 'EHAM', 'LFPG')]}
+    )
+
+    arrivals, _ = traffic.fetch_flight_connections()
+
+    assert list(arrivals) == ['EBBR']
+    assert [d['icao24'] for d in json.loads(traffic.arrivals_handler('EBBR').body)] == ['a1']
+    assert traffic.arrivals_handler('LFPG') is None
@@ -0,0 +1,135 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from swim_adsb.adsb.caching import SingleFlightTTLCache, single_flight_cached
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_single_flight_ttl_cache__concurrent_misses__fetch_once():
+    cache = SingleFlightTTLCache(ttl=30)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('key', fetch)))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 10
+
+
+def test_single_flight_ttl_cache__expired_entry__is_served_stale_while_refreshed():
+    now = [0]
+    cache = SingleFlightTTLCache(ttl=30, timer=lambda: now[0])
+    refreshed = threading.Event()
+
+    cache.set('key', 'old')
+    now[0] = 31
+
+    def fetch():
+        refreshed.wait(1)
+        return 'new'
+
+    assert cache.get('key', fetch) == 'old'
+    refreshed.set()
+
+    for _ in range(100):
+        if cache.get('key', fetch) == 'new':
+            break
+        time.sleep(0.01)
+    else:
+        assert False, 'the entry was not refreshed'
+
+
+def test_single_flight_ttl_cache__expired_entry__is_refreshed_in_the_executor():
+    now = [0]
+    cache = SingleFlightTTLCache(ttl=30, timer=lambda: now[0])
+    threads = []
+
+    def fetch():
+        threads.append(threading.current_thread().name)
+        return 'new'
+
+    cache.set('key', 'old')
+    now[0] = 31
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='refresh') as executor:
+        assert cache.get('key', fetch, executor=executor) == 'old'
+
+    assert cache.get('key', fetch) == 'new'
+    assert len(threads) == 1 and threads[0].startswith('refresh')
+
+
+def test_single_flight_ttl_cache__entry_stale_for_too_long__is_fetched():
+    now = [0]
+    cache = SingleFlightTTLCache(ttl=30, max_stale_in_sec=60, timer=lambda: now[0])
+
+    cache.set('key', 'old')
+    now[0] = 91
+
+    assert cache.get('key', lambda: 'new') == 'new'
+
+
+def test_single_flight_ttl_cache__fetch_error__is_raised_and_not_cached():
+    cache = SingleFlightTTLCache(ttl=30)
+
+    def fetch():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        cache.get('key', fetch)
+
+    assert cache.get('key', lambda: 'value') == 'value'
+
+
+def test_single_flight_cached__caches_per_arguments():
+    calls = []
+
+    @single_flight_cached(ttl=30)
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    assert [double(1), double(1), double(2)] == [2, 2, 4]
+    assert calls == [1, 2]
@@ -0,0 +1,229 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import asyncio
+import json
+import threading
+import time
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.engine import AsyncPublishingEngine, _TopicProducer
+from swim_adsb.adsb.history import FlightHistory
+from swim_adsb.adsb.payloads import PUBLISH_ON_CHANGE, PUBLISH_ALWAYS, PUBLISH_HEARTBEAT, \
+    FORMAT_DELTA
+from swim_adsb.adsb.serializers import JsonSerializer, PackedSerializer, HEARTBEAT
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _opensky_client():
+    return FakeOpenskyClient(states=[state_vector('a1', 50.9, 4.48)],
+                             arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]})
+
+
+def _wait_for_message(producer, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        message = producer()
+        if message is not None and json.loads(message.body):
+            return message
+        time.sleep(0.01)
+
+
+def test_async_publishing_engine__produces_the_topics_in_the_background():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=_opensky_client())
+    engine = AsyncPublishingEngine(traffic, states_interval_in_sec=0.01)
+
+    arrivals = engine.add_topic('arrivals', 'EBBR', interval_in_sec=0.01)
+    departures = engine.add_topic('departures', 'EBBR', interval_in_sec=0.01)
+
+    engine.start()
+    try:
+        message = _wait_for_message(arrivals)
+        assert message is not None
+        assert [d['icao24'] for d in json.loads(message.body)] == ['a1']
+        assert json.loads(departures().body) == []
+    finally:
+        engine.stop(timeout=2)
+
+    assert not engine.is_running
+    assert not traffic.is_refreshed_externally
+
+
+def test_async_publishing_engine__slow_flight_connections__do_not_delay_the_states():
+    class SlowFlightConnectionsClient(FakeOpenskyClient):
+        def __init__(self):
+            super().__init__(states=[state_vector('a1', 50.9, 4.48)])
+            self.released = threading.Event()
+
+        def states_requests(self):
+            return sum(kind == 'states' for kind, _ in self.requests)
+
+        def get_flight_arrivals(self, icao, begin, end):
+            self.released.wait(5)
+            return super().get_flight_arrivals(icao, begin, end)
+
+    client = SlowFlightConnectionsClient()
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client)
+    engine = AsyncPublishingEngine(traffic, states_interval_in_sec=0.01)
+
+    engine.start()
+    try:
+        deadline = time.monotonic() + 2
+        while client.states_requests() < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert client.states_requests() >= 3
+        assert len(traffic.get_index().states) == 1
+    finally:
+        client.released.set()
+        engine.stop(timeout=2)
+
+
+def test_topic_producer__on_change__publishes_each_body_once():
+    producer = _TopicProducer(publish_mode=PUBLISH_ON_CHANGE)
+    assert producer() is None
+
+    producer.push('[]')
+    assert producer().body == '[]'
+    assert producer() is None
+
+    # the same body pushed again is not published again
+    producer.push('[]')
+    assert producer() is None
+
+
+def test_topic_producer__always__publishes_the_latest_body_on_every_call():
+    producer = _TopicProducer(publish_mode=PUBLISH_ALWAYS)
+
+    producer.push('[]')
+    assert producer().body == '[]'
+    assert producer().body == '[]'
+
+
+def test_topic_producer__heartbeat__publishes_a_heartbeat_while_nothing_is_pushed():
+    producer = _TopicProducer(publish_mode=PUBLISH_HEARTBEAT)
+    assert producer() is None
+
+    producer.push('[]')
+    assert producer().body == '[]'
+    assert producer().body == JsonSerializer().dumps(HEARTBEAT)
+
+
+def test_topic_producer__full__publishes_only_the_latest_of_the_bodies_pushed_between_two_calls():
+    producer = _TopicProducer(publish_mode=PUBLISH_ON_CHANGE)
+
+    producer.push('[1]')
+    producer.push('[2]')
+    assert producer().body == '[2]'
+    assert producer() is None
+
+
+def test_topic_producer__delta__publishes_every_body_pushed_between_two_calls_in_order():
+    producer = _TopicProducer(publish_mode=PUBLISH_ON_CHANGE, keep_every_body=True)
+
+    producer.push('{"seq": 1}')
+    producer.push('{"seq": 2}')
+    assert [producer().body, producer().body] == ['{"seq": 1}', '{"seq": 2}']
+    assert producer() is None
+
+
+def test_topic_producer__reset__publishes_nothing_until_a_new_body_is_pushed():
+    producer = _TopicProducer(publish_mode=PUBLISH_ALWAYS)
+    producer.push('[]')
+    producer.reset()
+    assert producer() is None
+
+    producer.push('[]')
+    assert producer().body == '[]'
+
+
+def test_async_publishing_engine__on_change__a_change_between_two_messenger_ticks_is_published():
+    client = _opensky_client()
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client,
+                         publish_mode=PUBLISH_ON_CHANGE)
+    engine = AsyncPublishingEngine(traffic)
+    arrivals = engine.add_topic('arrivals', 'EBBR', interval_in_sec=5)
+    traffic.is_refreshed_externally = True
+    traffic._refresh_flight_connections()
+    traffic._refresh_states()
+
+    asyncio.run(engine._produce_topics(5))
+    assert json.loads(arrivals().body)[0]['lat'] == 50.9
+
+    # two engine ticks, a change and then the same data again, before the next messenger tick
+    client.states[0].latitude = 51.0
+    traffic._refresh_states()
+    asyncio.run(engine._produce_topics(5))
+    traffic._refresh_states()
+    asyncio.run(engine._produce_topics(5))
+
+    assert json.loads(arrivals().body)[0]['lat'] == 51.0
+    assert arrivals() is None
+
+
+def test_async_publishing_engine__delta__no_frame_is_lost_between_two_messenger_ticks():
+    client = _opensky_client()
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client,
+                         publish_mode=PUBLISH_ON_CHANGE, payload_format=FORMAT_DELTA)
+    engine = AsyncPublishingEngine(traffic)
+    arrivals = engine.add_topic('arrivals', 'EBBR', interval_in_sec=5)
+    traffic.is_refreshed_externally = True
+    traffic._refresh_flight_connections()
+
+    for latitude in (50.0, 51.0, 52.0):
+        client.states[0].latitude = latitude
+        traffic._refresh_states()
+        asyncio.run(engine._produce_topics(5))
+
+    payloads = [json.loads(arrivals().body) for _ in range(3)]
+
+    assert [payload['seq'] for payload in payloads] == [1, 2, 3]
+    assert [payload['moved'][0]['lat'] for payload in payloads[1:]] == [51.0, 52.0]
+    assert arrivals() is None
+
+
+def test_async_publishing_engine__packed__tracks_topics_are_labelled_as_json():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=_opensky_client(),
+                         serializer='packed',
+                         flight_history=FlightHistory(timer=lambda: 1560869065))
+    engine = AsyncPublishingEngine(traffic)
+    tracks = engine.add_topic('tracks', 'EBBR', interval_in_sec=5)
+    arrivals = engine.add_topic('arrivals', 'EBBR', interval_in_sec=5)
+    traffic.is_refreshed_externally = True
+    traffic._refresh_flight_connections()
+    traffic._refresh_states()
+
+    asyncio.run(engine._produce_topics(5))
+
+    tracks_message, arrivals_message = tracks(), arrivals()
+    assert tracks_message.content_type == 'application/json'
+    assert json.loads(tracks_message.body)[0]['track'] == [[1560869065, 50.9, 4.48]]
+    assert arrivals_message.content_type == PackedSerializer.content_type
@@ -0,0 +1,121 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+import time
+
+from pytest import approx
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.extrapolation import ExtrapolatedPositions, METERS_PER_DEGREE_OF_LATITUDE
+from swim_adsb.adsb.geo import CircleGeofence
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_extrapolated_positions__projects_along_the_track():
+    states = StatesTable.from_state_vectors([
+        # flying north
+        state_vector('a1', 0.0, 10.0, 1000, METERS_PER_DEGREE_OF_LATITUDE / 100, 0.0),
+        # flying east
+        state_vector('a2', 0.0, 10.0, 1000, METERS_PER_DEGREE_OF_LATITUDE / 100, 90.0),
+    ])
+
+    positions = ExtrapolatedPositions(states, icao24s=['a1', 'a2'], at=1010)
+
+    assert positions.positions['a1'] == approx((0.1, 10.0))
+    assert positions.positions['a2'] == approx((0.0, 10.1))
+
+
+def test_extrapolated_positions__leaves_unknown_or_too_old_positions_as_is():
+    states = StatesTable.from_state_vectors([
+        state_vector('a1', 50.0, 4.0, 1000, None, 90.0),
+        state_vector('a2', 50.0, 4.0, None, 200.0, 90.0),
+        state_vector('a3', 50.0, 4.0, 1000, 200.0, 90.0),
+    ])
+
+    positions = ExtrapolatedPositions(states,
+                                      icao24s=['a1', 'a2', 'a3'],
+                                      at=1061,
+                                      max_extrapolation_in_sec=60)
+
+    assert positions.positions == {}
+
+    data = [{'icao24': 'a3', 'lat': 50.0, 'lng': 4.0}]
+    assert positions.apply(data) == data
+
+
+def test_extrapolated_positions__apply__replaces_the_positions_in_a_copy():
+    states = StatesTable.from_state_vectors([state_vector('a1', 0.0, 10.0, 1000, 100.0, 0.0)])
+    positions = ExtrapolatedPositions(states, icao24s=['a1'], at=1010)
+    data = [{'icao24': 'a1', 'lat': 0.0, 'lng': 10.0, 'from': 'EBBR'}]
+
+    result = positions.apply(data)
+
+    assert result[0]['lat'] > 0.0 and result[0]['from'] == 'EBBR'
+    assert data[0]['lat'] == 0.0
+
+
+def test_handlers__extrapolate_positions():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], extrapolate_positions=True)
+    state = state_vector('a1', lat=50.9, lng=4.48)
+    state.time_position_in_sec = int(time.time()) - 10
+    state.velocity_in_m_per_sec, state.true_track_in_degrees = 250.0, 0.0
+    traffic.client = FakeOpenskyClient(
+        states=[state],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]}
+    )
+
+    arrivals = json.loads(traffic.arrivals_handler('EBBR').body)
+
+    assert arrivals[0]['lat'] > 50.9 and arrivals[0]['lng'] == 4.48
+
+
+def test_area_handler__extrapolates_every_aircraft_of_the_area():
+    traffic = AirTraffic(traffic_time_span_in_days=1,
+                         airports=['EBBR'],
+                         extrapolate_positions=True,
+                         areas={'paris': CircleGeofence(latitude=49.0097, longitude=2.5479,
+                                                        radius_in_km=50)})
+    states = [state_vector('a1', lat=49.1, lng=2.6), state_vector('a2', lat=49.0, lng=2.5)]
+    for state in states:
+        state.time_position_in_sec = int(time.time()) - 10
+        state.velocity_in_m_per_sec, state.true_track_in_degrees = 250.0, 0.0
+    traffic.client = FakeOpenskyClient(
+        states=states,
+        # only a1 is a flight of an airport
+        arrivals={'EBBR': [flight_connection('a1', 'LFPG', 'EBBR')]}
+    )
+
+    area = {d['icao24']: d for d in json.loads(traffic.area_handler('paris').body)}
+
+    assert area['a1']['lat'] > 49.1 and area['a1']['lng'] == 2.6
+    assert area['a2']['lat'] > 49.0 and area['a2']['lng'] == 2.5
@@ -0,0 +1,221 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from swim_adsb.adsb.flight_connections import FlightConnectionStore
+from swim_adsb.adsb.governor import RequestDeferred
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _timestamp(*args):
+    return int(datetime(*args).timestamp())
+
+
+class _FakeOpensky:
+    def __init__(self):
+        self.requests = []
+        self.error = None
+
+    def fetch(self, icao, begin, end):
+        """
+        Returns a flight seen at the start of the interval and at the start of each of the next
+        days it covers.
+        """
+        self.requests.append((icao, begin, end))
+        if self.error:
+            raise self.error
+
+        seen_at = [begin]
+        start_of_day = datetime.combine(date.fromtimestamp(begin), datetime.min.time())
+        while True:
+            start_of_day += timedelta(days=1)
+            if start_of_day.timestamp() > end:
+                break
+            seen_at.append(int(start_of_day.timestamp()))
+
+        return [SimpleNamespace(icao24=f"{icao}-{timestamp}", last_seen=timestamp)
+                for timestamp in seen_at]
+
+
+def test_flight_connection_store__past_days_are_fetched_once_and_today_incrementally():
+    opensky = _FakeOpensky()
+    now = [_timestamp(2019, 6, 18, 12)]
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=2,
+                                  overlap_in_sec=3600,
+                                  today=lambda: date(2019, 6, 18),
+                                  timer=lambda: now[0])
+
+    flight_connections = store.refresh('EBBR')
+
+    # the consecutive days are fetched at once
+    assert opensky.requests == [
+        ('EBBR', _timestamp(2019, 6, 16), _timestamp(2019, 6, 18, 23, 59, 59)),
+    ]
+    assert len(flight_connections) == 3
+
+    opensky.requests.clear()
+    now[0] = _timestamp(2019, 6, 18, 12, 10)
+
+    flight_connections = store.refresh('EBBR')
+
+    assert opensky.requests == [
+        ('EBBR', _timestamp(2019, 6, 18, 11), _timestamp(2019, 6, 18, 23, 59, 59))
+    ]
+    assert len(flight_connections) == 4
+
+
+def test_flight_connection_store__days_out_of_the_window_expire():
+    opensky = _FakeOpensky()
+    today = [date(2019, 6, 18)]
+    now = [_timestamp(2019, 6, 18, 12)]
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=1,
+                                  overlap_in_sec=3600,
+                                  today=lambda: today[0],
+                                  timer=lambda: now[0])
+    store.refresh('EBBR')
+
+    opensky.requests.clear()
+    today[0] = date(2019, 6, 19)
+    now[0] = _timestamp(2019, 6, 19, 2)
+
+    flight_connections = store.refresh('EBBR')
+
+    # the previous day gets its final fetch along with the first fetch of the new one
+    assert opensky.requests == [
+        ('EBBR', _timestamp(2019, 6, 18, 11), _timestamp(2019, 6, 19, 23, 59, 59)),
+    ]
+    assert {fc.icao24 for fc in flight_connections} == {
+        f"EBBR-{_timestamp(2019, 6, 18)}",
+        f"EBBR-{_timestamp(2019, 6, 18, 11)}",
+        f"EBBR-{_timestamp(2019, 6, 19)}",
+    }
+
+
+def test_flight_connection_store__days_fetched_at_once__are_split_by_the_time_they_were_seen():
+    opensky = _FakeOpensky()
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=2,
+                                  today=lambda: date(2019, 6, 18),
+                                  timer=lambda: _timestamp(2019, 6, 18, 12))
+
+    store.refresh('EBBR')
+
+    assert len(opensky.requests) == 1
+    days = {day['day']: [fc[0] for fc in day['flight_connections']] for day in store.dump()['EBBR']}
+    assert days == {
+        '2019-06-16': [f"EBBR-{_timestamp(2019, 6, 16)}"],
+        '2019-06-17': [f"EBBR-{_timestamp(2019, 6, 17)}"],
+        '2019-06-18': [f"EBBR-{_timestamp(2019, 6, 18)}"],
+    }
+
+
+def test_flight_connection_store__many_days__are_fetched_in_requests_of_max_days():
+    opensky = _FakeOpensky()
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=9,
+                                  today=lambda: date(2019, 6, 18),
+                                  timer=lambda: _timestamp(2019, 6, 18, 12))
+
+    store.refresh('EBBR')
+
+    assert opensky.requests == [
+        ('EBBR', _timestamp(2019, 6, 9), _timestamp(2019, 6, 15, 23, 59, 59)),
+        ('EBBR', _timestamp(2019, 6, 16), _timestamp(2019, 6, 18, 23, 59, 59)),
+    ]
+
+
+def test_flight_connection_store__failed_fetch__keeps_the_existing_data():
+    opensky = _FakeOpensky()
+    now = [_timestamp(2019, 6, 18, 12)]
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=0,
+                                  today=lambda: date(2019, 6, 18),
+                                  timer=lambda: now[0])
+    assert len(store.refresh('EBBR')) == 1
+
+    opensky.error = ValueError('timeout')
+    now[0] = _timestamp(2019, 6, 18, 13)
+
+    assert len(store.refresh('EBBR')) == 1
+    assert len(store.get('EBBR')) == 1
+
+
+def test_flight_connection_store__deferred_fetch__is_not_an_error_and_stops_the_refresh(caplog):
+    opensky = _FakeOpensky()
+    store = FlightConnectionStore(fetch=opensky.fetch,
+                                  time_span_in_days=2,
+                                  today=lambda: date(2019, 6, 18),
+                                  timer=lambda: _timestamp(2019, 6, 18, 12))
+    opensky.error = RequestDeferred('Backing off from OpenSky for another 5 seconds')
+
+    with caplog.at_level(logging.DEBUG):
+        assert store.refresh('EBBR') == []
+
+    assert len(opensky.requests) == 1
+    assert not [record for record in caplog.records if record.levelno >= logging.INFO]
+
+    # nothing was retrieved, so the whole window is retrieved on the next refresh
+    opensky.error = None
+    assert len(store.refresh('EBBR')) == 3
+
+
+def test_flight_connection_store__load__carries_on_from_a_dump():
+    opensky = _FakeOpensky()
+    now = [_timestamp(2019, 6, 18, 12)]
+
+    def create_store():
+        return FlightConnectionStore(fetch=opensky.fetch,
+                                     time_span_in_days=1,
+                                     overlap_in_sec=3600,
+                                     today=lambda: date(2019, 6, 18),
+                                     timer=lambda: now[0])
+
+    store = create_store()
+    store.refresh('EBBR')
+    dump = json.loads(json.dumps(store.dump()))
+
+    restored = create_store()
+    restored.load(dump)
+
+    assert {fc.icao24 for fc in restored.get('EBBR')} == {fc.icao24 for fc in store.get('EBBR')}
+
+    opensky.requests.clear()
+    now[0] = _timestamp(2019, 6, 18, 12, 10)
+    restored.refresh('EBBR')
+
+    assert opensky.requests == [
+        ('EBBR', _timestamp(2019, 6, 18, 11), _timestamp(2019, 6, 18, 23, 59, 59))
+    ]
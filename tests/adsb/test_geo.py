@@ -0,0 +1,103 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import pytest
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.geo import BoundingBox, bounding_box_around, union, distance_in_km, \
+    CircleGeofence, PolygonGeofence
+from tests.adsb.fakes import FakeOpenskyClient, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_bounding_box_around__contains_the_circle():
+    bounding_box = bounding_box_around(latitude=50.9014, longitude=4.4844, radius_in_km=111.32)
+
+    assert bounding_box.min_latitude == pytest.approx(49.9014)
+    assert bounding_box.max_latitude == pytest.approx(51.9014)
+    # one degree of longitude is shorter than one of latitude away from the equator
+    assert bounding_box.min_longitude < 3.4844
+    assert bounding_box.max_longitude > 5.4844
+
+    assert bounding_box.contains(50.9014, 4.4844)
+    assert not bounding_box.contains(53.0, 4.4844)
+    assert not bounding_box.contains(None, None)
+
+
+def test_bounding_box_around__is_clipped_at_the_poles():
+    bounding_box = bounding_box_around(latitude=89.0, longitude=0.0, radius_in_km=500)
+
+    assert bounding_box == BoundingBox(min_latitude=pytest.approx(89.0 - 500 / 111.32),
+                                       max_latitude=90.0,
+                                       min_longitude=-180.0,
+                                       max_longitude=180.0)
+
+
+def test_union():
+    assert union([]) is None
+    assert union([BoundingBox(1, 2, 3, 4), BoundingBox(-1, 1.5, 3.5, 5)]) == \
+        BoundingBox(-1, 2, 3, 5)
+
+
+def test_distance_in_km():
+    # Brussels to Paris airports
+    assert distance_in_km(50.9014, 4.4844, 49.0097, 2.5479) == pytest.approx(252, abs=1)
+    assert distance_in_km(50.0, 4.0, 50.0, 4.0) == 0
+
+
+def test_circle_geofence():
+    geofence = CircleGeofence(latitude=49.0097, longitude=2.5479, radius_in_km=50)
+
+    assert geofence.contains(49.2, 2.6)
+    assert not geofence.contains(50.9014, 4.4844)
+    assert not geofence.contains(None, None)
+    assert geofence.bounding_box().contains(49.2, 2.6)
+
+
+def test_polygon_geofence():
+    # a triangle with its right angle at (50, 4)
+    geofence = PolygonGeofence(vertices=((50.0, 4.0), (52.0, 4.0), (50.0, 6.0)))
+
+    assert geofence.contains(50.5, 4.5)
+    assert not geofence.contains(51.5, 5.5)
+    assert not geofence.contains(49.0, 4.5)
+    assert not geofence.contains(None, None)
+    assert geofence.bounding_box() == BoundingBox(50.0, 52.0, 4.0, 6.0)
+
+
+def test_states_are_filtered_by_bounding_box():
+    traffic = AirTraffic(traffic_time_span_in_days=1,
+                         airports=['EBBR'],
+                         states_bounding_box=BoundingBox(50, 52, 3, 6))
+    traffic.client = FakeOpenskyClient(
+        states=[state_vector('a1', lat=50.9, lng=4.48), state_vector('a2', lat=37.9, lng=23.9)]
+    )
+
+    assert [state.icao24 for state in traffic._get_states()] == ['a1']
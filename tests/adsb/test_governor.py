@@ -0,0 +1,230 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+from types import SimpleNamespace
+
+from pytest import raises
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.governor import RequestGovernor, RequestDeferred
+from tests.adsb.fakes import FakeOpenskyClient, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"{status_code} Error")
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+def test_request_governor__backs_off_exponentially_after_failures():
+    now = [0.0]
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, backoff_in_sec=10, max_backoff_in_sec=30,
+                               timer=lambda: now[0], rand=lambda: 1.0)
+
+    client.states_error = _HTTPError(503)
+    with raises(_HTTPError):
+        governor.get_states()
+
+    # no request while backing off
+    now[0] = 9
+    with raises(RequestDeferred):
+        governor.get_states()
+    assert len(client.requests) == 1
+
+    now[0] = 10
+    with raises(_HTTPError):
+        governor.get_states()
+    assert governor.is_backing_off
+
+    # the backoff doubled
+    now[0] = 29
+    with raises(RequestDeferred):
+        governor.get_flight_arrivals('EBBR', 0, 1)
+
+    client.states_error = None
+    now[0] = 30
+    assert governor.get_states().states == []
+    assert governor.get_states().states == []
+    assert len(client.requests) == 4
+
+
+def test_request_governor__jitter_shortens_the_backoff_by_up_to_a_half():
+    now = [0.0]
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, backoff_in_sec=10, timer=lambda: now[0], rand=lambda: 0.0)
+
+    client.states_error = _HTTPError(500)
+    with raises(_HTTPError):
+        governor.get_states()
+
+    now[0] = 5
+    client.states_error = None
+    assert governor.get_states().states == []
+
+
+def test_request_governor__honours_the_retry_after_of_opensky():
+    now = [0.0]
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, backoff_in_sec=1, timer=lambda: now[0])
+
+    client.states_error = _HTTPError(429, headers={'X-Rate-Limit-Retry-After-Seconds': '120'})
+    with raises(_HTTPError):
+        governor.get_states()
+
+    now[0] = 119
+    assert governor.is_backing_off
+    now[0] = 120
+    assert not governor.is_backing_off
+
+
+def test_request_governor__type_errors_do_not_back_off():
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client)
+
+    with raises(TypeError):
+        governor.get_states(icao24=['a1'])
+
+    assert not governor.is_backing_off
+
+
+def test_request_governor__errors_of_the_requests_do_not_back_off():
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client)
+
+    client.states_error = _HTTPError(400)
+    with raises(_HTTPError):
+        governor.get_states()
+
+    assert not governor.is_backing_off
+
+
+def test_request_governor__timeouts_back_off():
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, timer=lambda: 0.0)
+
+    client.states_error = ReadTimeout('read timed out')
+    with raises(ReadTimeout):
+        governor.get_states()
+
+    assert governor.is_backing_off
+
+
+def test_request_governor__not_found_flight_connections__are_empty_and_do_not_back_off():
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client)
+
+    client.flight_connections_error = _HTTPError(404)
+
+    assert governor.get_flight_arrivals('EDDB', 0, 1) == []
+    assert governor.get_flight_departures('EDDB', 0, 1) == []
+    assert not governor.is_backing_off
+    assert governor.get_states().states == []
+
+
+def test_request_governor__failed_flight_connections__do_not_hold_back_the_states():
+    now = [0.0]
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, backoff_in_sec=10, timer=lambda: now[0], rand=lambda: 1.0)
+
+    client.flight_connections_error = _HTTPError(503)
+    with raises(_HTTPError):
+        governor.get_flight_arrivals('EBBR', 0, 1)
+
+    now[0] = 5
+    with raises(RequestDeferred):
+        governor.get_flight_departures('EBBR', 0, 1)
+    assert governor.get_states().states == []
+    assert not governor.is_backing_off_from('high')
+    assert governor.is_backing_off_from('low')
+
+
+def test_request_governor__budget_keeps_a_reserve_for_the_states():
+    now = [0.0]
+    client = FakeOpenskyClient()
+    governor = RequestGovernor(client, max_requests_per_hour=3600, burst=10,
+                               low_priority_reserve=0.2, timer=lambda: now[0])
+
+    for _ in range(8):
+        governor.get_flight_arrivals('EBBR', 0, 1)
+    with raises(RequestDeferred):
+        governor.get_flight_departures('EBBR', 0, 1)
+
+    governor.get_states()
+    governor.get_states()
+    with raises(RequestDeferred):
+        governor.get_states()
+
+    # refilled at one request per second
+    now[0] = 1
+    governor.get_states()
+    assert len(client.requests) == 11
+
+
+def test_get_states__failed_retrieval__returns_none():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'])
+    traffic.client = FakeOpenskyClient(states=[state_vector('a1')])
+
+    for error in (ValueError('boom'), RequestDeferred('Backing off from OpenSky')):
+        traffic.client.states_error = error
+
+        assert traffic._get_states() is None
+
+
+def test_states_table__failed_retrieval__keeps_the_last_good_one():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'])
+    traffic.client = FakeOpenskyClient(states=[state_vector('a1')])
+
+    states = traffic.fetch_states_table()
+
+    traffic.client.states_error = ValueError('boom')
+
+    assert traffic.fetch_states_table() is states
+
+
+def test_request_governor__quiet_airport__does_not_hold_back_the_states():
+    class NotFound(Exception):
+        response = SimpleNamespace(status_code=404, headers={})
+
+    client = FakeOpenskyClient(states=[state_vector('a1')])
+    # OpenSky answers 404 when there is no flight in the interval
+    client.flight_connections_error = NotFound('404 Client Error: Not Found')
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EDDB'],
+                         client=RequestGovernor(client))
+
+    arrivals, _ = traffic.fetch_flight_connections()
+
+    assert arrivals == {'EDDB': []}
+    assert len(traffic.fetch_states_table()) == 1
@@ -0,0 +1,120 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+
+import pytest
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.history import FlightHistory
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _states(*positions):
+    return StatesTable.from_state_vectors([state_vector(icao24, lat, lng, at)
+                                           for icao24, at, lat, lng in positions])
+
+
+def test_flight_history__invalid_resolution__raises_value_error():
+    with pytest.raises(ValueError):
+        FlightHistory(max_age_in_sec=60, resolution_in_sec=120)
+
+
+def test_flight_history__keeps_one_position_per_time_bucket():
+    now = [1000]
+    history = FlightHistory(max_age_in_sec=60, resolution_in_sec=10, timer=lambda: now[0])
+
+    for at, lat in [(1000, 1.0), (1005, 2.0), (1010, 3.0), (1010, 4.0)]:
+        history.record(_states(('a1', at, lat, 0.0)), ['a1'])
+
+    # the same timestamp again is not a newer position
+    assert history.get_track('a1') == [(1005, 2.0, 0.0), (1010, 3.0, 0.0)]
+
+
+def test_flight_history__ring_buffer__overwrites_the_oldest_positions():
+    now = [0]
+    history = FlightHistory(max_age_in_sec=30, resolution_in_sec=10, timer=lambda: now[0])
+    assert history.capacity == 4
+
+    for at in range(0, 70, 10):
+        now[0] = at
+        history.record(_states(('a1', at, float(at), 0.0)), ['a1'])
+
+    assert [point[0] for point in history.get_track('a1')] == [30, 40, 50, 60]
+
+    now[0] = 85
+    assert [point[0] for point in history.get_track('a1')] == [60]
+
+
+def test_flight_history__records_only_the_given_aircraft_with_a_position():
+    history = FlightHistory(timer=lambda: 1000)
+
+    states = _states(('a1', 1000, 1.0, 2.0), ('a2', 1000, None, None), ('a3', 1000, 1.0, 2.0))
+    history.record(states, ['a1', 'a2', 'unknown'])
+
+    assert 'a1' in history
+    assert 'a2' not in history
+    assert 'a3' not in history
+    assert history.get_track('a3') == []
+
+
+def test_flight_history__evicts_the_stale_aircraft():
+    now = [1000]
+    history = FlightHistory(stale_after_in_sec=60, timer=lambda: now[0])
+
+    history.record(_states(('a1', 1000, 1.0, 2.0), ('a2', 1000, 1.0, 2.0)), ['a1', 'a2'])
+
+    now[0] = 1050
+    history.record(_states(('a1', 1050, 1.5, 2.0)), ['a1'])
+    assert len(history) == 2
+
+    now[0] = 1070
+    history.record(_states(('a1', 1050, 1.5, 2.0)), ['a1'])
+    assert 'a1' in history
+    assert 'a2' not in history
+
+
+def test_tracks_handler():
+    now = 1560869065
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'],
+                         flight_history=FlightHistory(timer=lambda: now))
+    traffic.client = FakeOpenskyClient(
+        states=[state_vector('a1', lat=50.9, lng=4.48)],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]}
+    )
+
+    tracks = json.loads(traffic.tracks_handler('EBBR').body)
+
+    assert tracks == [
+        {'icao24': 'a1', 'lat': 50.9, 'lng': 4.48, 'from': 'EHAM', 'to': 'EBBR',
+         'last_contact': 1560869065, 'track': [[1560869065, 50.9, 4.48]]}
+    ]
@@ -0,0 +1,104 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import urllib.request
+
+import pytest
+
+from swim_adsb.adsb.metrics import MetricsRegistry, start_http_server, _Metric
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_metrics_registry__disabled__records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter('requests_total')
+    histogram = registry.histogram('duration_seconds')
+
+    counter.inc()
+    with histogram.time():
+        pass
+
+    assert counter.value == 0
+    assert histogram.count == 0
+
+
+def test_metric__without_samples__cannot_be_created():
+    class Summary(_Metric):
+        type = 'summary'
+
+    with pytest.raises(TypeError):
+        Summary(MetricsRegistry(), 'summary', ())
+
+
+def test_metrics_registry__render():
+    registry = MetricsRegistry(enabled=True, prefix='test_')
+    registry.counter('lookups_total', 'Lookups', result='hit').inc(2)
+    registry.counter('lookups_total', 'Lookups', result='miss').inc()
+    registry.gauge('size', 'Size').set(10)
+    histogram = registry.histogram('duration_seconds', 'Duration', buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    assert registry.render() == '\n'.join([
+        '# HELP test_duration_seconds Duration',
+        '# TYPE test_duration_seconds histogram',
+        'test_duration_seconds_bucket{le="0.1"} 1',
+        'test_duration_seconds_bucket{le="1"} 2',
+        'test_duration_seconds_bucket{le="+Inf"} 2',
+        'test_duration_seconds_sum 0.55',
+        'test_duration_seconds_count 2',
+        '# HELP test_lookups_total Lookups',
+        '# TYPE test_lookups_total counter',
+        'test_lookups_total{result="hit"} 2.0',
+        'test_lookups_total{result="miss"} 1.0',
+        '# HELP test_size Size',
+        '# TYPE test_size gauge',
+        'test_size 10',
+    ]) + '\n'
+
+
+def test_metrics_registry__same_name_with_another_type__raises_value_error():
+    registry = MetricsRegistry()
+    registry.counter('things')
+
+    with pytest.raises(ValueError):
+        registry.gauge('things')
+
+
+def test_start_http_server__serves_the_metrics():
+    registry = MetricsRegistry(enabled=True)
+    registry.counter('requests_total', 'Requests').inc()
+
+    server = start_http_server(port=0, host='127.0.0.1', metrics_registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert 'swim_adsb_requests_total 1.0' in response.read().decode()
+    finally:
+        server.shutdown()
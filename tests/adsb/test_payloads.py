@@ -0,0 +1,153 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+
+import pytest
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.payloads import TopicPayload, DeltaEncoder, PUBLISH_ALWAYS, PUBLISH_ON_CHANGE, \
+    PUBLISH_HEARTBEAT, FORMAT_DELTA
+from swim_adsb.adsb.serializers import JsonSerializer, PackedSerializer, SERIALIZER_PACKED, \
+    HEARTBEAT, unpack_flights
+from tests.adsb.fakes import FakeOpenskyClient
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_topic_payload__invalid_publish_mode__raises_value_error():
+    with pytest.raises(ValueError):
+        TopicPayload(publish_mode='sometimes')
+
+
+def test_topic_payload__data_is_serialized_once_per_version():
+    calls = []
+
+    def get_data():
+        calls.append(1)
+        return [{'icao24': 'a1'}]
+
+    topic_payload = TopicPayload(publish_mode=PUBLISH_ALWAYS)
+
+    first = topic_payload.get_message(version=1, get_data=get_data)
+    second = topic_payload.get_message(version=1, get_data=get_data)
+
+    assert len(calls) == 1
+    assert first is second
+    assert json.loads(first.body) == [{'icao24': 'a1'}]
+
+
+@pytest.mark.parametrize('publish_mode, expected_unchanged_body', [
+    (PUBLISH_ON_CHANGE, None),
+    (PUBLISH_HEARTBEAT, JsonSerializer().dumps(HEARTBEAT)),
+])
+def test_topic_payload__unchanged_body__is_not_published_again(publish_mode,
+                                                               expected_unchanged_body):
+    topic_payload = TopicPayload(publish_mode=publish_mode)
+
+    assert topic_payload.get_message(version=1, get_data=lambda: [1]).body == '[1]'
+
+    unchanged = topic_payload.get_message(version=2, get_data=lambda: [1])
+    assert (unchanged and unchanged.body) == expected_unchanged_body
+
+    assert topic_payload.get_message(version=3, get_data=lambda: [2]).body == '[2]'
+
+
+def _flight(icao24, lat=50.0, lng=4.0):
+    return {'icao24': icao24, 'lat': lat, 'lng': lng, 'from': 'EHAM', 'to': 'EBBR',
+            'last_contact': 1}
+
+
+def test_delta_encoder__encodes_keyframes_and_deltas():
+    now = [0]
+    encoder = DeltaEncoder(keyframe_interval_in_sec=60, clock=lambda: now[0])
+
+    keyframe = encoder.encode([_flight('a1'), _flight('a2')])
+    assert keyframe == {'type': 'keyframe', 'seq': 1, 'flights': [_flight('a1'), _flight('a2')]}
+
+    now[0] = 30
+    assert not encoder.is_due()
+    delta = encoder.encode([_flight('a1', lat=51.0), _flight('a3')])
+    assert delta == {
+        'type': 'delta',
+        'seq': 2,
+        'added': [_flight('a3')],
+        'removed': ['a2'],
+        'moved': [{'icao24': 'a1', 'lat': 51.0}]
+    }
+
+    assert encoder.encode([_flight('a1', lat=51.0), _flight('a3')]) is None
+
+    now[0] = 60
+    assert encoder.is_due()
+    assert encoder.encode([_flight('a3')])['type'] == 'keyframe'
+
+
+def test_topic_payload__delta_format__unchanged_data_is_not_published_again():
+    topic_payload = TopicPayload(publish_mode=PUBLISH_ON_CHANGE, payload_format=FORMAT_DELTA)
+
+    message = topic_payload.get_message(version=1, get_data=lambda: [_flight('a1')])
+    keyframe = json.loads(message.body)
+    assert keyframe['type'] == 'keyframe'
+
+    assert topic_payload.get_message(version=2, get_data=lambda: [_flight('a1')]) is None
+
+    delta = json.loads(topic_payload.get_message(version=3, get_data=lambda: []).body)
+    assert delta['removed'] == ['a1']
+
+
+def test_topic_payload__packed_serializer__does_not_support_the_delta_format():
+    with pytest.raises(ValueError):
+        TopicPayload(payload_format=FORMAT_DELTA, serializer=SERIALIZER_PACKED)
+
+
+def test_topic_payload__serializer__sets_the_body_and_the_content_type():
+    topic_payload = TopicPayload(publish_mode=PUBLISH_HEARTBEAT, serializer=SERIALIZER_PACKED)
+
+    message = topic_payload.get_message(version=1, get_data=lambda: [_flight('a1')])
+    assert message.content_type == PackedSerializer.content_type
+    assert unpack_flights(message.body) == (False, [_flight('a1')])
+
+    heartbeat = topic_payload.get_message(version=2, get_data=lambda: [_flight('a1')])
+    assert heartbeat.content_type == PackedSerializer.content_type
+    assert unpack_flights(heartbeat.body) == (True, [])
+
+
+@pytest.mark.parametrize('settings', [
+    {'publish_mode': 'bogus'},
+    {'payload_format': 'bogus'},
+    {'serializer': 'bogus'},
+    {'serializer': 'packed', 'payload_format': 'delta'},
+])
+def test_air_traffic__invalid_payload_settings__raise_value_error_on_creation(settings):
+    with pytest.raises(ValueError):
+        AirTraffic(traffic_time_span_in_days=1,
+                   airports=['EBBR'],
+                   client=FakeOpenskyClient(states=[]),
+                   **settings)
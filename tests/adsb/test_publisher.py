@@ -0,0 +1,115 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+"""
+import os
+import socket
+import threading
+import time
+
+import pytest
+import yaml
+from proton import Message
+from proton.reactor import Container
+
+from benchmarks.stand_ins import AmqpSink, FakeSubscriptionManagerServer
+
+swim_pubsub = pytest.importorskip('pubsub_facades.swim_pubsub')
+messaging_handlers = pytest.importorskip('swim_proton.messaging_handlers')
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def stand_ins(tmp_path):
+    """
+    Runs the stand-ins of the subscription manager and of the broker, and yields the sink of the
+    broker along with a config file pointing to them.
+    """
+    broker_url = f"localhost:{_get_free_port()}"
+    stopped = threading.Event()
+    sink = AmqpSink(broker_url, is_stopped=stopped.is_set)
+    sink_thread = threading.Thread(target=Container(sink).run, daemon=True)
+    sink_thread.start()
+
+    subscription_manager = FakeSubscriptionManagerServer()
+    subscription_manager.start()
+
+    config_path = os.path.join(tmp_path, 'config.yml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump({
+            'BROKER': {'host': broker_url},
+            'SUBSCRIPTION-MANAGER-API': {'host': subscription_manager.address,
+                                         'https': False,
+                                         'timeout': 5,
+                                         'verify': False,
+                                         'username': 'swim-adsb',
+                                         'password': 'swim-adsb'}
+        }, f)
+
+    yield sink, config_path
+
+    stopped.set()
+    sink_thread.join(timeout=5)
+    subscription_manager.stop()
+
+
+def test_swim_publisher__producer_returns_none__skips_the_tick(stand_ins):
+    sink, config_path = stand_ins
+    ticks = []
+
+    def message_producer(context=None):
+        # the even ticks have nothing to publish, like the topics publishing on change only, and
+        # nothing is published after the fifth tick so that the sink catches up
+        ticks.append(time.monotonic())
+        if len(ticks) % 2 and len(ticks) <= 5:
+            return Message(body=b'{}', content_type='application/json')
+        return None
+
+    swim_publisher = swim_pubsub.SWIMPublisher.create_from_config(config_path)
+    messenger = messaging_handlers.Messenger(id='arrivals.brussels',
+                                             message_producer=message_producer,
+                                             interval_in_sec=1)
+    swim_publisher.add_topic_messenger(messenger)
+    publisher_thread = threading.Thread(target=swim_publisher.run, daemon=True)
+    publisher_thread.start()
+
+    deadline = time.monotonic() + 20
+    while len(ticks) < 7 and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    assert len(ticks) >= 7
+    # the publisher outlived the ticks without a message and sent only the produced messages
+    assert publisher_thread.is_alive()
+    assert sink.messages == 3
+    assert sink.subjects == {'arrivals.brussels'}
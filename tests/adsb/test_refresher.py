@@ -0,0 +1,94 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import threading
+
+from swim_adsb.adsb.refresher import PeriodicRefresher
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_periodic_refresher__runs_jobs_on_their_own_schedule():
+    runs = {'fast': 0, 'slow': 0}
+    enough_runs = threading.Event()
+
+    def fast():
+        runs['fast'] += 1
+        if runs['fast'] == 3:
+            enough_runs.set()
+
+    def slow():
+        runs['slow'] += 1
+
+    refresher = PeriodicRefresher()
+    refresher.add_job('slow', slow, interval_in_sec=60)
+    refresher.add_job('fast', fast, interval_in_sec=0.01)
+
+    refresher.start()
+    assert enough_runs.wait(2)
+    refresher.stop(timeout=2)
+
+    assert not refresher.is_running
+    assert runs['slow'] == 1
+
+
+def test_periodic_refresher__failing_job__does_not_stop_the_others():
+    ran = threading.Event()
+
+    def failing():
+        raise ValueError('boom')
+
+    refresher = PeriodicRefresher()
+    refresher.add_job('failing', failing, interval_in_sec=60)
+    refresher.add_job('working', ran.set, interval_in_sec=60)
+
+    refresher.start()
+    assert ran.wait(2)
+    refresher.stop(timeout=2)
+
+
+def test_periodic_refresher__trigger__runs_the_job_right_away():
+    runs = []
+    triggered = threading.Event()
+
+    def job():
+        runs.append(1)
+        if len(runs) == 2:
+            triggered.set()
+
+    refresher = PeriodicRefresher()
+    refresher.add_job('job', job, interval_in_sec=60)
+    refresher.start()
+
+    while not runs:
+        threading.Event().wait(0.01)
+    refresher.trigger('job')
+
+    assert triggered.wait(2)
+    refresher.stop(timeout=2)
@@ -0,0 +1,134 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+from pytest import raises
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.scheduling import AdaptiveScheduler, AdaptiveTopicProducer, count_changes
+from tests.adsb.fakes import FakeOpenskyClient
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_count_changes():
+    assert count_changes({'a1': 1, 'a2': 2, 'a3': 3}, {'a1': 1, 'a2': 20, 'a4': 4}) == 3
+    assert count_changes({}, {}) == 0
+
+
+def test_adaptive_scheduler__invalid_intervals():
+    with raises(ValueError):
+        AdaptiveScheduler(min_interval_in_sec=10, max_interval_in_sec=5)
+
+
+def test_adaptive_scheduler__adapts_the_interval_to_the_change_rate():
+    now = [0.0]
+    scheduler = AdaptiveScheduler(min_interval_in_sec=5,
+                                  max_interval_in_sec=60,
+                                  target_changes_per_run=5,
+                                  smoothing=1,
+                                  timer=lambda: now[0])
+
+    assert scheduler.is_due('EBBR')
+    scheduler.observe('EBBR', {'a1': 1})
+    assert scheduler.get_interval('EBBR') == 5
+
+    # 1 change in 10 seconds: 50 seconds for 5 changes
+    now[0] = 10
+    scheduler.observe('EBBR', {'a1': 2})
+    assert scheduler.get_interval('EBBR') == 50
+
+    now[0] = 55
+    assert not scheduler.is_due('EBBR')
+    now[0] = 58
+    assert scheduler.is_due('EBBR')
+
+    # nothing changed: backs off up to the max
+    scheduler.observe('EBBR', {'a1': 2})
+    assert scheduler.get_interval('EBBR') == 60
+
+    # 100 changes: as fast as the min
+    now[0] = 118
+    scheduler.observe('EBBR', {f"b{i}": i for i in range(100)})
+    assert scheduler.get_interval('EBBR') == 5
+
+
+def test_adaptive_topic_producer__publishes_only_when_due():
+    now = [0.0]
+    scheduler = AdaptiveScheduler(min_interval_in_sec=5, max_interval_in_sec=60,
+                                  timer=lambda: now[0])
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'],
+                         client=FakeOpenskyClient())
+    calls = []
+
+    def produce(context=None):
+        calls.append(context)
+        return 'message'
+
+    producer = AdaptiveTopicProducer(scheduler, traffic, kind='arrivals', name='EBBR',
+                                     producer=produce)
+
+    assert producer() == 'message'
+
+    # nothing changes so the interval backs off to the max
+    now[0] = 5
+    assert producer() == 'message'
+    now[0] = 10
+    assert producer() is None
+    assert len(calls) == 2
+
+
+def _requested_arrivals(client):
+    return sorted(icao for kind, icao in client.requests if kind == 'arrivals')
+
+
+def test_refresh_flight_connections__only_retrieves_the_due_airports():
+    now = [0.0]
+    scheduler = AdaptiveScheduler(min_interval_in_sec=600,
+                                  max_interval_in_sec=3600,
+                                  timer=lambda: now[0])
+    client = FakeOpenskyClient()
+    traffic = AirTraffic(traffic_time_span_in_days=0,
+                         airports=['EBBR', 'EDDB'],
+                         flight_connections_scheduler=scheduler,
+                         client=client)
+
+    traffic._refresh_flight_connections()
+    assert _requested_arrivals(client) == ['EBBR', 'EDDB']
+
+    client.requests.clear()
+    now[0] = 600
+    traffic._refresh_flight_connections()
+    assert _requested_arrivals(client) == ['EBBR', 'EDDB']
+
+    # no traffic at all: both back off
+    client.requests.clear()
+    now[0] = 1200
+    traffic._refresh_flight_connections()
+    assert client.requests == []
+    assert set(traffic._arrivals) == {'EBBR', 'EDDB'}
@@ -0,0 +1,122 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+import math
+
+import pytest
+
+from swim_adsb.adsb import serializers
+from swim_adsb.adsb.serializers import create_serializer, unpack_flights, HEARTBEAT, SERIALIZERS, \
+    SERIALIZER_JSON, SERIALIZER_ORJSON, SERIALIZER_MSGPACK, SERIALIZER_PACKED
+
+__author__ = "EUROCONTROL (SWIM)"
+
+FLIGHTS = [
+    {'icao24': '4691c7', 'lat': 41.8699, 'lng': 12.2514, 'from': 'LGAV', 'to': 'LIRF',
+     'last_contact': 1560869065},
+    {'icao24': '3c6444', 'lat': None, 'lng': None, 'from': 'Unknown airport', 'to': 'EBBR',
+     'last_contact': None},
+]
+
+
+def test_create_serializer__unknown_name__raises_value_error():
+    with pytest.raises(ValueError):
+        create_serializer('xml')
+
+
+@pytest.mark.parametrize('name, module', [
+    (SERIALIZER_ORJSON, 'orjson'),
+    (SERIALIZER_MSGPACK, 'msgpack'),
+])
+def test_create_serializer__missing_optional_dependency__raises_value_error(name, module,
+                                                                           monkeypatch):
+    monkeypatch.setattr(serializers, module, None)
+
+    with pytest.raises(ValueError):
+        create_serializer(name)
+
+
+@pytest.mark.parametrize('name', [SERIALIZER_JSON, SERIALIZER_ORJSON])
+def test_json_serializers__produce_the_same_json(name):
+    if name == SERIALIZER_ORJSON:
+        pytest.importorskip('orjson')
+
+    body = create_serializer(name).dumps(FLIGHTS)
+
+    assert isinstance(body, str)
+    assert json.loads(body) == FLIGHTS
+
+
+def test_msgpack_serializer__round_trips():
+    msgpack = pytest.importorskip('msgpack')
+
+    assert msgpack.unpackb(create_serializer(SERIALIZER_MSGPACK).dumps(FLIGHTS)) == FLIGHTS
+
+
+def test_packed_serializer__round_trips_with_fixed_width_records():
+    body = create_serializer(SERIALIZER_PACKED).dumps(FLIGHTS)
+
+    assert len(body) == 10 + 38 * len(FLIGHTS)
+    assert unpack_flights(body) == (False, [
+        FLIGHTS[0],
+        {'icao24': '3c6444', 'lat': None, 'lng': None, 'from': None, 'to': 'EBBR',
+         'last_contact': None},
+    ])
+
+
+def test_packed_serializer__area_flights__have_no_airports():
+    body = create_serializer(SERIALIZER_PACKED).dumps([{'icao24': 'a1', 'lat': 1.5, 'lng': math.nan,
+                                                        'last_contact': 1}])
+
+    assert unpack_flights(body) == (False, [{'icao24': 'a1', 'lat': 1.5, 'lng': None,
+                                             'from': None, 'to': None, 'last_contact': 1}])
+
+
+def test_packed_serializer__heartbeat__is_an_empty_flagged_header():
+    assert unpack_flights(create_serializer(SERIALIZER_PACKED).dumps(HEARTBEAT)) == (True, [])
+
+
+@pytest.mark.parametrize('body', [
+    b'',
+    b'XXXX\x01\x00\x00\x00\x00\x00',
+    b'ADSF\x01\x00\x01\x00\x00\x00',
+])
+def test_unpack_flights__invalid_body__raises_value_error(body):
+    with pytest.raises(ValueError):
+        unpack_flights(body)
+
+
+def test_serializers__all_have_a_content_type():
+    for name in SERIALIZERS:
+        try:
+            serializer = create_serializer(name)
+        except ValueError:
+            continue
+        assert serializer.content_type
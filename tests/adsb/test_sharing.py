@@ -0,0 +1,88 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import os
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.sharing import SharedStatesWriter, SharedStatesReader
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def _states(*icao24s):
+    return StatesTable.from_state_vectors([
+        state_vector(icao24, 50.9, 4.48, velocity=250.0, true_track=90.0) for icao24 in icao24s
+    ])
+
+
+def test_shared_states__readers_get_the_latest_snapshot():
+    writer = SharedStatesWriter(name=f"swim-adsb-test-{os.getpid()}")
+    reader = SharedStatesReader(writer.name)
+    try:
+        assert len(reader.read()) == 0
+
+        writer.write(_states('a1'))
+        states = reader.read()
+        assert states.icao24 == ['a1']
+        assert states.get_latitude(0) == 50.9
+        # the same table as long as nothing new is shared
+        assert reader.read() is states
+
+        for i in range(5):
+            writer.write(_states('a1', f"b{i}"))
+        assert reader.read().icao24 == ['a1', 'b4']
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_shared_states__reader_without_writer__returns_an_empty_table():
+    reader = SharedStatesReader(f"swim-adsb-missing-{os.getpid()}")
+
+    assert len(reader.read()) == 0
+
+
+def test_states_source__replaces_opensky():
+    states = StatesTable.from_state_vectors([state_vector('a1', lat=50.9, lng=4.48)])
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'],
+                         states_source=lambda: states)
+    traffic.client = FakeOpenskyClient(
+        states=[],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]}
+    )
+
+    traffic._refresh_flight_connections()
+    traffic._refresh_states()
+    index = traffic._index
+    traffic._refresh_states()
+
+    assert traffic._index is index
+    assert [d['icao24'] for d in index.arrivals['EBBR']] == ['a1']
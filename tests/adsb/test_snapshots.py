@@ -0,0 +1,107 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.snapshots import SnapshotStore, STATES_FILENAME
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_snapshot_store__states_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    states = StatesTable.from_state_vectors([
+        state_vector('a1', 50.9, 4.48, 1560869065),
+        state_vector('a2', None, None, None),
+    ])
+
+    store.save_states(states)
+    loaded = store.load_states()
+
+    assert loaded.icao24 == ['a1', 'a2']
+    assert (loaded.get_latitude(0), loaded.get_longitude(0), loaded.get_last_contact(0)) == \
+        (50.9, 4.48, 1560869065)
+    assert (loaded.get_latitude(1), loaded.get_longitude(1), loaded.get_last_contact(1)) == \
+        (None, None, None)
+
+
+def test_snapshot_store__too_old_or_corrupt_states__are_not_loaded(tmp_path):
+    now = [1000.0]
+    store = SnapshotStore(str(tmp_path), max_states_age_in_sec=600, timer=lambda: now[0])
+    store.save_states(StatesTable.from_state_vectors([state_vector('a1', 50.9, 4.48, 1560869065)]))
+
+    now[0] += 601
+    assert store.load_states() is None
+
+    (tmp_path / STATES_FILENAME).write_bytes(b'ADSB')
+    assert store.load_states() is None
+
+
+def test_snapshot_store__saves_at_most_once_per_interval(tmp_path):
+    now = [1000.0]
+    store = SnapshotStore(str(tmp_path), min_save_interval_in_sec=60, timer=lambda: now[0])
+
+    store.save_flight_connections('arrivals', {'EBBR': []})
+    store.save_flight_connections('arrivals', {'EHAM': []})
+    assert store.load_flight_connections('arrivals') == {'EBBR': []}
+
+    now[0] += 60
+    store.save_flight_connections('arrivals', {'EHAM': []})
+    assert store.load_flight_connections('arrivals') == {'EHAM': []}
+
+
+def _opensky_client():
+    return FakeOpenskyClient(states=[state_vector('a1', 50.9, 4.48)],
+                             arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]})
+
+
+def test_air_traffic__serves_the_saved_snapshots_after_a_restart(tmp_path):
+    traffic = AirTraffic(traffic_time_span_in_days=1,
+                         airports=['EBBR'],
+                         snapshot_store=SnapshotStore(str(tmp_path)),
+                         client=_opensky_client())
+    assert not traffic.has_restored_snapshots
+    traffic._refresh_flight_connections()
+    traffic._refresh_states()
+
+    client = _opensky_client()
+    restarted = AirTraffic(traffic_time_span_in_days=1,
+                           airports=['EBBR'],
+                           snapshot_store=SnapshotStore(str(tmp_path)),
+                           client=client)
+    restarted.is_refreshed_externally = True
+    assert restarted.has_restored_snapshots
+
+    arrivals = json.loads(restarted.arrivals_handler('EBBR').body)
+
+    assert [d['icao24'] for d in arrivals] == ['a1']
+    assert client.requests == []
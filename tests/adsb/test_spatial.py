@@ -0,0 +1,80 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import json
+
+from swim_adsb.adsb.air_traffic import AirTraffic
+from swim_adsb.adsb.geo import BoundingBox, CircleGeofence
+from swim_adsb.adsb.spatial import GridIndex
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_grid_index__query():
+    states = StatesTable.from_state_vectors([
+        state_vector('a1', 50.9, 4.48),
+        state_vector('a2', 49.1, 2.6),
+        state_vector('a3', -33.9, 151.2),
+        state_vector('a4', None, None),
+    ])
+    grid_index = GridIndex(states, cell_size_in_degrees=1.0)
+
+    rows = grid_index.query(BoundingBox(45, 55, 0, 10))
+    assert sorted(states.icao24[row] for row in rows) == ['a1', 'a2']
+    assert list(grid_index.query(BoundingBox(50.95, 51, 4, 5))) == []
+    rows = grid_index.query(BoundingBox(-40, -30, 150, 152))
+    assert [states.icao24[row] for row in rows] == ['a3']
+
+
+def test_grid_index__query_geofence():
+    states = StatesTable.from_state_vectors([state_vector('a1', 50.9, 4.48),
+                                             state_vector('a2', 49.1, 2.6)])
+    grid_index = GridIndex(states)
+
+    rows = grid_index.query_geofence(CircleGeofence(latitude=49.0097, longitude=2.5479,
+                                                    radius_in_km=50))
+
+    assert [states.icao24[row] for row in rows] == ['a2']
+
+
+def test_area_handler():
+    traffic = AirTraffic(traffic_time_span_in_days=1,
+                         airports=['EBBR'],
+                         areas={'paris': CircleGeofence(latitude=49.0097, longitude=2.5479,
+                                                        radius_in_km=50)})
+    traffic.client = FakeOpenskyClient(
+        states=[state_vector('a1', lat=50.9, lng=4.48), state_vector('a2', lat=49.1, lng=2.6)]
+    )
+
+    area = json.loads(traffic.area_handler('paris').body)
+
+    assert area == [{'icao24': 'a2', 'lat': 49.1, 'lng': 2.6, 'last_contact': 1560869065}]
+    assert traffic.airports == ['EBBR']
@@ -0,0 +1,56 @@
+"""
+Copyright 2019 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products
+   derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open Source Initiative:
+http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+import math
+
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import state_vector
+
+__author__ = "EUROCONTROL (SWIM)"
+
+
+def test_states_table__from_state_vectors():
+    states = StatesTable.from_state_vectors([
+        state_vector('a1', 50.9, 4.48, 1560869065),
+        state_vector('a2', None, None, None),
+        state_vector('a1', 51.0, 4.5, 1560869070),
+    ])
+
+    assert len(states) == 2
+    assert 'a1' in states and 'zz' not in states
+    assert states.row('zz') is None
+
+    row = states.row('a1')
+    assert (states.get_latitude(row), states.get_longitude(row), states.get_last_contact(row)) == \
+        (51.0, 4.5, 1560869070)
+
+    row = states.row('a2')
+    assert math.isnan(states.latitude[row])
+    assert (states.get_latitude(row), states.get_longitude(row), states.get_last_contact(row)) == \
+        (None, None, None)
@@ -27,7 +27,18 @@ http://opensource.org/licenses/BSD-3-Clause
 
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
-from swim_adsb.adsb.air_traffic import AirTraffic
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from cachetools.keys import hashkey
+
+from swim_adsb.adsb.air_traffic import AirTraffic, FlightIndex
+from swim_adsb.adsb.governor import RequestGovernor
+from swim_adsb.adsb.states import StatesTable
+from tests.adsb.fakes import FakeOpenskyClient, flight_connection, state_vector
 
 __author__ = "EUROCONTROL (SWIM)"
 
@@ -46,6 +57,9 @@ air_traffic = AirTraffic(5)
 def test_traffic():
 
     states = air_traffic._get_states()
+    if states is None:
+        pytest.skip('The states could not be retrieved from OpenSky')
+
     states_dict = {state.icao24: state for state in states if state.icao24}
 
     for city, code in airports.items():
@@ -74,3 +88,197 @@ def test_traffic():
 
             print(f"{state.icao24} flying to {dep.est_arrival_airport}: "
                   f"{state.latitude}, {state.longitude}")
+
+
+def test_flight_index__joins_states_with_all_airports():
+    states = StatesTable.from_state_vectors([state_vector(icao24) for icao24 in ['a1', 'a2', 'a3']])
+    arrivals = {
+        'EBBR': [flight_connection('a1', 'EHAM', 'EBBR'), flight_connection('zz', 'LFPG', 'EBBR')],
+        'EHAM': [flight_connection('a2', None, 'EHAM')],
+    }
+    departures = {
+        'EBBR': [],
+        'EHAM': [flight_connection('a1', 'EHAM', 'EBBR'), flight_connection(None, 'EHAM', 'LGAV')],
+    }
+
+    index = FlightIndex(states, arrivals=arrivals, departures=departures)
+
+    assert [d['icao24'] for d in index.arrivals['EBBR']] == ['a1']
+    assert index.arrivals['EHAM'][0]['from'] == 'Unknown airport'
+    assert index.departures['EBBR'] == []
+    assert [d['icao24'] for d in index.departures['EHAM']] == ['a1']
+
+    assert set(index.flights) == {'a1', 'a2'}
+    assert set(index.flights['a1'].arrivals) == {'EBBR'}
+    assert set(index.flights['a1'].departures) == {'EHAM'}
+
+
+def test_arrivals_and_departures_handlers():
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'])
+    traffic.client = FakeOpenskyClient(
+        states=[state_vector('a1', lat=50.9, lng=4.48), state_vector('a2')],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]},
+        departures={'EBBR': [flight_connection('a2', 'EBBR', 'LGAV'),
+                             flight_connection('a3', 'EBBR', 'LFPG')]}
+    )
+
+    arrivals = json.loads(traffic.arrivals_handler('EBBR').body)
+    departures = json.loads(traffic.departures_handler('EBBR').body)
+
+    assert arrivals == [
+        {'icao24': 'a1', 'lat': 50.9, 'lng': 4.48, 'from': 'EHAM', 'to': 'EBBR',
+         'last_contact': 1560869065}
+    ]
+    assert [d['icao24'] for d in departures] == ['a2']
+
+
+class _OverlapRecordingClient(FakeOpenskyClient):
+    def __init__(self, arrivals=None, departures=None, failing_airports=(), delay_in_sec=0.02):
+        """
+        Records how many requests of flight connections overlap, each of them taking `delay_in_sec`.
+        The requests for the failing airports raise.
+        """
+        super().__init__(arrivals=arrivals, departures=departures)
+        self.failing_airports = set(failing_airports)
+        self.delay_in_sec = delay_in_sec
+        self.max_overlapping_calls = 0
+        self._overlapping_calls = 0
+        self._lock = threading.Lock()
+
+    def _request(self, kind, icao=None, error=None):
+        if kind == 'states':
+            return super()._request(kind, icao, error)
+
+        with self._lock:
+            self._overlapping_calls += 1
+            self.max_overlapping_calls = max(self.max_overlapping_calls, self._overlapping_calls)
+        try:
+            time.sleep(self.delay_in_sec)
+            if icao in self.failing_airports:
+                error = Exception(f'Failed to retrieve the flight connections of {icao}')
+            super()._request(kind, icao, error)
+        finally:
+            with self._lock:
+                self._overlapping_calls -= 1
+
+    def requested_airports(self):
+        return {icao for kind, icao in self.requests if kind != 'states'}
+
+
+def test_fetch_flight_connections__requests_at_most_max_concurrent_requests_at_once():
+    airports = [f"X{i:03d}" for i in range(10)]
+    client = _OverlapRecordingClient()
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=airports, client=client,
+                         max_concurrent_requests=3)
+
+    traffic.fetch_flight_connections()
+
+    assert client.requested_airports() == set(airports)
+    assert 1 < client.max_overlapping_calls <= 3
+
+
+def test_fetch_flight_connections__failed_airport__does_not_affect_the_others():
+    client = _OverlapRecordingClient(
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')],
+                  'EHAM': [flight_connection('a2', 'LFPG', 'EHAM')]},
+        departures={'EBBR': [flight_connection('a3', 'EBBR', 'LGAV')],
+                    'EHAM': [flight_connection('a1', 'EHAM', 'EBBR')]},
+        failing_airports={'EHAM'}
+    )
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR', 'EHAM'], client=client)
+
+    arrivals, departures = traffic.fetch_flight_connections()
+
+    assert [f.icao24 for f in arrivals['EBBR']] == ['a1']
+    assert [f.icao24 for f in departures['EBBR']] == ['a3']
+    assert arrivals['EHAM'] == []
+    assert departures['EHAM'] == []
+
+
+def test_fetch_flight_connections__fills_the_caches_of_the_handlers():
+    client = _OverlapRecordingClient(arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]},
+                                     departures={'EBBR': [flight_connection('a2', 'EBBR', 'LGAV')]})
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client)
+
+    arrivals, departures = traffic.fetch_flight_connections()
+    calls = len(client.requests)
+
+    assert traffic._arrivals_today_handler('EBBR') == arrivals['EBBR']
+    assert traffic._departures_today_handler('EBBR') == departures['EBBR']
+    assert len(client.requests) == calls
+
+
+def test_flight_connections__all_expired__are_refreshed_within_max_concurrent_requests():
+    airports = [f"X{i:03d}" for i in range(20)]
+    client = _OverlapRecordingClient(delay_in_sec=0.005)
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=airports, client=client,
+                         max_concurrent_requests=3)
+    traffic.get_index()
+    client.requests.clear()
+    client.max_overlapping_calls = 0
+
+    # every entry expires at once, like after the TTL
+    for airport in airports:
+        traffic._arrivals_today_handler.cache.set(hashkey(traffic, airport), [], ttl=0)
+        traffic._departures_today_handler.cache.set(hashkey(traffic, airport), [], ttl=0)
+    traffic.get_states_table.cache.clear()
+    traffic.get_index()
+    traffic._flight_connections_executor.shutdown(wait=True)
+
+    assert client.requested_airports() == set(airports)
+    assert 1 < client.max_overlapping_calls <= 3
+
+
+class _FilteringOpenskyClient(FakeOpenskyClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states_filters = []
+
+    def get_states(self, icao24=None):
+        self.states_filters.append(icao24)
+        states = super().get_states().states
+        return SimpleNamespace(states=[state for state in states
+                                       if icao24 is None or state.icao24 in icao24])
+
+
+def test_states_filter_icao24__requests_only_the_aircraft_which_may_be_in_the_air():
+    now = time.time()
+    client = _FilteringOpenskyClient(
+        states=[state_vector('a1'), state_vector('a2'), state_vector('a3')],
+        arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR', last_seen=now - 600),
+                           flight_connection('a2', 'EHAM', 'EBBR', last_seen=now - 24 * 3600)]},
+        departures={'EBBR': [flight_connection('a3', 'EBBR', 'LFPG')]}
+    )
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client,
+                         filter_states_by_icao24=True)
+    traffic.fetch_flight_connections()
+
+    states = traffic.fetch_states_table()
+
+    assert client.states_filters == [['a1', 'a3']]
+    assert sorted(states.icao24) == ['a1', 'a3']
+
+
+def test_states_filter_icao24__error_of_the_client__does_not_disable_the_filter():
+    client = _FilteringOpenskyClient(states=[state_vector('a1')],
+                                     arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]})
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'], client=client,
+                         filter_states_by_icao24=True)
+    traffic.fetch_flight_connections()
+
+    client.states_error = TypeError('unexpected response')
+    assert traffic._get_states() is None
+
+    client.states_error = None
+    assert [state.icao24 for state in traffic._get_states()] == ['a1']
+    assert client.states_filters == [['a1'], ['a1']]
+
+
+def test_states_filter_icao24__client_without_filters__filters_locally():
+    client = FakeOpenskyClient(states=[state_vector('a1'), state_vector('a2')],
+                                arrivals={'EBBR': [flight_connection('a1', 'EHAM', 'EBBR')]})
+    traffic = AirTraffic(traffic_time_span_in_days=1, airports=['EBBR'],
+                         client=RequestGovernor(client), filter_states_by_icao24=True)
+    traffic.fetch_flight_connections()
+
+    assert [state.icao24 for state in traffic._get_states()] == ['a1']